@@ -1,24 +1,35 @@
+import asyncio
 from contextlib import asynccontextmanager
-from ipaddress import ip_address
 import os
 from pathlib import Path
 from typing import Callable
 
-import redis.asyncio as redis
-from fastapi import Depends, FastAPI, HTTPException, Request, status
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import HTMLResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
-from fastapi_limiter import FastAPILimiter
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 import uvicorn
 
-from src.repository.images import get_all_images
+from src.conf import messages
+from src.repository.images import encode_cursor, get_all_images
 from src.conf.config import config
-from src.database.db import get_db
-from src.routes import auth, comments, images, tags, users
+from src.database.db import get_db, get_read_db, sessionmanager
+from src.database.redis import redis_manager
+from src.routes import auth, bans, comments, images, media, tags, users
+from src.services.abuse import abuse_detector
+from src.services.auth import auth_service, role_required
+from src.services.bans import ban_list, client_address
+from src.services.email import email_outbox, prerender_emails
+from src.services.feed_cache import feed_cache
+from src.services.qr import qr_renderer
+from src.services.qr_cache import qr_cache
+from src.services.rate_limit import limiter
+from src.services.rendering import renderer
+from src.services.storage import storage
+from src.services.token_registry import token_registry
+from src.services.user_cache import user_cache
 
 
 @asynccontextmanager
@@ -29,34 +40,50 @@ async def lifespan(app: FastAPI):
     Args:
         app (FastAPI): FastAPI: Pass the fastapi instance to the function.
     """
-    r = await redis.Redis(
-        host=config.REDIS_DOMAIN,
-        port=config.REDIS_PORT,
-        db=0,
-        password=config.REDIS_PASSWORD,
-        encoding="utf-8",
-        decode_responses=True,
-    )
-    await FastAPILimiter.init(r)
+    renderer.preload()
+    await prerender_emails()
+    r = await redis_manager.connect()
+    limiter.init(r)
+    sessionmanager.init(r)
+    ban_list.init(r)
+    abuse_detector.init(r)
+    ban_refresher = asyncio.create_task(ban_list.refresh_forever())
+    feed_cache.init(r)
+    qr_cache.init(r)
+    user_cache.init(r)
+    user_cache_listener = asyncio.create_task(user_cache.listen())
+    token_registry.init(r)
+    token_listener = asyncio.create_task(token_registry.listen())
+    email_outbox.init(r)
+    email_worker = asyncio.create_task(email_outbox.run())
     app.state.redis = r
 
     # Yield управління життєвим циклом
     yield
 
     # Закриття підключення до Redis
-    await r.close()
+    background_tasks = [
+        ban_refresher,
+        user_cache_listener,
+        token_listener,
+        email_worker,
+    ]
+    for task in background_tasks:
+        task.cancel()
+    # Let every task unwind before the SMTP pool and Redis are closed under it
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    await email_outbox.pool.close()
+    await redis_manager.close()
     app.state.redis = None
+    storage.shutdown()
+    qr_renderer.shutdown()
+    auth_service.password_hasher.shutdown()
 
 
 # Ініціалізація FastAPI з контекстним менеджером lifespan
 app = FastAPI(lifespan=lifespan)
 
 
-banned_ips = [
-    ip_address("192.168.1.1"),
-    ip_address("192.168.1.2"),
-]
-
 origins = ["*"]
 
 app.add_middleware(
@@ -70,13 +97,14 @@ app.add_middleware(
 
 @app.middleware("http")
 async def ban_ips(request: Request, call_next: Callable):
-    ip = request.headers.get("X-Forwarded-For", request.client.host)
-    ip = ip_address(ip)
-    if ip in banned_ips:
+    address = client_address(request)
+    if ban_list.is_banned(address):
         return JSONResponse(
             status_code=status.HTTP_403_FORBIDDEN, content={"detail": "You are banned"}
         )
     response = await call_next(request)
+    if abuse_detector.watches(response.status_code):
+        await abuse_detector.record(address)
     return response
 
 
@@ -87,24 +115,68 @@ app.mount("/static", StaticFiles(directory=directory), name="static")
 
 app.include_router(auth.router, prefix="/api")
 app.include_router(users.router, prefix="/api")
+app.include_router(bans.router, prefix="/api")
 app.include_router(tags.router, prefix="/api")
 app.include_router(images.router, prefix="/api")
 app.include_router(comments.router, prefix="/api")
-
-templates = Jinja2Templates(directory=BASE_DIR / "templates")
+app.include_router(media.router)
 
 
 @app.get("/", response_class=HTMLResponse)
 async def index(
     request: Request,
-    limit: int = 10,
-    offset: int = 0,
-    db: AsyncSession = Depends(get_db),
+    limit: int = Query(10, ge=10, le=500),
+    offset: int = Query(0, ge=0, le=10),
+    cursor: str | None = None,
+    db: AsyncSession = Depends(get_read_db),
 ):
-    images = await get_all_images(limit, offset, db)
-    return templates.TemplateResponse(
-        "index.html", {"request": request, "images": images}
+    page, generation = await feed_cache.get(
+        "html", limit, offset, cursor, replica=db.info.get("replica", False)
     )
+    if page is None:
+        try:
+            images = await get_all_images(limit, offset, db, cursor)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail=messages.INVALID_CURSOR
+            )
+        next_cursor = (
+            encode_cursor(images[-1]) if images and len(images) == limit else None
+        )
+        page = await renderer.render(
+            "index.html",
+            request=request,
+            images=images,
+            limit=limit,
+            next_cursor=next_cursor,
+        )
+        await feed_cache.set(generation, "html", limit, offset, cursor, page)
+    return HTMLResponse(page)
+
+
+@app.get("/api/metrics", dependencies=[Depends(role_required(["admin"]))])
+async def metrics():
+    """The metrics function reports the in-process counters of the application caches.
+
+    Returns:
+        Dict: Counters grouped by subsystem.
+    """
+    return {
+        "db_pool": sessionmanager.stats(),
+        "redis": redis_manager.stats(),
+        "jwt_cache": auth_service.token_cache.stats(),
+        "token_registry": token_registry.stats(),
+        "rate_limiter": limiter.stats(),
+        "bans": ban_list.stats(),
+        "abuse_detector": abuse_detector.stats(),
+        "password_hasher": auth_service.password_hasher.stats(),
+        "email_outbox": email_outbox.stats(),
+        "templates": renderer.stats(),
+        "user_cache": user_cache.stats(),
+        "feed_cache": feed_cache.stats(),
+        "qr_cache": qr_cache.stats(),
+        "qr_renderer": qr_renderer.stats(),
+    }
 
 
 @app.get("/api/healthchecker")
@@ -0,0 +1,104 @@
+"""Benchmark of email delivery throughput against a local SMTP server.
+
+Starts an aiosmtpd server that accepts and discards every message, then
+sends the same number of rendered emails with a new connection per message,
+as FastMail does, and over the SMTP pool with 1..N connections, and prints
+messages per second for each run. aiosmtpd is not an app dependency,
+install it first with pip install aiosmtpd.
+
+Usage:
+    python -m scripts.benchmark_email --messages 500 --max-connections 4
+"""
+
+import argparse
+import asyncio
+import socket
+import time
+
+from aiosmtpd.controller import Controller
+from fastapi_mail import ConnectionConfig
+
+from src.services.email import conf
+from src.services.mail_queue import EmailJob, EmailOutbox, SMTPPool
+from src.services.rendering import renderer
+
+
+class Sink:
+    async def handle_DATA(self, server, session, envelope):
+        return "250 OK"
+
+
+async def build_messages(outbox: EmailOutbox, count: int) -> list:
+    return [
+        await outbox.build_message(
+            EmailJob(
+                template="verify_email.html",
+                subject="Confirm your email ",
+                recipient=f"user{i}@example.com",
+                body={"host": "http://localhost/", "username": f"user{i}", "token": "x"},
+            )
+        )
+        for i in range(count)
+    ]
+
+
+async def run_per_message(local_conf: ConnectionConfig, messages: list) -> float:
+    start = time.perf_counter()
+    for message in messages:
+        pool = SMTPPool(local_conf, size=1)
+        await pool.send([message])
+        await pool.close()
+    return len(messages) / (time.perf_counter() - start)
+
+
+async def run_pool(local_conf: ConnectionConfig, messages: list, size: int) -> float:
+    pool = SMTPPool(local_conf, size)
+    start = time.perf_counter()
+    results = await pool.send(messages)
+    elapsed = time.perf_counter() - start
+    await pool.close()
+    assert not any(results), results
+    return len(messages) / elapsed
+
+
+async def main(count: int, max_connections: int):
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    controller = Controller(Sink(), hostname="127.0.0.1", port=port)
+    controller.start()
+    try:
+        local_conf = ConnectionConfig(
+            **{
+                **conf.model_dump(),
+                "MAIL_SERVER": "127.0.0.1",
+                "MAIL_PORT": port,
+                "MAIL_SSL_TLS": False,
+                "USE_CREDENTIALS": False,
+            }
+        )
+        outbox = EmailOutbox(
+            SMTPPool(local_conf, 1),
+            renderer,
+            batch_size=count,
+            max_attempts=1,
+            backoff=0,
+            claim_idle=60,
+        )
+        messages = await build_messages(outbox, count)
+        baseline = await run_per_message(local_conf, messages)
+        print(f"{'mode':<14}{'connections':>12}{'messages/s':>12}{'speedup':>10}")
+        print(f"{'per message':<14}{'-':>12}{baseline:>12.1f}{1:>10.2f}")
+        for size in range(1, max_connections + 1):
+            throughput = await run_pool(local_conf, messages, size)
+            print(f"{'pool':<14}{size:>12}{throughput:>12.1f}{throughput / baseline:>10.2f}")
+    finally:
+        controller.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--max-connections", type=int, default=4)
+    args = parser.parse_args()
+    asyncio.run(main(args.messages, args.max_connections))
@@ -0,0 +1,55 @@
+"""Benchmark of QR code rendering throughput.
+
+Renders the same number of QR codes inline on the event loop and on the QR
+process pool with 1..N workers, and prints renders per second for each run.
+
+Usage:
+    python -m scripts.benchmark_qr --requests 400 --max-workers 8
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import time
+
+from src.repository.qr import render_qr_code_with_url
+from src.services.qr import QRRenderer
+
+URL = "https://res.cloudinary.com/demo/image/upload/c_fill,h_250,w_250/sample.png"
+
+
+async def run_inline(requests: int) -> float:
+    start = time.perf_counter()
+    for _ in range(requests):
+        render_qr_code_with_url(URL)
+    return requests / (time.perf_counter() - start)
+
+
+async def run_pool(requests: int, workers: int) -> float:
+    renderer = QRRenderer(workers, queue_size=requests)
+    # Warm up so process start-up is not measured
+    await asyncio.gather(*(renderer.render(URL) for _ in range(workers)))
+    start = time.perf_counter()
+    await asyncio.gather(*(renderer.render(URL) for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    renderer.shutdown()
+    return requests / elapsed
+
+
+async def main(requests: int, max_workers: int):
+    inline = await run_inline(requests)
+    print(f"{'mode':<10}{'workers':>8}{'renders/s':>12}{'speedup':>10}")
+    print(f"{'inline':<10}{'-':>8}{inline:>12.1f}{1:>10.2f}")
+    for workers in range(1, max_workers + 1):
+        throughput = await run_pool(requests, workers)
+        print(f"{'pool':<10}{workers:>8}{throughput:>12.1f}{throughput / inline:>10.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument(
+        "--max-workers", type=int, default=multiprocessing.cpu_count()
+    )
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.max_workers))
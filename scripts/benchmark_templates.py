@@ -0,0 +1,53 @@
+"""Benchmark of template rendering latency.
+
+Measures the first render in a fresh environment with and without the
+bytecode cache, then the per-message cost of rendering the verification
+email in full against filling its prerendered skeleton.
+
+Usage:
+    python -m scripts.benchmark_templates --messages 10000
+"""
+
+import argparse
+import asyncio
+import time
+
+from src.services.email import EMAIL_TEMPLATES
+from src.services.rendering import TEMPLATE_DIRS, TemplateRenderer
+
+NAME = "verify_email.html"
+CONTEXT = {"host": "http://localhost/", "username": "user", "token": "x" * 160}
+
+
+async def cold_render(bytecode_cache: bool) -> float:
+    renderer = TemplateRenderer(TEMPLATE_DIRS, bytecode_cache, auto_reload=False)
+    start = time.perf_counter()
+    await renderer.render(NAME, **CONTEXT)
+    return (time.perf_counter() - start) * 1000
+
+
+async def per_message(messages: int, skeleton: bool) -> float:
+    renderer = TemplateRenderer(TEMPLATE_DIRS, bytecode_cache=True, auto_reload=False)
+    renderer.preload()
+    if skeleton:
+        await renderer.prerender(NAME, EMAIL_TEMPLATES[NAME])
+    start = time.perf_counter()
+    for _ in range(messages):
+        await renderer.render_email(NAME, CONTEXT)
+    return (time.perf_counter() - start) / messages * 1e6
+
+
+async def main(messages: int):
+    # Fills the bytecode cache, so the next cold render can use it
+    await cold_render(bytecode_cache=True)
+    print(f"cold render, no bytecode cache: {await cold_render(False):8.2f} ms")
+    print(f"cold render, bytecode cache:    {await cold_render(True):8.2f} ms")
+    print(f"full render per message:        {await per_message(messages, False):8.2f} us")
+    print(f"skeleton fill per message:      {await per_message(messages, True):8.2f} us")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=10000)
+    args = parser.parse_args()
+    asyncio.run(main(args.messages))
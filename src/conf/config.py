@@ -7,19 +7,80 @@ load_dotenv()
 
 class Settings(BaseSettings):
     SQLALCHEMY_DATABASE_URL: str = Field(env="SQLALCHEMY_DATABASE_URL")
+    SQLALCHEMY_REPLICA_URLS: list[str] = []
+    # How long a client that wrote keeps reading from the primary
+    DB_READ_YOUR_WRITES_SECONDS: int = 10
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 10.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    # Milliseconds, 0 disables; applied by PostgreSQL via asyncpg
+    DB_STATEMENT_TIMEOUT: int = 30000
     SECRET_KEY_JWT: str = "1234567890"
     ALGORITHM: str = "HS256"
+    JWT_CACHE_SIZE: int = 4096
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 2
     MAIL_USERNAME: EmailStr = "postgres@meail.com"
     MAIL_PASSWORD: str = "postgres"
     MAIL_FROM: str = "postgres"
     MAIL_PORT: int = 567234
     MAIL_SERVER: str = "postgres"
+    MAIL_POOL_SIZE: int = 2
+    MAIL_BATCH_SIZE: int = 20
+    MAIL_MAX_ATTEMPTS: int = 5
+    MAIL_RETRY_BACKOFF: float = 5.0
+    MAIL_CLAIM_IDLE: int = 60
+    TEMPLATE_BYTECODE_CACHE: bool = True
+    TEMPLATE_AUTO_RELOAD: bool = False
     REDIS_DOMAIN: str = "localhost"
     REDIS_PORT: int = 6379
     REDIS_PASSWORD: str | None = None
-    CLOUDINARY_NAME: str
-    CLOUDINARY_API_KEY: str
-    CLOUDINARY_API_SECRET: str
+    REDIS_MAX_CONNECTIONS: int = 50
+    REDIS_SOCKET_TIMEOUT: float = 5.0
+    # Rate limits as "times/seconds" or "unlimited", by route policy name;
+    # "*" applies to every route of the level
+    RATE_LIMITS: dict[str, str] = {
+        "auth.signup": "5/60",
+        "auth.login": "5/60",
+        "users.profile": "1/20",
+        "users.me": "1/20",
+        "users.update": "1/20",
+        "users.avatar": "1/20",
+    }
+    RATE_LIMITS_BY_ROLE: dict[str, dict[str, str]] = {}
+    RATE_LIMITS_BY_USER: dict[str, dict[str, str]] = {}
+    RATE_LIMIT_LOCAL_SIZE: int = 10000
+    # Proxies in front of the app that append to X-Forwarded-For. Keep 0
+    # unless there are such proxies, or clients could spoof the address
+    # the ban list and the abuse detector see, and get other clients banned
+    TRUSTED_PROXY_HOPS: int = 0
+    BANNED_NETWORKS: list[str] = ["192.168.1.1", "192.168.1.2"]
+    BAN_REFRESH_INTERVAL: float = 5.0
+    ABUSE_THRESHOLD: int = 20
+    ABUSE_WINDOW: float = 60.0
+    ABUSE_BAN_TTL: int = 900
+    ABUSE_STATUS_CODES: list[int] = [401, 403, 429]
+    ABUSE_EXEMPT_NETWORKS: list[str] = ["127.0.0.0/8", "::1"]
+    RATE_LIMIT_LEASE_FRACTION: float = 0.1
+    CLOUDINARY_NAME: str | None = None
+    CLOUDINARY_API_KEY: str | None = None
+    CLOUDINARY_API_SECRET: str | None = None
+    FEED_CACHE_TTL: int = 300
+    USER_CACHE_TTL: int = 300
+    USER_CACHE_LOCAL_SIZE: int = 1024
+    USER_CACHE_LOCAL_TTL: float = 30.0
+    STORAGE_BACKEND: str = "cloudinary"
+    STORAGE_MAX_WORKERS: int = 8
+    LOCAL_STORAGE_DIR: str = "media"
+    LOCAL_STORAGE_URL: str = "/media"
+    UPLOAD_BATCH_MAX_FILES: int = 50
+    UPLOAD_BATCH_CONCURRENCY: int = 4
+    QR_MAX_WORKERS: int | None = None
+    QR_QUEUE_SIZE: int = 32
+    QR_CACHE_MAX_BYTES: int = 16 * 1024 * 1024
+    QR_CACHE_TTL: int = 24 * 60 * 60
 
     model_config = ConfigDict(
         extra="ignore", env_file="../.env", env_file_encoding="utf-8"
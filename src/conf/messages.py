@@ -16,3 +16,13 @@ NOT_ENOUGH_PERMISSIONS = "Not enough permissions"
 TAG_NOT_FOUND = "Tag not found"
 IMAGE_NOT_FOUND = "Image not found"
 NOT_ACTIVE_USER = "You are not active user"
+INVALID_CURSOR = "Invalid pagination cursor"
+QR_QUEUE_FULL = "QR code renderer is busy, try again later"
+TOO_MANY_FILES = "Too many files in one upload"
+DESCRIPTIONS_MISMATCH = "Number of descriptions does not match number of files"
+UPLOAD_FAILED = "Upload failed"
+LOGGED_OUT = "Logged out"
+TOO_MANY_REQUESTS = "Too many requests"
+INVALID_NETWORK = "Invalid IP address or network"
+BAN_NOT_FOUND = "Ban not found"
+BAN_LIFTED = "Ban lifted"
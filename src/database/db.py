@@ -1,33 +1,237 @@
 import contextlib
+import hashlib
+import itertools
+import logging
+import time
+from typing import Awaitable, Callable
 
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from sqlalchemy import exc
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import (
     AsyncEngine,
+    AsyncSession,
     async_sessionmaker,
     create_async_engine,
 )
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from src.conf.config import config
 
+logger = logging.getLogger(__name__)
+
+class PoolMetrics:
+    """Checkout counters of the database connection pool, reported on /api/metrics."""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.waiting = 0
+        self.overflows = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def observe(self, elapsed: float, overflowed: bool) -> None:
+        self.checkouts += 1
+        self.overflows += overflowed
+        self.wait_total += elapsed
+        self.wait_max = max(self.wait_max, elapsed)
+
+    def stats(self) -> dict:
+        return {
+            "checkouts": self.checkouts,
+            "waiting": self.waiting,
+            "overflows": self.overflows,
+            "timeouts": self.timeouts,
+            "wait_avg_ms": self.wait_total / self.checkouts * 1000
+            if self.checkouts
+            else 0.0,
+            "wait_max_ms": self.wait_max * 1000,
+        }
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool recording how long every checkout waits and whether it overflowed.
+
+    A checkout overflows when all pool_size connections are in use and a
+    new one is opened on top of them; it times out when max_overflow extra
+    connections are in use too and none is returned within pool_timeout.
+    """
+
+    metrics: PoolMetrics
+
+    def _do_get(self):
+        overflow = self._overflow
+        start = time.perf_counter()
+        self.metrics.waiting += 1
+        try:
+            record = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.timeouts += 1
+            self.metrics.wait_max = max(
+                self.metrics.wait_max, time.perf_counter() - start
+            )
+            raise
+        finally:
+            self.metrics.waiting -= 1
+        self.metrics.observe(
+            time.perf_counter() - start, self._overflow > max(overflow, 0)
+        )
+        return record
+
+    def recreate(self) -> "InstrumentedQueuePool":
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+def engine_options(url: str) -> dict:
+    """The engine_options function builds the pool and driver options of the engine from the settings.
+
+    Args:
+        url (str): Database URL.
+
+    Returns:
+        dict: Keyword arguments of create_async_engine.
+    """
+    options = {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": config.DB_POOL_SIZE,
+        "max_overflow": config.DB_MAX_OVERFLOW,
+        "pool_timeout": config.DB_POOL_TIMEOUT,
+        "pool_recycle": config.DB_POOL_RECYCLE,
+        "pool_pre_ping": config.DB_POOL_PRE_PING,
+    }
+    if config.DB_STATEMENT_TIMEOUT and make_url(url).get_driver_name() == "asyncpg":
+        # Enforced by the server, so a runaway query releases its connection
+        options["connect_args"] = {
+            "server_settings": {"statement_timeout": str(config.DB_STATEMENT_TIMEOUT)}
+        }
+    return options
+
+
+SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+PRIMARY_COOKIE = "db_primary"
+
 
 class DatabaseSessionManager:
-    def __init__(self, url: str):
-        print(url)
-        self._engine: AsyncEngine | None = create_async_engine(url)
-        self._session_maker: async_sessionmaker = async_sessionmaker(
-            autoflush=False, autocommit=False, bind=self._engine
+    """Owns the primary engine and the engines of the read replicas.
+
+    Writes always go to the primary. Read-only sessions are spread over the
+    replicas round-robin and fall back to the primary when none are
+    configured. Clients that wrote within DB_READ_YOUR_WRITES_SECONDS read
+    from the primary: browsers are recognized by a cookie, API clients by a
+    Redis key derived from their bearer token.
+    """
+
+    sticky_prefix = "db:primary:"
+
+    def __init__(self, url: str, replica_urls: list[str] = ()):
+        self.redis: Redis | None = None
+        self._engine: AsyncEngine | None = self._create_engine(url)
+        self._replicas: list[AsyncEngine] = [
+            self._create_engine(replica_url) for replica_url in replica_urls
+        ]
+        self.metrics = self._engine.pool.metrics
+        self._session_maker: async_sessionmaker = self._create_session_maker(
+            self._engine
+        )
+        self._read_session_makers = itertools.cycle(
+            [self._create_session_maker(engine) for engine in self._replicas]
+            or [self._session_maker]
+        )
+
+    @staticmethod
+    def _create_engine(url: str) -> AsyncEngine:
+        engine = create_async_engine(url, **engine_options(url))
+        engine.pool.metrics = PoolMetrics()
+        return engine
+
+    @staticmethod
+    def _create_session_maker(engine: AsyncEngine) -> async_sessionmaker:
+        # Objects keep their state after the commit, so responses are
+        # serialized without reloading what the request just wrote
+        return async_sessionmaker(
+            autoflush=False, autocommit=False, expire_on_commit=False, bind=engine
         )
 
+    @property
+    def has_replicas(self) -> bool:
+        return bool(self._replicas)
+
+    def init(self, redis: Redis) -> None:
+        """The init function attaches the Redis client that remembers recent writers.
+
+        Args:
+            redis (Redis): Async Redis client.
+        """
+        self.redis = redis
+
+    def _writer_key(self, request: Request) -> str | None:
+        # The bearer token identifies the authenticated user; hashing it
+        # avoids decoding the token here and keeps it out of Redis
+        scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            return None
+        return self.sticky_prefix + hashlib.sha256(token.encode()).hexdigest()
+
+    async def mark_writer(self, request: Request) -> None:
+        """The mark_writer function makes the next reads of an authenticated client use the primary.
+
+        Args:
+            request (Request): Request that may write.
+        """
+        key = self._writer_key(request)
+        if self.redis is None or key is None:
+            return
+        try:
+            await self.redis.set(key, 1, ex=config.DB_READ_YOUR_WRITES_SECONDS)
+        except RedisError:
+            logger.warning("Cannot mark a recent writer", exc_info=True)
+
+    async def wrote_recently(self, request: Request) -> bool:
+        """The wrote_recently function tells whether a client must read from the primary.
+
+        Args:
+            request (Request): Incoming read request.
+
+        Returns:
+            bool: True if the client wrote within DB_READ_YOUR_WRITES_SECONDS.
+        """
+        if PRIMARY_COOKIE in request.cookies:
+            return True
+        key = self._writer_key(request)
+        if self.redis is None or key is None:
+            return False
+        try:
+            return bool(await self.redis.exists(key))
+        except RedisError:
+            logger.warning("Cannot look up a recent writer", exc_info=True)
+            # Without the marker the primary is the only safe choice
+            return True
+
     @contextlib.asynccontextmanager
-    async def session(self):
+    async def session(self, read_only: bool = False):
         """The session function is a context manager that provides a transactional scope around a series of operations.
             It will automatically rollback the session if an exception occurs, or commit the session otherwise.
 
+        Args:
+            read_only (bool, optional): Open the session on a read replica.
+
         Yields:
             Generator: A generator object
         """
         if self._session_maker is None:
             raise Exception("Session is not initialized")
-        session = self._session_maker()
+        session_maker = (
+            next(self._read_session_makers) if read_only else self._session_maker
+        )
+        session = session_maker()
+        # Tells callers that the session may lag behind the primary
+        session.info["replica"] = read_only and self.has_replicas
         try:
             yield session
         except Exception as err:
@@ -37,10 +241,152 @@ class DatabaseSessionManager:
         finally:
             await session.close()
 
+    @staticmethod
+    def _pool_stats(engine: AsyncEngine) -> dict:
+        pool = engine.pool
+        return {
+            "size": pool.size(),
+            "in_use": pool.checkedout(),
+            "idle": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+            "max_overflow": config.DB_MAX_OVERFLOW,
+            **pool.metrics.stats(),
+        }
+
+    def stats(self) -> dict:
+        return {
+            **self._pool_stats(self._engine),
+            "replicas": [self._pool_stats(engine) for engine in self._replicas],
+        }
+
 
-sessionmanager = DatabaseSessionManager(config.SQLALCHEMY_DATABASE_URL)
+sessionmanager = DatabaseSessionManager(
+    config.SQLALCHEMY_DATABASE_URL, config.SQLALCHEMY_REPLICA_URLS
+)
+
+async def get_db(request: Request, response: Response):
+    """The get_db function opens a session on the primary.
+        Repositories only flush; UnitOfWorkRoute commits the session once the
+        endpoint has returned. A request that may write marks the client with a
+        short-lived cookie and, when it carries a bearer token, a Redis key, so
+        its next reads see its own writes instead of a lagging replica.
 
+    Args:
+        request (Request): Incoming request.
+        response (Response): Response the cookie is set on.
 
-async def get_db():
+    Yields:
+        AsyncSession: Session on the primary.
+    """
+    if sessionmanager.has_replicas and request.method not in SAFE_METHODS:
+        response.set_cookie(
+            PRIMARY_COOKIE,
+            "1",
+            max_age=config.DB_READ_YOUR_WRITES_SECONDS,
+            httponly=True,
+            samesite="lax",
+        )
+        await sessionmanager.mark_writer(request)
     async with sessionmanager.session() as session:
+        request.state.db = session
         yield session
+
+
+async def get_read_db(request: Request):
+    """The get_read_db function opens a session for routes that only read.
+        It uses a read replica unless the client wrote recently.
+
+    Args:
+        request (Request): Incoming request.
+
+    Yields:
+        AsyncSession: Session on a replica, or on the primary after a write.
+    """
+    read_only = sessionmanager.has_replicas and not (
+        await sessionmanager.wrote_recently(request)
+    )
+    async with sessionmanager.session(read_only=read_only) as session:
+        yield session
+
+
+def on_commit(db: AsyncSession, callback: Callable[[], Awaitable]) -> None:
+    """The on_commit function defers work, such as cache invalidation, until the session commits.
+        Running it earlier would let a concurrent request cache the rows as they
+        were before the commit.
+
+    Args:
+        db (AsyncSession): Session of the request.
+        callback (Callable[[], Awaitable]): Coroutine function to await after the commit.
+    """
+    db.info.setdefault("on_commit", []).append(callback)
+
+
+def on_rollback(db: AsyncSession, callback: Callable[[], Awaitable]) -> None:
+    """The on_rollback function registers compensation, such as removing uploaded files,
+        for when the changes of the session are not committed.
+
+    Args:
+        db (AsyncSession): Session of the request.
+        callback (Callable[[], Awaitable]): Coroutine function to await if the commit fails
+            or the endpoint raises.
+    """
+    db.info.setdefault("on_rollback", []).append(callback)
+
+
+async def discard(db: AsyncSession) -> None:
+    """The discard function drops the on_commit callbacks and runs the on_rollback callbacks.
+
+    Args:
+        db (AsyncSession): Session whose changes will not be committed.
+    """
+    db.info.pop("on_commit", None)
+    for callback in db.info.pop("on_rollback", []):
+        await callback()
+
+
+async def commit(db: AsyncSession) -> None:
+    """The commit function commits the session and runs the callbacks registered with on_commit.
+        If the commit fails, the callbacks registered with on_rollback run instead.
+
+    Args:
+        db (AsyncSession): Session of the request.
+    """
+    try:
+        await db.commit()
+    except Exception:
+        await discard(db)
+        raise
+    db.info.pop("on_rollback", None)
+    for callback in db.info.pop("on_commit", []):
+        await callback()
+
+
+class UnitOfWorkRoute(APIRoute):
+    """Route committing the session of get_db once per request.
+
+    The commit runs after the endpoint has returned and its response has
+    been built, but before it is sent, so a failed commit is reported as an
+    error instead of being acknowledged. Committing in get_db itself would
+    be too late, as FastAPI runs the cleanup of yield dependencies after
+    the response has been sent. When the endpoint raises, nothing is
+    committed, the on_rollback callbacks run and closing the session rolls
+    the flushed changes back.
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Awaitable[Response]]:
+        handler = super().get_route_handler()
+
+        async def unit_of_work_handler(request: Request) -> Response:
+            try:
+                response = await handler(request)
+            except Exception:
+                session = getattr(request.state, "db", None)
+                if session is not None:
+                    await discard(session)
+                raise
+            session = getattr(request.state, "db", None)
+            if session is not None and session.in_transaction():
+                await commit(session)
+            return response
+
+        return unit_of_work_handler
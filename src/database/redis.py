@@ -0,0 +1,116 @@
+import time
+
+from redis.asyncio import ConnectionPool, Redis
+from redis.asyncio.client import Pipeline
+
+from src.conf.config import config
+
+
+class LatencyStats:
+    """Round-trip counters of Redis commands, reported on /api/metrics."""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, elapsed: float, failed: bool) -> None:
+        self.calls += 1
+        self.errors += failed
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "avg_ms": self.total / self.calls * 1000 if self.calls else 0.0,
+            "max_ms": self.max * 1000,
+        }
+
+
+class InstrumentedPipeline(Pipeline):
+    latency: LatencyStats
+
+    async def execute(self, raise_on_error: bool = True):
+        start = time.perf_counter()
+        failed = True
+        try:
+            result = await super().execute(raise_on_error)
+            failed = False
+            return result
+        finally:
+            self.latency.observe(time.perf_counter() - start, failed)
+
+
+class InstrumentedRedis(Redis):
+    """Async Redis client recording the latency of every command and pipeline."""
+
+    latency: LatencyStats
+
+    async def execute_command(self, *args, **options):
+        start = time.perf_counter()
+        failed = True
+        try:
+            result = await super().execute_command(*args, **options)
+            failed = False
+            return result
+        finally:
+            self.latency.observe(time.perf_counter() - start, failed)
+
+    def pipeline(self, transaction: bool = True, shard_hint: str | None = None):
+        pipe = InstrumentedPipeline(
+            self.connection_pool, self.response_callbacks, transaction, shard_hint
+        )
+        pipe.latency = self.latency
+        return pipe
+
+
+class RedisManager:
+    """Owns the connection pool shared by the auth cache, rate limiter and caches.
+
+    Replies are not decoded, so binary values (pickled users, PNGs) and
+    text values share one pool; text users decode what they read.
+    """
+
+    def __init__(self):
+        self._pool: ConnectionPool | None = None
+        self.client: InstrumentedRedis | None = None
+        self.latency = LatencyStats()
+
+    async def connect(self) -> InstrumentedRedis:
+        """The connect function creates the connection pool and the shared client.
+
+        Returns:
+            InstrumentedRedis: Async Redis client.
+        """
+        self._pool = ConnectionPool(
+            host=config.REDIS_DOMAIN,
+            port=config.REDIS_PORT,
+            db=0,
+            password=config.REDIS_PASSWORD,
+            max_connections=config.REDIS_MAX_CONNECTIONS,
+            socket_timeout=config.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=config.REDIS_SOCKET_TIMEOUT,
+            health_check_interval=30,
+        )
+        self.client = InstrumentedRedis(connection_pool=self._pool)
+        self.client.latency = self.latency
+        return self.client
+
+    async def close(self) -> None:
+        if self.client is not None:
+            await self.client.close()
+            await self._pool.disconnect()
+        self.client = None
+        self._pool = None
+
+    def stats(self) -> dict:
+        return {
+            "max_connections": config.REDIS_MAX_CONNECTIONS,
+            **self.latency.stats(),
+        }
+
+
+redis_manager = RedisManager()
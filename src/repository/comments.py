@@ -51,8 +51,7 @@ async def create_comment(
         )
     new_comment = Comment(name=body.name, image_id=image.id, user_id=current_user.id)
     db.add(new_comment)
-    await db.commit()
-    await db.refresh(new_comment)
+    await db.flush()
     return new_comment
 
 
@@ -72,8 +71,7 @@ async def update_comment(
     comment = await get_comment(comment_id, db)
     if comment:
         comment.name = coment_update.name
-        await db.commit()
-        await db.refresh(comment)
+        await db.flush()
     return comment
 
 
@@ -90,5 +88,5 @@ async def delete_comment(comment_id: int, db: AsyncSession = Depends(get_db)) ->
     comment = await get_comment(comment_id, db)
     if comment:
         await db.delete(comment)
-        await db.commit()
+        await db.flush()
     return comment
@@ -1,31 +1,61 @@
+import asyncio
+import base64
+import hashlib
+import json
+import logging
 from datetime import datetime
+from functools import partial
+from typing import BinaryIO
 
-import cloudinary
-import cloudinary.api
-import cloudinary.uploader
-import cloudinary.utils
-from cloudinary import CloudinaryImage
 from fastapi import UploadFile
-from fastapi.concurrency import run_in_threadpool
-from sqlalchemy import select
+from sqlalchemy import select, tuple_, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import lazyload, selectinload
 
-from src.conf.config import config
-from src.entity.models import Image, User
+from src.database.db import on_commit, on_rollback
+from src.entity.models import Image, ImageTransformation, User
 from src.schemas.image import ImageUpdateSchema
-
-cloudinary.config(
-    cloud_name=config.CLOUDINARY_NAME,
-    api_key=config.CLOUDINARY_API_KEY,
-    api_secret=config.CLOUDINARY_API_SECRET,
+from src.services.feed_cache import feed_cache
+from src.services.storage import StoredObject, storage
+
+logger = logging.getLogger(__name__)
+
+# Loader profiles. Collections are batch loaded with selectin so comments and
+# tags never multiply each other's rows, and the owner join is skipped because
+# no image response serializes it.
+IMAGE_RESPONSE_LOADERS = (
+    lazyload(Image.user),
+    selectinload(Image.comments),
+    selectinload(Image.tags),
 )
+IMAGE_BARE_LOADERS = (lazyload(Image.user),)
+
+
+async def change_image_count(user_id: int, delta: int, db: AsyncSession) -> None:
+    """The change_image_count function adjusts the image counter of a user.
+        The counter is changed in the database with a single UPDATE, so the user row is not
+        loaded and concurrent uploads cannot overwrite each other's increment.
+
+    Args:
+        user_id (int): Owner of the images.
+        delta (int): Number of images added, negative for removed images.
+        db (AsyncSession): Pass in the database session.
+    """
+    stmt = (
+        update(User)
+        .filter_by(id=user_id)
+        .values(image_count=User.image_count + delta)
+        .execution_options(synchronize_session=False)
+    )
+    await db.execute(stmt)
 
 
 async def upload_image(
     file: UploadFile, description: str, db: AsyncSession, user: User
 ):
-    """The upload_image function uploads an image to Cloudinary and saves the image URL and description to the database.
+    """The upload_image function uploads an image to the storage and saves the image URL and description to the database.
+        When the same bytes were uploaded before, the stored file is reused instead of uploading it again.
 
     Args:
         file (file): The image file to upload.
@@ -36,25 +66,121 @@ async def upload_image(
     Returns:
         Image: Uploaded image
     """
-    result = await run_in_threadpool(cloudinary.uploader.upload, file)
-    image_url = result.get("url")
+    content_hash = await storage.digest(file)
+    # The lock keeps delete_image from removing the shared file before commit
+    stmt = (
+        select(Image.url)
+        .filter_by(content_hash=content_hash)
+        .limit(1)
+        .with_for_update()
+    )
+    result = await db.execute(stmt)
+    image_url = result.scalar_one_or_none()
+    if image_url is None:
+        stored = await storage.put(file)
+        image_url = stored.url
+        on_rollback(db, partial(delete_uploaded, [stored.key]))
 
     image = Image(
         url=image_url,
         description=description,
+        content_hash=content_hash,
         user_id=user.id,
         created_at=datetime.now(),
         updated_at=datetime.now(),
     )
     db.add(image)
-    user = await db.merge(user)
-    user.image_count += 1
-    await db.commit()
-    await db.refresh(user)
-    await db.refresh(image)
+    await change_image_count(user.id, 1, db)
+    await db.flush()
     return image
 
 
+async def upload_images(
+    files: list[tuple[BinaryIO, str]],
+    db: AsyncSession,
+    user: User,
+    concurrency: int,
+) -> list[Image | Exception]:
+    """The upload_images function uploads a batch of images and adds them to the session in one flush.
+        Files are hashed and stored concurrently, at most concurrency at a time. Duplicates,
+        inside the batch or of earlier uploads, reuse the stored file. A file that fails to
+        upload does not abort the others.
+
+    Args:
+        files (list[tuple[BinaryIO, str]]): Image files with their descriptions.
+        db (AsyncSession): Pass in the database session.
+        user (User): Owner of the images.
+        concurrency (int): Maximum number of concurrent storage operations.
+
+    Returns:
+        list[Image | Exception]: Created image or upload error, in the order of files.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(operation, *args):
+        async with semaphore:
+            return await operation(*args)
+
+    hashes = await asyncio.gather(
+        *(bounded(storage.digest, file) for file, _ in files), return_exceptions=True
+    )
+    known = [content_hash for content_hash in hashes if isinstance(content_hash, str)]
+    stmt = (
+        select(Image.content_hash, Image.url)
+        .where(Image.content_hash.in_(known))
+        .with_for_update()
+    )
+    urls = dict((await db.execute(stmt)).all())
+
+    # Upload each new content once, even if the batch repeats it
+    pending = {}
+    for (file, _), content_hash in zip(files, hashes):
+        if isinstance(content_hash, str) and content_hash not in urls:
+            pending.setdefault(content_hash, file)
+    stored = await asyncio.gather(
+        *(bounded(storage.put, file) for file in pending.values()),
+        return_exceptions=True,
+    )
+    for content_hash, result in zip(pending, stored):
+        urls[content_hash] = result.url if isinstance(result, StoredObject) else result
+
+    results = []
+    for (_, description), content_hash in zip(files, hashes):
+        image_url = urls[content_hash] if isinstance(content_hash, str) else content_hash
+        if not isinstance(image_url, str):
+            results.append(image_url)
+            continue
+        image = Image(
+            url=image_url,
+            description=description,
+            content_hash=content_hash,
+            user_id=user.id,
+            created_at=datetime.now(),
+            updated_at=datetime.now(),
+        )
+        db.add(image)
+        results.append(image)
+
+    created = [image for image in results if isinstance(image, Image)]
+    uploaded = [result.key for result in stored if isinstance(result, StoredObject)]
+    if uploaded:
+        # Files stored for this batch are orphans unless the images commit
+        on_rollback(db, partial(delete_uploaded, uploaded))
+    await db.flush()
+    if created:
+        await change_image_count(user.id, len(created), db)
+    return results
+
+
+async def delete_uploaded(keys: list[str]) -> None:
+    """The delete_uploaded function removes files stored for images that were not committed.
+
+    Args:
+        keys (list[str]): Storage keys of the files.
+    """
+    await asyncio.gather(*(storage.delete(key) for key in keys), return_exceptions=True)
+
+
 async def update_image(
     image_id: int,
     body: ImageUpdateSchema,
@@ -70,67 +196,122 @@ async def update_image(
     Returns:
         Image: Updated image
     """
-    stmt = (
-        select(Image)
-        .options(joinedload(Image.comments))
-        .options(joinedload(Image.tags))
-        .filter_by(id=image_id)
-    )
-    result = await db.execute(stmt)
-    image = result.unique().scalar_one_or_none()
+    image = await get_image_by_id(image_id, db, IMAGE_RESPONSE_LOADERS)
     if image:
         image.description = body.description
         image.updated_at = datetime.now()
-        await db.commit()
-        await db.refresh(image)
+        await db.flush()
     return image
 
 
-async def get_all_images(limit: int, offset: int, db: AsyncSession):
+def encode_cursor(image: Image) -> str:
+    """The encode_cursor function builds an opaque pagination cursor pointing after the given image.
+
+    Args:
+        image (Image): The last image of the current page.
+
+    Returns:
+        str: URL-safe cursor encoding the image's (created_at, id) position.
+    """
+    raw = f"{image.created_at.isoformat()}|{image.id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """The decode_cursor function restores the (created_at, id) position from a cursor.
+
+    Args:
+        cursor (str): Cursor previously returned by encode_cursor.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+
+    Returns:
+        tuple[datetime, int]: The created_at and id of the last seen image.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, image_id = (
+            base64.urlsafe_b64decode(padded.encode()).decode().split("|")
+        )
+        return datetime.fromisoformat(created_at), int(image_id)
+    except (ValueError, UnicodeDecodeError) as err:
+        raise ValueError("Invalid cursor") from err
+
+
+async def get_all_images(
+    limit: int, offset: int, db: AsyncSession, cursor: str | None = None
+):
     """The get_all_images function displays a list of images with specified pagination parameters.
+        Images are ordered from newest to oldest. When a cursor is given, the page starts right
+        after the cursor position (keyset pagination) and the offset is ignored, so every page
+        costs the same no matter how deep the client scrolls.
 
     Args:
         limit (int): The maximum number of images to return.
         offset (int): Skips the offset rows before beginning to return the rows.
         db (AsyncSession): Pass in the database session.
+        cursor (str | None, optional): Opaque cursor returned with the previous page.
 
     Returns:
         List: List of image objects.
     """
     stmt = (
         select(Image)
-        .options(joinedload(Image.comments))
-        .options(joinedload(Image.tags))
-        .offset(offset)
+        .options(*IMAGE_RESPONSE_LOADERS)
+        .order_by(Image.created_at.desc(), Image.id.desc())
         .limit(limit)
     )
+    if cursor:
+        created_at, image_id = decode_cursor(cursor)
+        stmt = stmt.where(tuple_(Image.created_at, Image.id) < (created_at, image_id))
+    else:
+        stmt = stmt.offset(offset)
     images = await db.execute(stmt)
-    return images.unique().scalars().all()
+    return images.scalars().all()
 
 
-async def get_image(image_id: int, db: AsyncSession, user: User):
+async def get_image(
+    image_id: int, db: AsyncSession, user: User, loaders=IMAGE_RESPONSE_LOADERS
+):
     """The get_image function displays specific user's image.
 
     Args:
         image_id (int): Pass in the image object in database.
         db (AsyncSession): Pass in the database session.
         user (User): Specific user.
+        loaders (tuple, optional): Loader profile, use IMAGE_BARE_LOADERS when
+            comments and tags are not needed.
 
     Returns:
         Image: Image
     """
-    stmt = (
-        select(Image)
-        .options(joinedload(Image.comments))
-        .options(joinedload(Image.tags))
-        .filter_by(id=image_id, user=user)
-    )
+    stmt = select(Image).options(*loaders).filter_by(id=image_id, user_id=user.id)
     image = await db.execute(stmt)
-    return image.unique().scalar_one_or_none()
+    return image.scalar_one_or_none()
+
+
+async def get_image_by_id(
+    image_id: int, db: AsyncSession, loaders=IMAGE_BARE_LOADERS
+) -> Image | None:
+    """The get_image_by_id function loads an image of any user by its primary key.
+        An image already in the session identity map is returned without a query,
+        so an image loaded by an authorization dependency is shared with the route.
+
+    Args:
+        image_id (int): Pass in the image object in database.
+        db (AsyncSession): Pass in the database session.
+        loaders (tuple, optional): Loader profile, use IMAGE_RESPONSE_LOADERS when
+            comments and tags are needed.
+
+    Returns:
+        Image | None: Image
+    """
+    return await db.get(Image, image_id, options=loaders)
 
 
 async def delete_image(image_id, db: AsyncSession):
-    """The delete_image  function deletes an image from Cloudinary and the database.
+    """The delete_image  function deletes an image from the storage and the database.
 
     Args:
         image_id (int): Pass in the image object in database.
@@ -141,30 +322,87 @@ async def delete_image(image_id, db: AsyncSession):
     """
 
     # Retrieve the image from the database
-    stmt = select(Image).filter_by(id=image_id)
-    result = await db.execute(stmt)
-    image = result.scalar_one_or_none()
-    stmt = select(User).filter_by(id=image.user_id)
-    result = await db.execute(stmt)
-    user = result.scalar_one_or_none()
-    # Delete the image from Cloudinary
-    parts = image.url.split("/")
-    public_id_with_format = parts[-1]  # останній елемент у шляху
-    public_id = public_id_with_format.split(".")[0]
-    cloudinary.uploader.destroy(public_id)
+    image = await get_image_by_id(image_id, db)
+    if image is None:
+        return None
+    key = storage.key_from_url(image.url)
+    if image.content_hash:
+        # Lock every image sharing the file. Uploads reusing it lock one of
+        # them, so they either commit before the check below or find no row
+        stmt = (
+            select(Image.id)
+            .filter_by(content_hash=image.content_hash)
+            .with_for_update()
+        )
+        await db.execute(stmt)
 
     # Delete the image from the database
     await db.delete(image)
-    user = await db.merge(user)
-    user.image_count -= 1
-    await db.commit()
-    await db.refresh(user)
+    await change_image_count(image.user_id, -1, db)
+    await db.flush()
+
+    # Delete the file from the storage once the deletion commits, unless
+    # another image still shares it
+    shared = False
+    if image.content_hash:
+        stmt = select(Image.id).filter_by(content_hash=image.content_hash).limit(1)
+        result = await db.execute(stmt)
+        shared = result.scalar_one_or_none() is not None
+    if not shared:
+        on_commit(db, partial(delete_stored, key))
     return image
 
 
+async def delete_stored(key: str) -> None:
+    """The delete_stored function removes a file whose image row has been deleted.
+        The deletion is already committed, so a storage error only leaves an orphaned file.
+
+    Args:
+        key (str): Storage key of the file.
+    """
+    try:
+        await storage.delete(key)
+    except Exception:
+        logger.warning("Cannot delete stored file %s", key, exc_info=True)
+
+
+def transformation_key(kind: str, transformations: dict) -> str:
+    """The transformation_key function canonicalizes transformation parameters into a stable key.
+        Unset parameters are dropped and enum values are stringified, so equal requests share a key.
+
+    Args:
+        kind (str): Kind of transformation, e.g. "transform" or "avatar".
+        transformations (dict): Transformation parameters.
+
+    Returns:
+        str: SHA-256 hex digest of the canonical parameters.
+    """
+    params = {key: str(value) for key, value in transformations.items() if value is not None}
+    canonical = json.dumps([kind, params], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
 async def save_transformed_image(
-    image_url: str, image_description: str, user: User, db: AsyncSession
+    image_url: str,
+    image_description: str,
+    user: User,
+    db: AsyncSession,
+    source_image_id: int | None = None,
+    params_key: str | None = None,
 ):
+    """The save_transformed_image function saves a transformed image and remembers the transformation.
+
+    Args:
+        image_url (str): URL of the transformed image.
+        image_description (str): Description of the transformed image.
+        user (User): Owner of the image.
+        db (AsyncSession): Pass in the database session.
+        source_image_id (int | None, optional): Image the transformation was applied to.
+        params_key (str | None, optional): Canonical transformation key, see transformation_key.
+
+    Returns:
+        Image: Transformed image
+    """
     image = Image(
         url=image_url,
         description=image_description,
@@ -173,43 +411,98 @@ async def save_transformed_image(
         updated_at=datetime.now(),
     )
     db.add(image)
-    user = await db.merge(user)
-    user.image_count += 1
-    await db.commit()
-    await db.refresh(user)
-    await db.refresh(image)
+    if source_image_id is not None:
+        await db.flush()
+        db.add(
+            ImageTransformation(
+                source_image_id=source_image_id,
+                image_id=image.id,
+                params_key=params_key,
+                url=image_url,
+            )
+        )
+    await change_image_count(user.id, 1, db)
+    await db.flush()
+    on_commit(db, feed_cache.invalidate)
     return image
 
 
-async def get_transformed_url(
-    image_id: int, transformations: dict, user: User, db: AsyncSession
-) -> str:
-    image = await get_image(image_id, db, user)
-    parts = image.url.split("/")
-    public_id_with_format = parts[-1]
-    trans_descriptions = parts[-2]
-    transformed_url = CloudinaryImage(public_id_with_format).build_url(
-        **transformations
+async def get_transformation_url(
+    source_image_id: int, params_key: str, db: AsyncSession
+) -> str | None:
+    """The get_transformation_url function returns the URL of an already saved transformation.
+
+    Args:
+        source_image_id (int): Image the transformation was applied to.
+        params_key (str): Canonical transformation key, see transformation_key.
+        db (AsyncSession): Pass in the database session.
+
+    Returns:
+        str | None: URL of the transformed image or None.
+    """
+    stmt = select(ImageTransformation.url).filter_by(
+        source_image_id=source_image_id, params_key=params_key
     )
-    new_image = await save_transformed_image(
-        transformed_url, trans_descriptions, user, db
+    result = await db.execute(stmt)
+    return result.scalar_one_or_none()
+
+
+async def _transform_image(
+    kind: str, image_id: int, transformations: dict, user: User, db: AsyncSession, **options
+) -> str:
+    image = await get_image(image_id, db, user, loaders=IMAGE_BARE_LOADERS)
+    params_key = transformation_key(kind, transformations)
+    cached_url = await get_transformation_url(image.id, params_key, db)
+    if cached_url is not None:
+        return cached_url
+    trans_descriptions = image.url.split("/")[-2]
+    transformed_url = await storage.transform(
+        storage.key_from_url(image.url), **options, **transformations
     )
+    try:
+        async with db.begin_nested():
+            new_image = await save_transformed_image(
+                transformed_url, trans_descriptions, user, db, image.id, params_key
+            )
+    except IntegrityError:
+        # A concurrent request saved the same transformation first
+        return await get_transformation_url(image.id, params_key, db)
     return new_image.url
 
 
+async def get_transformed_url(
+    image_id: int, transformations: dict, user: User, db: AsyncSession
+) -> str:
+    """The get_transformed_url function returns the URL of a transformed image.
+        An identical transformation of the same image is returned from the database without a write.
+
+    Args:
+        image_id (int): Source image.
+        transformations (dict): Transformation parameters.
+        user (User): Owner of the image.
+        db (AsyncSession): Pass in the database session.
+
+    Returns:
+        str: URL of the transformed image.
+    """
+    return await _transform_image("transform", image_id, transformations, user, db)
+
+
 async def get_foravatar_url(
     image_id: int, transformations: dict, user: User, db: AsyncSession
 ) -> str:
-    image = await get_image(image_id, db, user)
-    parts = image.url.split("/")
-    public_id_with_format = parts[-1]
-    trans_descriptions = parts[-2]
-    transformed_url = CloudinaryImage(public_id_with_format).build_url(
-        **transformations
-    )
-    piesces = transformed_url.split(".")
-    new_image_url = ".".join(piesces[:-1]) + ".png"
-    new_image = await save_transformed_image(
-        new_image_url, trans_descriptions, user, db
+    """The get_foravatar_url function returns the URL of an image transformed into a PNG avatar.
+        An identical transformation of the same image is returned from the database without a write.
+
+    Args:
+        image_id (int): Source image.
+        transformations (dict): Transformation parameters.
+        user (User): Owner of the image.
+        db (AsyncSession): Pass in the database session.
+
+    Returns:
+        str: URL of the avatar image.
+    """
+    return await _transform_image(
+        "avatar", image_id, transformations, user, db, format="png"
     )
-    return new_image.url
@@ -4,22 +4,33 @@ import qrcode
 from fastapi.responses import StreamingResponse
 from PIL import Image, ImageDraw, ImageFont
 
-
-def generate_qr_code_with_url(url: str) -> StreamingResponse:
-    """The generate_qr_code function generates a QR code from the given URL
+# Parameters of render_qr_code_with_url. They are part of the QR cache key,
+# so changing them invalidates every cached image.
+QR_RENDER_PARAMS = {
+    "version": 1,
+    "error_correction": "L",
+    "box_size": 10,
+    "border": 4,
+    "caption": True,
+}
+
+
+def render_qr_code_with_url(url: str) -> bytes:
+    """The render_qr_code_with_url function renders a QR code from the given URL
     and adds the URL as a caption below the QR code.
+        It is CPU bound and picklable, see services.qr for running it off the event loop.
 
     Args:
         url (str): The URL to encode in the QR code.
 
     Returns:
-        StreamingResponse: Containing the QR code image with URL caption.
+        bytes: PNG image of the QR code with URL caption.
     """
     qr = qrcode.QRCode(
-        version=1,
+        version=QR_RENDER_PARAMS["version"],
         error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size=10,
-        border=4,
+        box_size=QR_RENDER_PARAMS["box_size"],
+        border=QR_RENDER_PARAMS["border"],
     )
     qr.add_data(url)
     qr.make(fit=True)
@@ -49,9 +60,22 @@ def generate_qr_code_with_url(url: str) -> StreamingResponse:
 
     buf = BytesIO()
     new_img.save(buf, format="PNG")
-    buf.seek(0)
+    return buf.getvalue()
 
-    return StreamingResponse(buf, media_type="image/png")
+
+def generate_qr_code_with_url(url: str) -> StreamingResponse:
+    """The generate_qr_code function generates a QR code from the given URL
+    and adds the URL as a caption below the QR code.
+
+    Args:
+        url (str): The URL to encode in the QR code.
+
+    Returns:
+        StreamingResponse: Containing the QR code image with URL caption.
+    """
+    return StreamingResponse(
+        BytesIO(render_qr_code_with_url(url)), media_type="image/png"
+    )
 
 
 def generate_qr_code(url: str) -> StreamingResponse:
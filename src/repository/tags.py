@@ -22,7 +22,7 @@ async def create_tags(body: TagSchema, db: AsyncSession) -> List[Tag]:
     existing_tags_query = await db.execute(
         select(Tag).where(Tag.name.in_(body.tag_list))
     )
-    existing_tags = {tag.name for tag in existing_tags_query.scalars().all()}
+    existing_tags = {tag.name: tag for tag in existing_tags_query.scalars().all()}
     tags_in_db = []
     new_tags = []
     for tag_name in body.tag_list:
@@ -31,15 +31,10 @@ async def create_tags(body: TagSchema, db: AsyncSession) -> List[Tag]:
             db.add(new_tag)
             new_tags.append(new_tag)
         else:
-            tags_in_db.append(tag_name)
+            tags_in_db.append(existing_tags[tag_name])
 
-    await db.commit()
-    for new_tag in new_tags:
-        await db.refresh(new_tag)
-    for tag_name in tags_in_db:
-        tag = await get_tag(tag_name, db)
-        new_tags.append(tag)
-    return new_tags
+    await db.flush()
+    return new_tags + tags_in_db
 
 
 async def get_tags(skip: int, limit: int, db: AsyncSession) -> List[Tag]:
@@ -89,8 +84,7 @@ async def update_tag(tag_id: int, body: TagUpdateSchema, db: AsyncSession):
     tag = result.scalar_one_or_none()
     if tag:
         tag.name = body.name
-        await db.commit()
-        await db.refresh(tag)
+        await db.flush()
     return tag
 
 
@@ -109,7 +103,7 @@ async def remove_tag(tag_id: int, db: AsyncSession):
     tag = result.scalar_one_or_none()
     if tag:
         await db.delete(tag)
-        await db.commit()
+        await db.flush()
     return tag
 
 
@@ -165,13 +159,11 @@ async def add_tags_for_image(
         if values:
             stmt = image_tag_table.insert().values(values)
             try:
-                await db.execute(stmt)
-                await db.commit()
+                # A savepoint keeps the created tags if the links fail
+                async with db.begin_nested():
+                    await db.execute(stmt)
             except IntegrityError:
-                await (
-                    db.rollback()
-                )  # обробка помилки, якщо тег вже доданий до зображення
-                pass
+                pass  # обробка помилки, якщо тег вже доданий до зображення
 
         return created_tags
 
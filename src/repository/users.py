@@ -1,11 +1,14 @@
+from functools import partial
+
 from fastapi import Depends, HTTPException, status
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.conf import messages
-from src.database.db import get_db
+from src.database.db import get_db, on_commit
 from src.entity.models import Role, User
 from src.schemas.user import UserSchema, UserUpdate
+from src.services.user_cache import user_cache
 
 
 async def get_user_by_email(email: str, db: AsyncSession = Depends(get_db)):
@@ -54,8 +57,7 @@ async def create_user(body: UserSchema, db: AsyncSession = Depends(get_db)):
     """
     new_user = User(**body.model_dump())
     db.add(new_user)
-    await db.commit()
-    await db.refresh(new_user)
+    await db.flush()
     return new_user
 
 
@@ -71,7 +73,8 @@ async def confirmed_email(email: str, db: AsyncSession) -> None:
     """
     user = await get_user_by_email(email, db)
     user.confirmed = True
-    await db.commit()
+    await db.flush()
+    on_commit(db, partial(user_cache.invalidate, email))
 
 
 async def update_avatar_url(email: str, url: str | None, db: AsyncSession) -> User:
@@ -87,8 +90,8 @@ async def update_avatar_url(email: str, url: str | None, db: AsyncSession) -> Us
     """
     user = await get_user_by_email(email, db)
     user.avatar = url
-    await db.commit()
-    await db.refresh(user)
+    await db.flush()
+    on_commit(db, partial(user_cache.invalidate, email))
     return user
 
 
@@ -106,8 +109,8 @@ async def update_password(
         USer: User with updated password.
     """
     user.password = new_password
-    await db.commit()
-    await db.refresh(user)
+    await db.flush()
+    on_commit(db, partial(user_cache.invalidate, user.email))
     return user
 
 
@@ -124,12 +127,15 @@ async def update_user(
     Returns:
         User: Updated user.
     """
+    old_email = user.email
     if user_update.username:
         user.username = user_update.username
     if user_update.email:
         user.email = user_update.email
-    await db.commit()
-    await db.refresh(user)
+    await db.flush()
+    on_commit(db, partial(user_cache.invalidate, old_email))
+    if user.email != old_email:
+        on_commit(db, partial(user_cache.invalidate, user.email))
     return user
 
 
@@ -152,8 +158,8 @@ async def set_user_status(
             status_code=status.HTTP_404_NOT_FOUND, detail=messages.USER_NOT_FOUND
         )
     user.is_active = set_status
-    await db.commit()
-    await db.refresh(user)
+    await db.flush()
+    on_commit(db, partial(user_cache.invalidate, email))
     return user
 
 
@@ -177,18 +183,6 @@ async def update_user_role(
         )
     if update_role:
         user.role = update_role
-    await db.commit()
-    await db.refresh(user)
+    await db.flush()
+    on_commit(db, partial(user_cache.invalidate, email))
     return user
-
-
-async def update_token(user: User, token: str | None, db: AsyncSession):
-    """The update_token function updates the user's token in database.
-
-    Args:
-        user (User): Current user.
-        token (str | None): Current user's token.
-        db (AsyncSession): Pass in the database session to the function.
-    """
-    user.access_token = token
-    await db.commit()
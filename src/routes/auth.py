@@ -1,4 +1,3 @@
-from pathlib import Path
 
 from fastapi import (
     APIRouter,
@@ -14,11 +13,9 @@ from fastapi.security import (
     HTTPBearer,
     OAuth2PasswordRequestForm,
 )
-from fastapi.templating import Jinja2Templates
-from fastapi_limiter.depends import RateLimiter
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.database.db import get_db
+from src.database.db import UnitOfWorkRoute, get_db
 from src.repository import users as repositories_users
 from src.schemas.user import (
     RequestEmail,
@@ -29,21 +26,19 @@ from src.schemas.user import (
 )
 from src.services.auth import auth_service
 from src.services.email import send_email, send_reset_password_email
+from src.services.rate_limit import rate_limit
+from src.services.rendering import renderer
 from src.conf import messages
 
-router = APIRouter(prefix="/auth", tags=["auth"])
+router = APIRouter(prefix="/auth", tags=["auth"], route_class=UnitOfWorkRoute)
 get_refresh_token = HTTPBearer()
 
-BASE_DIR = Path("src/services")
-
-templates = Jinja2Templates(directory=BASE_DIR / "templates")
-
 
 @router.post(
     "/signup",
     response_model=UserResponse,
     status_code=status.HTTP_201_CREATED,
-    dependencies=[Depends(RateLimiter(times=5, seconds=60))],
+    dependencies=[Depends(rate_limit("auth.signup"))],
 )
 async def signup(
     body: UserSchema,
@@ -65,7 +60,7 @@ async def signup(
     exist_user = await repositories_users.get_user_by_email(body.email, db)
     if exist_user:
         raise HTTPException(status_code=409, detail=messages.ACCOUNT_EXIST)
-    body.password = auth_service.get_password_hash(body.password)
+    body.password = await auth_service.hash_password(body.password)
     new_user = await repositories_users.create_user(body, db)
     bt.add_task(send_email, new_user.email, new_user.username, str(request.base_url))
     return new_user
@@ -74,7 +69,7 @@ async def signup(
 @router.post(
     "/login",
     response_model=TokenSchema,
-    dependencies=[Depends(RateLimiter(times=5, seconds=60))],
+    dependencies=[Depends(rate_limit("auth.login"))],
 )
 async def login(
     body: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)
@@ -93,20 +88,43 @@ async def login(
         raise HTTPException(status_code=401, detail=messages.INVALID_EMAIL)
     if not user.confirmed:
         raise HTTPException(status_code=401, detail=messages.NOT_CONFIRMED)
-    if not auth_service.verify_password(body.password, user.password):
+    verified, new_hash = await auth_service.verify_and_update_password(
+        body.password, user.password
+    )
+    if not verified:
         raise HTTPException(status_code=401, detail=messages.INVALID_PASSWORD)
     if not user.is_active:
         raise HTTPException(status_code=401, detail=messages.ACTIVE_STATUS)
+    if new_hash is not None:
+        # The stored hash uses outdated cost parameters
+        await repositories_users.update_password(user, new_hash, db)
     access_token = await auth_service.create_access_token(data={"sub": user.email})
-
-    await repositories_users.update_token(user, access_token, db)
-
     return {
         "access_token": access_token,
         "token_type": "bearer",
     }
 
 
+@router.post("/logout")
+async def logout(token: str = Depends(auth_service.oauth2_scheme)):
+    """The logout function revokes the access token of the request.
+        The token stays revoked on every worker until it expires.
+
+    Args:
+        token (str, optional): Access token from the Authorization header.
+
+    Returns:
+        Dict: A dict with a message.
+    """
+    if not await auth_service.revoke_access_token(token):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=messages.INVALID_TOKEN,
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return {"message": messages.LOGGED_OUT}
+
+
 @router.get("/confirmed_email/{token}")
 async def confirmed_email(token: str, db: AsyncSession = Depends(get_db)):
     """The confirmed_email function is used to confirm a user's email address.
@@ -228,7 +246,7 @@ async def reset_password_confirm(
         )
 
     await repositories_users.update_password(
-        user, auth_service.get_password_hash(new_password), db
+        user, await auth_service.hash_password(new_password), db
     )
     return {"message": messages.PASSWORD_RESET_SUCCESS}
 
@@ -243,8 +261,8 @@ async def password_reset_form(request: Request, token: str):
         token (str): Pass the token to the template.
 
     Returns:
-        TemplateResponse: A templateresponse object
+        HTMLResponse: The rendered form.
     """
-    return templates.TemplateResponse(
-        "password_reset_form.html", {"request": request, "token": token}
+    return HTMLResponse(
+        await renderer.render("password_reset_form.html", request=request, token=token)
     )
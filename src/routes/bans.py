@@ -0,0 +1,71 @@
+import math
+from datetime import datetime
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, status
+
+from src.conf import messages
+from src.schemas.ban import BanResponse, BanSchema
+from src.services.auth import role_required
+from src.services.bans import ban_list
+
+router = APIRouter(
+    prefix="/bans", tags=["bans"], dependencies=[Depends(role_required(["admin"]))]
+)
+
+
+def ban_response(network: str, expires_at: float) -> BanResponse:
+    return BanResponse(
+        network=network,
+        expires_at=None if math.isinf(expires_at) else datetime.fromtimestamp(expires_at),
+    )
+
+
+@router.get("/", response_model=List[BanResponse])
+async def read_bans():
+    """The read_bans function lists the bans that can be lifted.
+
+    Returns:
+        List[BanResponse]: Banned networks with their expiry, None if permanent.
+    """
+    return [
+        ban_response(network, expires_at)
+        for network, expires_at in sorted(ban_list.networks().items())
+    ]
+
+
+@router.post("/", response_model=BanResponse, status_code=status.HTTP_201_CREATED)
+async def create_ban(body: BanSchema):
+    """The create_ban function bans an address or a CIDR network on every worker.
+
+    Args:
+        body (BanSchema): Network and optional ban duration in seconds.
+
+    Returns:
+        BanResponse: The ban.
+    """
+    network = await ban_list.ban(body.network, body.ttl)
+    return ban_response(network, ban_list.networks().get(network, math.inf))
+
+
+@router.delete("/")
+async def delete_ban(network: str):
+    """The delete_ban function lifts a ban.
+
+    Args:
+        network (str): Banned address or network.
+
+    Returns:
+        Dict: A dict with a message.
+    """
+    try:
+        removed = await ban_list.unban(network)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=messages.INVALID_NETWORK
+        )
+    if not removed:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=messages.BAN_NOT_FOUND
+        )
+    return {"message": messages.BAN_LIFTED}
@@ -1,9 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi_limiter.depends import RateLimiter
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.conf import messages
-from src.database.db import get_db
+from src.database.db import UnitOfWorkRoute, get_db, on_commit
 from src.entity.models import Comment, User
 from src.repository import comments as repositories_comments
 from src.schemas.comments import (
@@ -11,9 +10,10 @@ from src.schemas.comments import (
     CommentResponse,
 )
 from src.services.auth import auth_service, role_required
+from src.services.feed_cache import feed_cache
 
 
-router = APIRouter(prefix="/comments", tags=["comments"])
+router = APIRouter(prefix="/comments", tags=["comments"], route_class=UnitOfWorkRoute)
 
 
 @router.post("/create", response_model=CommentResponse)
@@ -35,6 +35,7 @@ async def create_comment(
         Comment: Created comment.
     """
     new_comment = await repositories_comments.create_comment(image_id, current_user, comment, db)
+    on_commit(db, feed_cache.invalidate)
     return new_comment
 
 
@@ -60,6 +61,7 @@ async def update_comment(
     new_comment = await repositories_comments.update_comment(comment_id, comment, db)
     if new_comment is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=messages.COMMENT_NOT_FOUND)
+    on_commit(db, feed_cache.invalidate)
     return new_comment
 
 
@@ -80,4 +82,5 @@ async def delete_comment(
     new_comment = await repositories_comments.delete_comment(comment_id, db)
     if new_comment is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=messages.COMMENT_NOT_FOUND)
+    on_commit(db, feed_cache.invalidate)
     return "Comment deleted successfully"
\ No newline at end of file
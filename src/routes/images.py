@@ -1,4 +1,5 @@
-from typing import List
+import logging
+from typing import List, Optional
 
 from fastapi import (
     APIRouter,
@@ -8,27 +9,75 @@ from fastapi import (
     Depends,
     HTTPException,
     Query,
+    Request,
     status,
 )
 
+from fastapi.responses import Response
+from pydantic import TypeAdapter
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.entity.models import User
-from src.database.db import get_db
+from src.database.db import UnitOfWorkRoute, get_db, get_read_db, on_commit
 from src.repository import images as repository_images
 
 from src.schemas.image import (
+    ImageBatchItem,
+    ImageBatchResponse,
     ImageUpdateSchema,
     ImageResponse,
+    ImagePageResponse,
     ImageCreate,
     Transformation,
     Roundformation,
 )
 from src.services.auth import auth_service, image_owner_or_admin
+from src.services.feed_cache import feed_cache
+from src.services.qr import QRQueueFull, qr_renderer
+from src.services.qr_cache import etag_matches, qr_cache
 from src.conf import messages
-from src.repository.qr import generate_qr_code_with_url
+from src.conf.config import config
 
-router = APIRouter(prefix="/images", tags=["images"])
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/images", tags=["images"], route_class=UnitOfWorkRoute)
+
+# Serializes cached /show/ pages the way response_model would
+IMAGE_LIST = TypeAdapter(List[ImageResponse])
+
+
+async def qr_code_response(url: str, if_none_match: str | None = None) -> Response:
+    """The qr_code_response function returns the QR code for the URL.
+        A client holding the current version gets 304, otherwise the image comes from
+        the QR cache or is rendered on the QR process pool and cached.
+
+    Args:
+        url (str): The URL to encode in the QR code.
+        if_none_match (str | None, optional): If-None-Match header of a GET request.
+            Endpoints with side effects must not pass it, they always answer in full.
+
+    Raises:
+        HTTPException: 503 if the renderer queue is full.
+
+    Returns:
+        Response: PNG image of the QR code or an empty 304 response.
+    """
+    key = qr_cache.key(url)
+    headers = {"ETag": qr_cache.etag(key), "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    png = await qr_cache.get(key)
+    if png is None:
+        try:
+            png = await qr_renderer.render(url)
+        except QRQueueFull:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=messages.QR_QUEUE_FULL,
+                headers={"Retry-After": "1"},
+            )
+        await qr_cache.set(key, png)
+    return Response(content=png, media_type="image/png", headers=headers)
 
 
 @router.post("/upload/", response_model=ImageCreate, status_code=201)
@@ -38,7 +87,7 @@ async def upload_image(
     db: AsyncSession = Depends(get_db),
     user: User = Depends(auth_service.get_current_user),
 ):
-    """The upload_image function uploads an image to Cloudinary and saves the image URL and description to the database.
+    """The upload_image function uploads an image to the storage and saves the image URL and description to the database.
 
     Args:
         file (UploadFile, optional): The image file to upload.
@@ -50,13 +99,76 @@ async def upload_image(
         ImageCreate: Created image.
     """
     result = await repository_images.upload_image(file.file, description, db, user)
+    on_commit(db, feed_cache.invalidate)
     return result
 
 
+@router.post("/upload/batch/", response_model=ImageBatchResponse, status_code=201)
+async def upload_images(
+    files: List[UploadFile] = File(...),
+    descriptions: List[str] = Form([]),
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(auth_service.get_current_user),
+):
+    """The upload_images function uploads several images in one request.
+        Files go to the storage concurrently and all images are saved in one transaction.
+        A file that fails to upload is reported in its item and does not fail the request.
+
+    Args:
+        files (List[UploadFile], optional): The image files to upload.
+        descriptions (List[str], optional): Description of each file, the file name is used when omitted.
+        db (AsyncSession, optional): Pass in the database session.
+        user (User, optional): Current user.
+
+    Returns:
+        ImageBatchResponse: Result of every file, in upload order.
+    """
+    if len(files) > config.UPLOAD_BATCH_MAX_FILES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=messages.TOO_MANY_FILES
+        )
+    if descriptions and len(descriptions) != len(files):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=messages.DESCRIPTIONS_MISMATCH,
+        )
+    descriptions = descriptions or [file.filename or "" for file in files]
+    results = await repository_images.upload_images(
+        [(file.file, description) for file, description in zip(files, descriptions)],
+        db,
+        user,
+        config.UPLOAD_BATCH_CONCURRENCY,
+    )
+    items = []
+    for file, result in zip(files, results):
+        if isinstance(result, BaseException):
+            logger.warning(
+                "Upload of %r failed", file.filename, exc_info=result
+            )
+            items.append(
+                ImageBatchItem(filename=file.filename, error=messages.UPLOAD_FAILED)
+            )
+        else:
+            items.append(
+                ImageBatchItem(
+                    filename=file.filename,
+                    image=ImageCreate.model_validate(result, from_attributes=True),
+                )
+            )
+    created = sum(item.image is not None for item in items)
+    if created:
+        on_commit(db, feed_cache.invalidate)
+    return ImageBatchResponse(
+        created=created, failed=len(items) - created, items=items
+    )
+
+
 @router.put(
     "/update/{image_id}",
     response_model=ImageResponse,
-    dependencies=[Depends(image_owner_or_admin)],
+    dependencies=[
+        Depends(image_owner_or_admin(repository_images.IMAGE_RESPONSE_LOADERS))
+    ],
 )
 async def update_image(
     body: ImageUpdateSchema, image_id: int, db: AsyncSession = Depends(get_db)
@@ -76,6 +188,7 @@ async def update_image(
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail=messages.IMAGE_NOT_FOUND
         )
+    on_commit(db, feed_cache.invalidate)
     return image
 
 
@@ -83,7 +196,7 @@ async def update_image(
 async def get_all_images(
     limit: int = Query(10, ge=10, le=500),
     offset: int = Query(0, ge=0, le=10),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     """The get_all_images function displays a list of images with specified pagination parameters.
 
@@ -95,14 +208,62 @@ async def get_all_images(
     Returns:
         List: List of image objects.
     """
-    result = await repository_images.get_all_images(limit, offset, db)
-    return result
+    # Right after a write, a page read from a replica is served but not cached
+    page, generation = await feed_cache.get(
+        "json", limit, offset, None, replica=db.info.get("replica", False)
+    )
+    if page is None:
+        images = await repository_images.get_all_images(limit, offset, db)
+        page = IMAGE_LIST.dump_json(
+            IMAGE_LIST.validate_python(images, from_attributes=True)
+        ).decode()
+        await feed_cache.set(generation, "json", limit, offset, None, page)
+    return Response(content=page, media_type="application/json")
+
+
+@router.get("/feed/", response_model=ImagePageResponse)
+async def get_image_feed(
+    limit: int = Query(10, ge=10, le=500),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db),
+):
+    """The get_image_feed function displays a page of images with keyset pagination.
+        Pass the returned next_cursor back as cursor to fetch the following page.
+
+    Args:
+        limit (int): The maximum number of images to return.
+        cursor (Optional[str]): Opaque cursor of the previous page, the first page if omitted.
+        db (AsyncSession): Pass in the database session.
+
+    Returns:
+        ImagePageResponse: Page of image objects with the cursor of the next page.
+    """
+    page, generation = await feed_cache.get(
+        "page", limit, 0, cursor, replica=db.info.get("replica", False)
+    )
+    if page is None:
+        try:
+            images = await repository_images.get_all_images(limit, 0, db, cursor)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail=messages.INVALID_CURSOR
+            )
+        next_cursor = (
+            repository_images.encode_cursor(images[-1])
+            if len(images) == limit
+            else None
+        )
+        page = ImagePageResponse.model_validate(
+            {"items": images, "next_cursor": next_cursor}, from_attributes=True
+        ).model_dump_json()
+        await feed_cache.set(generation, "page", limit, 0, cursor, page)
+    return Response(content=page, media_type="application/json")
 
 
 @router.get("/", response_model=ImageResponse)
 async def get_image(
     image_id: int,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     user: User = Depends(auth_service.get_current_user),
 ):
     """The get_image function displays specific user's image.
@@ -123,12 +284,12 @@ async def get_image(
     return result
 
 
-@router.delete("/{image_id}", dependencies=[Depends(image_owner_or_admin)])
+@router.delete("/{image_id}", dependencies=[Depends(image_owner_or_admin())])
 async def delete_image(
     image_id: int,
     db: AsyncSession = Depends(get_db),
 ):
-    """The delete_image  function deletes an image from Cloudinary and the database.
+    """The delete_image  function deletes an image from the storage and the database.
 
     Args:
         image_id (int): Pass in the image object in database.
@@ -142,18 +303,25 @@ async def delete_image(
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail=messages.IMAGE_NOT_FOUND
         )
+    on_commit(db, feed_cache.invalidate)
     return {"message": "Image deleted successfully"}
 
 
 @router.get("/qr_code")
 async def get_qr_code(
     image_id: int,
-    db: AsyncSession = Depends(get_db),
+    request: Request,
+    db: AsyncSession = Depends(get_read_db),
     user: User = Depends(auth_service.get_current_user),
 ):
-    image = await repository_images.get_image(image_id, db, user)
-    qr_code = generate_qr_code_with_url(image.url)
-    return qr_code
+    image = await repository_images.get_image(
+        image_id, db, user, loaders=repository_images.IMAGE_BARE_LOADERS
+    )
+    if image is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=messages.IMAGE_NOT_FOUND
+        )
+    return await qr_code_response(image.url, request.headers.get("if-none-match"))
 
 
 @router.post("/transform")
@@ -167,8 +335,7 @@ async def transform_image_endpoint(
     transformed_url = await repository_images.get_transformed_url(
         image_id, transformations, user, db
     )
-    qr_code = generate_qr_code_with_url(transformed_url)
-    return qr_code
+    return await qr_code_response(transformed_url)
 
 
 @router.post("/transform/avatar")
@@ -182,5 +349,4 @@ async def transform_image_for_avatar(
     transformed_url = await repository_images.get_foravatar_url(
         image_id, transformations, user, db
     )
-    qr_code = generate_qr_code_with_url(transformed_url)
-    return qr_code
+    return await qr_code_response(transformed_url)
@@ -0,0 +1,165 @@
+import mimetypes
+import os
+from email.utils import formatdate
+from urllib.parse import urlsplit
+
+import anyio
+from fastapi import APIRouter, HTTPException, Request, Response, status
+from starlette.types import Receive, Scope, Send
+
+from src.conf.config import config
+from src.services.storage import LocalStorage, storage
+
+# Served under the path of LOCAL_STORAGE_URL, so the URLs LocalStorage
+# builds resolve here; of a full URL, e.g. behind a CDN, only the path counts
+router = APIRouter(
+    prefix=urlsplit(config.LOCAL_STORAGE_URL).path.rstrip("/") or "/media",
+    tags=["media"],
+)
+
+
+class FileRangeResponse(Response):
+    """ASGI response sending a byte range of a file.
+
+    Uses the zero-copy send extension (sendfile) when the server offers it,
+    and falls back to chunked reads otherwise.
+    """
+
+    chunk_size = 64 * 1024
+
+    def __init__(
+        self,
+        path: str,
+        start: int,
+        end: int,
+        size: int,
+        status_code: int,
+        headers: dict,
+    ):
+        self.background = None
+        self.path = path
+        self.start = start
+        self.count = end - start + 1
+        self.status_code = status_code
+        headers = {**headers, "content-length": str(self.count)}
+        if status_code == status.HTTP_206_PARTIAL_CONTENT:
+            headers["content-range"] = f"bytes {start}-{end}/{size}"
+        self.raw_headers = [
+            (name.encode("latin-1"), value.encode("latin-1"))
+            for name, value in headers.items()
+        ]
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send(
+            {
+                "type": "http.response.start",
+                "status": self.status_code,
+                "headers": self.raw_headers,
+            }
+        )
+        if scope["method"] == "HEAD":
+            await send({"type": "http.response.body", "body": b""})
+            return
+        if "http.response.zerocopysend" in scope.get("extensions", {}):
+            with open(self.path, "rb") as file:
+                await send(
+                    {
+                        "type": "http.response.zerocopysend",
+                        "file": file,
+                        "offset": self.start,
+                        "count": self.count,
+                    }
+                )
+            return
+        async with await anyio.open_file(self.path, "rb") as file:
+            await file.seek(self.start)
+            remaining = self.count
+            more_body = True
+            while more_body:
+                chunk = await file.read(min(self.chunk_size, remaining))
+                remaining -= len(chunk)
+                more_body = remaining > 0 and len(chunk) > 0
+                await send(
+                    {
+                        "type": "http.response.body",
+                        "body": chunk,
+                        "more_body": more_body,
+                    }
+                )
+
+
+def parse_range(header: str, size: int) -> tuple[int, int]:
+    """The parse_range function parses a single-range Range header.
+
+    Args:
+        header (str): Range header value, e.g. "bytes=0-1023" or "bytes=-500".
+        size (int): File size.
+
+    Raises:
+        ValueError: If the range is malformed or not satisfiable.
+
+    Returns:
+        tuple[int, int]: First and last byte positions, inclusive.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip() != "bytes" or "," in spec:
+        raise ValueError(header)
+    first, _, last = spec.strip().partition("-")
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        start = max(size - int(last), 0)
+        end = size - 1
+    if start > end or start >= size:
+        raise ValueError(header)
+    return start, end
+
+
+@router.api_route("/{key:path}", methods=["GET", "HEAD"])
+async def get_media(key: str, request: Request):
+    """The get_media function serves a file of the local storage backend with Range support.
+
+    Args:
+        key (str): Storage key of the file.
+        request (Request): Incoming request with an optional Range header.
+
+    Returns:
+        FileRangeResponse: Whole file or the requested byte range.
+    """
+    if not isinstance(storage, LocalStorage):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    name = key.rpartition("/")[2]
+    if name.startswith(".") and name.endswith(".tmp"):
+        # A file still being written by atomic_path, never a stored key
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    try:
+        path = storage.path(key)
+        stat = os.stat(path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    if not path.is_file():
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    size = stat.st_size
+    headers = {
+        "accept-ranges": "bytes",
+        "content-type": mimetypes.guess_type(path.name)[0]
+        or "application/octet-stream",
+        "last-modified": formatdate(stat.st_mtime, usegmt=True),
+        "etag": f'"{stat.st_mtime_ns:x}-{size:x}"',
+    }
+    range_header = request.headers.get("range")
+    if range_header is None or size == 0:
+        return FileRangeResponse(
+            str(path), 0, size - 1, size, status.HTTP_200_OK, headers
+        )
+    try:
+        start, end = parse_range(range_header, size)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            headers={"content-range": f"bytes */{size}"},
+        )
+    return FileRangeResponse(
+        str(path), start, end, size, status.HTTP_206_PARTIAL_CONTENT, headers
+    )
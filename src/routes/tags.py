@@ -5,18 +5,19 @@ from pydantic import ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.conf import messages
-from src.database.db import get_db
+from src.database.db import UnitOfWorkRoute, get_db, get_read_db, on_commit
 from src.entity.models import User
 from src.repository import tags as repository_tags
 from src.schemas.tag import TagResponse, TagSchema, TagUpdateSchema
 from src.services.auth import auth_service, role_required
+from src.services.feed_cache import feed_cache
 
-router = APIRouter(prefix="/tags", tags=["tags"])
+router = APIRouter(prefix="/tags", tags=["tags"], route_class=UnitOfWorkRoute)
 
 
 @router.get("/", response_model=List[TagResponse])
 async def read_tags(
-    skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_db)
+    skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_read_db)
 ):
     """The get_tags function displays existing tags.
 
@@ -37,7 +38,7 @@ async def read_tags(
 
 
 @router.get("/{tag_name}", response_model=TagResponse)
-async def read_tag(tag_name: str, db: AsyncSession = Depends(get_db)):
+async def read_tag(tag_name: str, db: AsyncSession = Depends(get_read_db)):
     """The get_tag function displays a tag by given name.
 
     Args:
@@ -97,6 +98,7 @@ async def update_tag(
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail=messages.TAG_NOT_FOUND
         )
+    on_commit(db, feed_cache.invalidate)
     return tag
 
 
@@ -120,6 +122,7 @@ async def remove_tag(tag_id: int = Path(ge=1), db: AsyncSession = Depends(get_db
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail=messages.TAG_NOT_FOUND
         )
+    on_commit(db, feed_cache.invalidate)
     return tag
 
 
@@ -152,4 +155,5 @@ async def add_tags_for_image_route(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Photo not found or does not belong to the user",
         )
+    on_commit(db, feed_cache.invalidate)
     return {"message": "Tags added successfully"}
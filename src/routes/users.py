@@ -1,13 +1,7 @@
-import pickle
-
-import cloudinary
-import cloudinary.uploader
 from fastapi import APIRouter, Depends, File, UploadFile, HTTPException, status
-from fastapi_limiter.depends import RateLimiter
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.conf.config import config
-from src.database.db import get_db
+from src.database.db import UnitOfWorkRoute, get_db, get_read_db
 from src.entity.models import User, Role
 from src.repository import users as repositories_users
 from src.schemas.user import (
@@ -17,22 +11,20 @@ from src.schemas.user import (
     UserActiveResponse
 )
 from src.services.auth import auth_service, role_required
+from src.services.rate_limit import rate_limit
+from src.services.storage import storage
 
-router = APIRouter(prefix="/users", tags=["users"])
-cloudinary.config(
-    cloud_name=config.CLOUDINARY_NAME,
-    api_key=config.CLOUDINARY_API_KEY,
-    api_secret=config.CLOUDINARY_API_SECRET,
-    secure=True,
-)
+router = APIRouter(prefix="/users", tags=["users"], route_class=UnitOfWorkRoute)
 
 
 @router.get(
     "/profile/{email}",
     response_model=UserPublicResponse,
-    dependencies=[Depends(RateLimiter(times=1, seconds=20))],
+    dependencies=[Depends(rate_limit("users.profile"))],
 )
-async def read_user_profile(email: str, db: AsyncSession = Depends(get_db)) -> User:
+async def read_user_profile(
+    email: str, db: AsyncSession = Depends(get_read_db)
+) -> User:
     """The  read_user_profile function displays the user profile by email.
 
     Args:
@@ -53,10 +45,11 @@ async def read_user_profile(email: str, db: AsyncSession = Depends(get_db)) -> U
 @router.get(
     "/me",
     response_model=UserResponse,
-    dependencies=[Depends(RateLimiter(times=1, seconds=20))],
+    dependencies=[Depends(rate_limit("users.me", per_user=True))],
 )
 async def get_current_user(
     user: User = Depends(auth_service.get_current_active_user),
+    db: AsyncSession = Depends(get_db),
 ) -> User:
     """The get_current_user function is a dependency that will be injected into the
         get_current_user endpoint. It uses the auth_service to retrieve the current user,
@@ -64,17 +57,18 @@ async def get_current_user(
 
     Args:
         user (User, optional): Get the current user.
+        db (AsyncSession, optional): Pass the database session to the function.
 
     Returns:
         User: Current user.
     """
-    return user
+    return await repositories_users.get_user_by_email(user.email, db)
 
 
 @router.put(
     "/me",
     response_model=UserResponse,
-    dependencies=[Depends(RateLimiter(times=1, seconds=20))],
+    dependencies=[Depends(rate_limit("users.update", per_user=True))],
 )
 async def update_current_user(
     user_update: UserUpdate,
@@ -93,7 +87,7 @@ async def update_current_user(
     Returns:
         User: Updated user.
     """
-    current_user = await db.merge(current_user)
+    current_user = await repositories_users.get_user_by_email(current_user.email, db)
     user = await repositories_users.update_user(current_user, user_update, db)
     return user
 
@@ -148,7 +142,7 @@ async def unbun_user(
 @router.patch(
     "/avatar",
     response_model=UserResponse,
-    dependencies=[Depends(RateLimiter(times=1, seconds=20))],
+    dependencies=[Depends(rate_limit("users.avatar", per_user=True))],
 )
 async def avatar_user(
     file: UploadFile = File(),
@@ -169,13 +163,11 @@ async def avatar_user(
         User: An object of type user
     """
     public_id = f"restapp/{user.email}"
-    res = cloudinary.uploader.upload(file.file, public_id=public_id, owerite=True)
-    res_url = cloudinary.CloudinaryImage(public_id).build_url(
-        width=250, height=250, crop="fill", version=res.get("version")
+    stored = await storage.put(file.file, key=public_id)
+    res_url = await storage.transform(
+        stored.key, width=250, height=250, crop="fill", version=stored.version
     )
     user = await repositories_users.update_avatar_url(user.email, res_url, db)
-    auth_service.cache.set(user.email, pickle.dumps(user))
-    auth_service.cache.expire(user.email, 300)
     return user
 
 
@@ -0,0 +1,20 @@
+from datetime import datetime
+from ipaddress import ip_network
+from typing import Optional
+
+from pydantic import BaseModel, Field, field_validator
+
+
+class BanSchema(BaseModel):
+    network: str = Field(examples=["203.0.113.7", "203.0.113.0/24"])
+    ttl: Optional[int] = Field(None, gt=0)
+
+    @field_validator("network")
+    @classmethod
+    def validate_network(cls, value: str) -> str:
+        return str(ip_network(value, strict=False))
+
+
+class BanResponse(BaseModel):
+    network: str
+    expires_at: Optional[datetime] = None
@@ -17,6 +17,16 @@ class ImageCreate(BaseModel):
     description: str
     created_at: datetime
 
+class ImageBatchItem(BaseModel):
+    filename: Optional[str] = None
+    image: Optional[ImageCreate] = None
+    error: Optional[str] = None
+
+class ImageBatchResponse(BaseModel):
+    created: int
+    failed: int
+    items: List[ImageBatchItem]
+
 class ImageUpdateSchema(BaseModel):
     description: Optional[str] = None
 
@@ -31,6 +41,11 @@ class ImageResponse(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class ImagePageResponse(BaseModel):
+    items: List[ImageResponse]
+    next_cursor: Optional[str] = None
+
+
 class CropEnum(str, Enum):
     thumb = "thumb"
     crop = "crop"
@@ -0,0 +1,132 @@
+import time
+import uuid
+from collections import OrderedDict, deque
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from src.conf.config import config
+from src.services.bans import BanList, BanSnapshot, IPAddress, ban_list
+
+
+class AbuseDetector:
+    """Bans clients that keep failing authentication or hitting rate limits.
+
+    Every response with one of status_codes (401 from login and token
+    checks, 403 from permission checks, 429 from the rate limiter) counts as
+    a failure of the client address. Failures are kept in a sliding window
+    log per address, a Redis sorted set shared by all workers or a deque in
+    process without Redis. Once an address reaches threshold failures within
+    window seconds it is banned for ban_ttl seconds, so the ban middleware
+    rejects its requests before they reach routes, e.g. before login spends
+    a bcrypt round on a stuffed password. Addresses in exempt_networks are
+    never counted.
+    """
+
+    prefix = "abuse:"
+
+    def __init__(
+        self,
+        bans: BanList,
+        threshold: int,
+        window: float,
+        ban_ttl: int,
+        status_codes: list[int],
+        exempt_networks: list[str],
+        max_entries: int,
+    ):
+        self.redis: Redis | None = None
+        self.bans = bans
+        self.threshold = threshold
+        self.window = window
+        self.ban_ttl = ban_ttl
+        self.status_codes = frozenset(status_codes)
+        self.exempt = BanSnapshot(exempt_networks)
+        self.max_entries = max_entries
+        self._windows: OrderedDict[str, deque] = OrderedDict()
+        self.failures = 0
+        self.banned = 0
+
+    def init(self, redis: Redis) -> None:
+        """The init function attaches the Redis client that keeps the failure windows.
+
+        Args:
+            redis (Redis): Async Redis client.
+        """
+        self.redis = redis
+
+    def _count_local(self, key: str, now: float) -> int:
+        window = self._windows.get(key)
+        if window is None:
+            window = self._windows[key] = deque()
+            while len(self._windows) > self.max_entries:
+                self._windows.popitem(last=False)
+        self._windows.move_to_end(key)
+        while window and window[0] <= now - self.window:
+            window.popleft()
+        window.append(now)
+        return len(window)
+
+    async def _count(self, key: str, now: float) -> int:
+        if self.redis is not None:
+            try:
+                async with self.redis.pipeline(transaction=True) as pipe:
+                    pipe.zremrangebyscore(key, "-inf", now - self.window)
+                    pipe.zadd(key, {uuid.uuid4().hex: now})
+                    pipe.zcard(key)
+                    pipe.expire(key, int(self.window) + 1)
+                    _, _, count, _ = await pipe.execute()
+                return int(count)
+            except RedisError as err:
+                print(err)
+        return self._count_local(key, now)
+
+    async def _reset(self, key: str) -> None:
+        self._windows.pop(key, None)
+        if self.redis is not None:
+            await self.redis.delete(key)
+
+    def watches(self, status_code: int) -> bool:
+        return status_code in self.status_codes
+
+    async def record(self, address: IPAddress | None) -> bool:
+        """The record function counts a failed request and bans the client once it reaches the threshold.
+
+        Args:
+            address (IPAddress | None): Client address.
+
+        Returns:
+            bool: True if the client was banned.
+        """
+        if address is None or address in self.exempt:
+            return False
+        self.failures += 1
+        key = f"{self.prefix}{address}"
+        if await self._count(key, time.time()) < self.threshold:
+            return False
+        try:
+            await self.bans.ban(str(address), self.ban_ttl)
+            await self._reset(key)
+        except RedisError as err:
+            print(err)
+            return False
+        self.banned += 1
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "failures": self.failures,
+            "banned": self.banned,
+            "tracked": len(self._windows),
+        }
+
+
+abuse_detector = AbuseDetector(
+    ban_list,
+    config.ABUSE_THRESHOLD,
+    config.ABUSE_WINDOW,
+    config.ABUSE_BAN_TTL,
+    config.ABUSE_STATUS_CODES,
+    config.ABUSE_EXEMPT_NETWORKS,
+    config.RATE_LIMIT_LOCAL_SIZE,
+)
@@ -1,32 +1,80 @@
-import pickle
+import hashlib
+import time
+import uuid
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from typing import Optional
 
-import redis
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.conf import messages
 from src.conf.config import config
 from src.database.db import get_db
-from src.entity.models import User
+from src.entity.models import Image, Role, User
 from src.repository import users as repository_users
-from src.repository.images import get_image
+from src.repository.images import IMAGE_BARE_LOADERS, get_image_by_id
+from src.services.passwords import password_hasher, pwd_context
+from src.services.token_registry import token_registry
+from src.services.user_cache import user_cache
+
+
+class TokenCache:
+    """Bounded cache of verified access token payloads.
+
+    Entries are keyed by a digest of the token, so raw tokens are not kept
+    in memory, and expire together with the token.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._payloads: OrderedDict[bytes, dict] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def digest(token: str) -> bytes:
+        return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+    def get(self, token: str) -> dict | None:
+        key = self.digest(token)
+        payload = self._payloads.get(key)
+        if payload is not None and payload["exp"] > time.time():
+            self._payloads.move_to_end(key)
+            self.hits += 1
+            return payload
+        if payload is not None:
+            del self._payloads[key]
+        self.misses += 1
+        return None
+
+    def set(self, token: str, payload: dict) -> None:
+        if self.max_entries <= 0 or "exp" not in payload:
+            return
+        self._payloads[self.digest(token)] = payload
+        while len(self._payloads) > self.max_entries:
+            self._payloads.popitem(last=False)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "entries": len(self._payloads),
+        }
 
 
 class Auth:
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    pwd_context = pwd_context
+    password_hasher = password_hasher
     SECRET_KEY = config.SECRET_KEY_JWT
     ALGORITHM = config.ALGORITHM
-    cache = redis.Redis(
-        host=config.REDIS_DOMAIN,
-        port=config.REDIS_PORT,
-        db=0,
-        password=config.REDIS_PASSWORD,
-    )
+    cache = user_cache
+    tokens = token_registry
+    token_cache = TokenCache(config.JWT_CACHE_SIZE)
 
     def verify_password(self, plain_password: str, hashed_password: str) -> bool:
         """The verify_password function takes a plain-text password and a hashed password,
@@ -53,8 +101,59 @@ class Auth:
         """
         return self.pwd_context.hash(password)
 
+    async def hash_password(self, password: str) -> str:
+        """The hash_password function hashes a password on the password hashing pool.
+
+        Args:
+            password (str): Create a password hash.
+
+        Returns:
+            str: A hash of the password.
+        """
+        return await self.password_hasher.hash(password)
+
+    async def verify_and_update_password(
+        self, plain_password: str, hashed_password: str
+    ) -> tuple[bool, str | None]:
+        """The verify_and_update_password function verifies a password on the password hashing pool.
+            When the stored hash uses outdated cost parameters, a new hash is returned to store.
+
+        Args:
+            plain_password (str): Pass in the password that is being verified.
+            hashed_password (str): Pass in the hashed password from the database.
+
+        Returns:
+            tuple[bool, str | None]: Whether the password matches and the replacement hash or None.
+        """
+        return await self.password_hasher.verify_and_update(
+            plain_password, hashed_password
+        )
+
     oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
 
+    def decode_access_token(self, token: str) -> dict | None:
+        """The decode_access_token function verifies an access token and returns its payload.
+            Verified payloads are cached until the token expires, so a token is checked
+            with HMAC once instead of on every request.
+
+        Args:
+            token (str): Encoded access token.
+
+        Returns:
+            dict | None: Token payload or None if the token is invalid or not an access token.
+        """
+        payload = self.token_cache.get(token)
+        if payload is not None:
+            return payload
+        try:
+            payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+        except JWTError:
+            return None
+        if payload.get("scope") != "access_token" or payload.get("sub") is None:
+            return None
+        self.token_cache.set(token, payload)
+        return payload
+
     async def create_access_token(
         self, data: dict, expires_delta: Optional[timedelta] = None
     ) -> str:
@@ -72,13 +171,33 @@ class Auth:
             expires_delta if expires_delta else timedelta(minutes=120)
         )
         to_encode.update(
-            {"iat": datetime.utcnow(), "exp": expire, "scope": "access_token"}
+            {
+                "iat": datetime.utcnow(),
+                "exp": expire,
+                "scope": "access_token",
+                "jti": uuid.uuid4().hex,
+            }
         )
         encoded_access_token = jwt.encode(
             to_encode, self.SECRET_KEY, algorithm=self.ALGORITHM
         )
         return encoded_access_token
 
+    async def revoke_access_token(self, token: str) -> bool:
+        """The revoke_access_token function revokes an access token until it expires.
+
+        Args:
+            token (str): Encoded access token.
+
+        Returns:
+            bool: False if the token is invalid or has no id.
+        """
+        payload = self.decode_access_token(token)
+        if payload is None or payload.get("jti") is None:
+            return False
+        await self.tokens.revoke(payload["jti"], payload["exp"])
+        return True
+
     async def get_current_user(
         self, token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)
     ):
@@ -91,38 +210,25 @@ class Auth:
             db (AsyncSession, optional): Get the database connection.
 
         Returns:
-            _type_: _description_
+            CachedUser: The current user as stored in the auth cache.
         """
         credentials_exception = HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
-        try:
-            payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
-            if payload.get("scope") == "access_token":
-                email = payload.get("sub")
-                if email is None:
-                    raise credentials_exception
-            else:
-                raise credentials_exception
-        except JWTError:
+        payload = self.decode_access_token(token)
+        if payload is None or self.tokens.is_revoked(payload.get("jti")):
             raise credentials_exception
+        email = payload["sub"]
 
-        user_hash = str(email)
-
-        user = self.cache.get(user_hash)
+        user, epoch = await self.cache.get(str(email))
 
         if user is None:
-            print("User from database")
             user = await repository_users.get_user_by_email(email, db)
             if user is None:
                 raise credentials_exception
-            self.cache.set(user_hash, pickle.dumps(user))
-            self.cache.expire(user_hash, 300)
-        else:
-            print("User from cache")
-            user = pickle.loads(user)
+            user = await self.cache.set(user, epoch)
         return user
 
     async def get_current_active_user(
@@ -135,7 +241,7 @@ class Auth:
             db (AsyncSession, optional): Get the database connection.
 
         Returns:
-            User: A user object.
+            CachedUser: The current user as stored in the auth cache.
         """
         user = await self.get_current_user(token, db)
         if not user.is_active:
@@ -160,7 +266,7 @@ class Auth:
             db (AsyncSession, optional): Get the database connection.
 
         Returns:
-            User: A user object.
+            CachedUser: The current user as stored in the auth cache.
         """
         user = await self.get_current_active_user(token, db)
         if user.role.name not in required_role:
@@ -249,14 +355,12 @@ auth_service = Auth()
 
 
 def role_required(required_role: list):
+    # Depends on the same dependency as the routes, so FastAPI resolves the
+    # current user once per request and shares it
     async def wrapper(
-        token: str = Depends(auth_service.oauth2_scheme),
-        db: AsyncSession = Depends(get_db),
+        user: User = Depends(auth_service.get_current_active_user),
     ):
-        user = await auth_service.get_current_active_user_with_role(
-            required_role, token, db
-        )
-        if not user:
+        if user.role.name not in required_role:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail=messages.NOT_ENOUGH_PERMISSIONS,
@@ -266,23 +370,37 @@ def role_required(required_role: list):
     return wrapper
 
 
-def image_owner_or_admin():
+def image_owner_or_admin(loaders=IMAGE_BARE_LOADERS):
+    """The image_owner_or_admin function builds a dependency that lets only
+        the owner of an image or an admin through.
+        The image is loaded once, by primary key, with the loader profile the route
+        needs. It stays in the identity map of the request's session, so the route's
+        own lookup of the same image is served without another query.
+
+    Args:
+        loaders (tuple, optional): Loader profile the route needs.
+
+    Returns:
+        Callable: Dependency returning the image.
+    """
+
     async def wrapper(
         image_id: int,
         current_user: User = Depends(auth_service.get_current_active_user),
         db: AsyncSession = Depends(get_db),
-    ):
-        image = await get_image(image_id, db, current_user)
+    ) -> Image:
+        image = await get_image_by_id(image_id, db, loaders)
         if image is None:
             raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="Image not found"
+                status_code=status.HTTP_404_NOT_FOUND, detail=messages.IMAGE_NOT_FOUND
             )
 
-        if current_user.id != image.user_id and current_user.role.name != "admin":
+        if current_user.id != image.user_id and current_user.role != Role.admin:
             raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN, detail="Not enough permissions"
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=messages.NOT_ENOUGH_PERMISSIONS,
             )
 
-        return current_user
+        return image
 
     return wrapper
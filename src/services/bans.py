@@ -0,0 +1,257 @@
+import asyncio
+import math
+import time
+from ipaddress import IPv4Address, IPv6Address, ip_address, ip_network
+
+from fastapi import Request
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from src.conf.config import config
+
+IPAddress = IPv4Address | IPv6Address
+
+
+class PrefixTree:
+    """Binary trie of network prefixes of one address family.
+
+    A lookup walks at most one node per address bit and stops at the first
+    banned prefix, so its cost depends on the prefix length only, never on
+    the number of banned networks. A node is a [zero, one, banned] list.
+    """
+
+    def __init__(self, bits: int):
+        self.bits = bits
+        self._root = [None, None, False]
+
+    def add(self, prefix: int, prefixlen: int) -> None:
+        node = self._root
+        for shift in range(self.bits - 1, self.bits - 1 - prefixlen, -1):
+            if node[2]:
+                # A shorter banned prefix already covers this network
+                return
+            bit = (prefix >> shift) & 1
+            if node[bit] is None:
+                node[bit] = [None, None, False]
+            node = node[bit]
+        node[:] = [None, None, True]
+
+    def contains(self, address: int) -> bool:
+        node = self._root
+        for shift in range(self.bits - 1, -1, -1):
+            if node[2]:
+                return True
+            node = node[(address >> shift) & 1]
+            if node is None:
+                return False
+        return node[2]
+
+
+class BanSnapshot:
+    """Immutable set of banned networks, swapped as a whole on every reload."""
+
+    def __init__(self, networks):
+        self.networks = sorted({str(ip_network(n, strict=False)) for n in networks})
+        self._trees = {4: PrefixTree(32), 6: PrefixTree(128)}
+        for network in map(ip_network, self.networks):
+            self._trees[network.version].add(
+                int(network.network_address), network.prefixlen
+            )
+
+    def __contains__(self, address: IPAddress) -> bool:
+        return self._trees[address.version].contains(int(address))
+
+    def __len__(self) -> int:
+        return len(self.networks)
+
+
+def client_address(request: Request, trusted_hops: int | None = None) -> IPAddress | None:
+    """The client_address function finds the address of the client behind trusted proxies.
+        Every trusted proxy appends the address it received the request from to
+        X-Forwarded-For, so with n trusted proxies the client is the n-th address
+        from the right of X-Forwarded-For and the peer address. Entries further
+        left were written by the client and cannot be trusted.
+
+    Args:
+        request (Request): Incoming request.
+        trusted_hops (int | None, optional): Number of trusted proxies, TRUSTED_PROXY_HOPS by default.
+
+    Returns:
+        IPAddress | None: Client address or None if it is not a valid address.
+    """
+    hops = config.TRUSTED_PROXY_HOPS if trusted_hops is None else trusted_hops
+    addresses = []
+    if hops:
+        forwarded = request.headers.get("X-Forwarded-For", "")
+        addresses = [part.strip() for part in forwarded.split(",") if part.strip()]
+    if request.client is not None:
+        addresses.append(request.client.host)
+    if not addresses:
+        return None
+    try:
+        address = ip_address(addresses[max(0, len(addresses) - 1 - hops)])
+    except ValueError:
+        return None
+    if address.version == 6 and address.ipv4_mapped is not None:
+        return address.ipv4_mapped
+    return address
+
+
+class BanList:
+    """Banned networks, kept in Redis and mirrored by every worker.
+
+    Redis holds a sorted set of CIDR networks scored by the time the ban
+    expires, infinity for permanent bans, and a version counter bumped by
+    every change. Each worker polls the version every refresh_interval
+    seconds and rebuilds its snapshot when it changed, so bans apply to all
+    workers without a restart while a lookup never leaves the process.
+    Expired bans are dropped from the snapshot on the first lookup after
+    they expire. Networks from BANNED_NETWORKS are always banned. Without
+    Redis, bans are kept in process.
+    """
+
+    key = "bans"
+    version_key = "bans:version"
+
+    def __init__(self, static_networks: list[str], refresh_interval: float):
+        self.redis: Redis | None = None
+        self.static_networks = list(static_networks)
+        self.refresh_interval = refresh_interval
+        self._entries: dict[str, float] = {}
+        self._version: bytes | None = None
+        self._rebuild()
+        self.reloads = 0
+        self.blocked = 0
+
+    def init(self, redis: Redis) -> None:
+        """The init function attaches the Redis client that stores the bans.
+
+        Args:
+            redis (Redis): Async Redis client.
+        """
+        self.redis = redis
+
+    def _rebuild(self) -> None:
+        now = time.time()
+        self._entries = {
+            network: expires_at
+            for network, expires_at in self._entries.items()
+            if expires_at > now
+        }
+        self.snapshot = BanSnapshot(self.static_networks + list(self._entries))
+        self._next_expiry = min(self._entries.values(), default=math.inf)
+
+    def is_banned(self, address: IPAddress | None) -> bool:
+        if address is None:
+            return False
+        if time.time() >= self._next_expiry:
+            self._rebuild()
+        if address not in self.snapshot:
+            return False
+        self.blocked += 1
+        return True
+
+    async def ban(self, network: str, ttl: int | None = None) -> str:
+        """The ban function bans an address or a CIDR network on every worker.
+            An existing ban that lasts longer is kept.
+
+        Args:
+            network (str): Address or network, e.g. "203.0.113.0/24".
+            ttl (int | None, optional): Ban duration in seconds, permanent if None.
+
+        Raises:
+            ValueError: If network is not a valid address or network.
+
+        Returns:
+            str: The normalized network.
+        """
+        network = str(ip_network(network, strict=False))
+        expires_at = time.time() + ttl if ttl else math.inf
+        if self.redis is None:
+            self._entries[network] = max(expires_at, self._entries.get(network, 0))
+            self._rebuild()
+            return network
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.zremrangebyscore(self.key, "-inf", time.time())
+            # GT only ever extends a ban, so an automatic temporary ban
+            # cannot shorten a longer or permanent one
+            pipe.zadd(self.key, {network: expires_at}, gt=True)
+            pipe.incr(self.version_key)
+            await pipe.execute()
+        await self.reload()
+        return network
+
+    async def unban(self, network: str) -> bool:
+        """The unban function lifts a ban. Networks from BANNED_NETWORKS stay banned.
+
+        Args:
+            network (str): Address or network.
+
+        Raises:
+            ValueError: If network is not a valid address or network.
+
+        Returns:
+            bool: False if the network was not banned.
+        """
+        network = str(ip_network(network, strict=False))
+        if self.redis is None:
+            removed = self._entries.pop(network, None) is not None
+            self._rebuild()
+            return removed
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.zrem(self.key, network)
+            pipe.incr(self.version_key)
+            removed, _ = await pipe.execute()
+        await self.reload()
+        return bool(removed)
+
+    def networks(self) -> dict[str, float]:
+        """The networks function lists the bans that can be lifted.
+
+        Returns:
+            dict[str, float]: Expiry time of every banned network, infinity if permanent.
+        """
+        if time.time() >= self._next_expiry:
+            self._rebuild()
+        return dict(self._entries)
+
+    async def reload(self) -> None:
+        """The reload function rebuilds the snapshot from Redis.
+            Expired bans are removed from the sorted set on the way, so it does not grow
+            with every temporary ban ever issued.
+        """
+        now = time.time()
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.zremrangebyscore(self.key, "-inf", now)
+            pipe.get(self.version_key)
+            pipe.zrangebyscore(self.key, now, "+inf", withscores=True)
+            _, version, entries = await pipe.execute()
+        self._entries = {
+            network.decode() if isinstance(network, bytes) else network: score
+            for network, score in entries
+        }
+        self._rebuild()
+        self._version = version
+        self.reloads += 1
+
+    async def refresh_forever(self) -> None:
+        """The refresh_forever function keeps the snapshot in sync for the lifetime of the worker."""
+        while True:
+            try:
+                version = await self.redis.get(self.version_key)
+                if self.reloads == 0 or version != self._version:
+                    await self.reload()
+            except Exception as err:
+                # Keep syncing after any failure, e.g. a malformed member
+                print(err)
+            await asyncio.sleep(self.refresh_interval)
+
+    def stats(self) -> dict:
+        return {
+            "networks": len(self.snapshot),
+            "reloads": self.reloads,
+            "blocked": self.blocked,
+        }
+
+
+ban_list = BanList(config.BANNED_NETWORKS, config.BAN_REFRESH_INTERVAL)
@@ -1,11 +1,12 @@
 from pathlib import Path
 
-from fastapi_mail import ConnectionConfig, FastMail, MessageSchema, MessageType
-from fastapi_mail.errors import ConnectionErrors
+from fastapi_mail import ConnectionConfig
 from pydantic import EmailStr
 
 from src.conf.config import config
 from src.services.auth import auth_service
+from src.services.mail_queue import EmailJob, EmailOutbox, SMTPPool
+from src.services.rendering import renderer
 
 conf = ConnectionConfig(
     MAIL_USERNAME=config.MAIL_USERNAME,
@@ -21,10 +22,32 @@ conf = ConnectionConfig(
     TEMPLATE_FOLDER=Path(__file__).parent / "templates",
 )
 
+# Per-user fields of each email, the rest is rendered once at startup
+EMAIL_TEMPLATES = {
+    "verify_email.html": ("host", "username", "token"),
+    "reset_password.html": ("host", "token"),
+}
+
+smtp_pool = SMTPPool(conf, config.MAIL_POOL_SIZE)
+email_outbox = EmailOutbox(
+    smtp_pool,
+    renderer,
+    batch_size=config.MAIL_BATCH_SIZE,
+    max_attempts=config.MAIL_MAX_ATTEMPTS,
+    backoff=config.MAIL_RETRY_BACKOFF,
+    claim_idle=config.MAIL_CLAIM_IDLE,
+)
+
+
+async def prerender_emails() -> None:
+    """The prerender_emails function renders the static parts of every email once."""
+    for name, fields in EMAIL_TEMPLATES.items():
+        await renderer.prerender(name, fields)
+
 
 async def send_email(email: EmailStr, username: str, host: str) -> None:
-    """The send_email function sends an email to the user with a link to verify their email address.
-        
+    """The send_email function queues an email to the user with a link to verify their email address.
+
     Args:
         email (EmailStr): Specify the email address of the user.
         username (str): Pass the username of the user to be sent in the email.
@@ -33,27 +56,23 @@ async def send_email(email: EmailStr, username: str, host: str) -> None:
     Returns:
         None: None, so the return value of send_email is none
     """
-    try:
-        token_verification = auth_service.create_email_token({"sub": email})
-        message = MessageSchema(
+    token_verification = auth_service.create_email_token({"sub": email})
+    await email_outbox.enqueue(
+        EmailJob(
+            template="verify_email.html",
             subject="Confirm your email ",
-            recipients=[email],
-            template_body={
+            recipient=email,
+            body={
                 "host": host,
                 "username": username,
                 "token": token_verification,
             },
-            subtype=MessageType.html,
         )
-
-        fm = FastMail(conf)
-        await fm.send_message(message, template_name="verify_email.html")
-    except ConnectionErrors as err:
-        print(err)
+    )
 
 
 async def send_reset_password_email(email: str, token: str, host: str):
-    """The send_reset_password_email function sends a password reset email to the user.
+    """The send_reset_password_email function queues a password reset email to the user.
 
     Args:
         email (str): The user's email address.
@@ -63,18 +82,14 @@ async def send_reset_password_email(email: str, token: str, host: str):
     Returns:
         None: None.
     """
-    try:
-        message = MessageSchema(
+    await email_outbox.enqueue(
+        EmailJob(
+            template="reset_password.html",
             subject="Password reset request",
-            recipients=[email],
-            template_body={
+            recipient=email,
+            body={
                 "host": host,
                 "token": token,
             },
-            subtype=MessageType.html,
         )
-
-        fm = FastMail(conf)
-        await fm.send_message(message, template_name="reset_password.html")
-    except ConnectionErrors as err:
-        print(err)
+    )
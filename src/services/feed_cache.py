@@ -0,0 +1,150 @@
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from src.conf.config import config
+
+
+# Reads the current generation, the page stored under it and whether the
+# generation changed recently, in one round trip
+GET_PAGE_SCRIPT = """
+local generation = redis.call('GET', KEYS[1]) or '0'
+return {
+    generation,
+    redis.call('GET', ARGV[1] .. generation .. ':' .. ARGV[2]),
+    redis.call('EXISTS', KEYS[2]),
+}
+"""
+
+
+class FeedCache:
+    """Read-through cache of rendered feed pages.
+
+    Every page is a key of its own with its own TTL, named after the
+    current generation of the feed. A write that changes the feed bumps the
+    generation, so later reads miss every older page, and those pages
+    expire on their own. A reader that loaded a page before the bump
+    stores it under the generation it read, where nobody looks anymore.
+
+    Pages read from a replica are not cached within settle seconds of a
+    bump, the replication lag allowed by DB_READ_YOUR_WRITES_SECONDS, as
+    the replica may not have the write that caused the bump yet.
+    """
+
+    generation_key = "feed:generation"
+    bumped_key = "feed:bumped"
+    prefix = "feed:page:"
+
+    def __init__(self, ttl: int, settle: int):
+        self.redis: Redis | None = None
+        self.ttl = ttl
+        self.settle = settle
+        self._script = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def init(self, redis: Redis) -> None:
+        """The init function attaches the Redis client used to store pages.
+
+        Args:
+            redis (Redis): Async Redis client.
+        """
+        self.redis = redis
+        self._script = redis.register_script(GET_PAGE_SCRIPT)
+
+    @staticmethod
+    def page_key(kind: str, limit: int, offset: int, cursor: str | None) -> str:
+        return f"{kind}:{limit}:{offset}:{cursor or ''}"
+
+    async def get(
+        self,
+        kind: str,
+        limit: int,
+        offset: int,
+        cursor: str | None,
+        replica: bool = False,
+    ) -> tuple[str | None, str | None]:
+        """The get function returns a rendered page and the feed generation it belongs to.
+            Pass the generation to set when the page has to be rendered.
+
+        Args:
+            kind (str): Page format, "json" or "html".
+            limit (int): Page size.
+            offset (int): Page offset.
+            cursor (str | None): Page cursor.
+            replica (bool, optional): The page would be rendered from a read replica.
+
+        Returns:
+            tuple[str | None, str | None]: Rendered page or None when it is not cached,
+                and the generation or None when the page must not be cached.
+        """
+        page = generation = None
+        if self.redis is not None:
+            try:
+                generation, page, bumped = await self._script(
+                    keys=[self.generation_key, self.bumped_key],
+                    args=[self.prefix, self.page_key(kind, limit, offset, cursor)],
+                )
+                if replica and bumped:
+                    generation = None
+            except RedisError as err:
+                print(err)
+        if isinstance(generation, bytes):
+            generation = generation.decode()
+        if page is None:
+            self.misses += 1
+            return None, generation
+        self.hits += 1
+        return page.decode() if isinstance(page, bytes) else page, generation
+
+    async def set(
+        self,
+        generation: str | None,
+        kind: str,
+        limit: int,
+        offset: int,
+        cursor: str | None,
+        page: str,
+    ) -> None:
+        """The set function stores a rendered page under the generation returned by get.
+
+        Args:
+            generation (str | None): Feed generation the page was rendered in.
+            kind (str): Page format, "json" or "html".
+            limit (int): Page size.
+            offset (int): Page offset.
+            cursor (str | None): Page cursor.
+            page (str): Rendered page.
+        """
+        if self.redis is None or generation is None:
+            return
+        key = f"{self.prefix}{generation}:{self.page_key(kind, limit, offset, cursor)}"
+        try:
+            await self.redis.set(key, page, ex=self.ttl)
+        except RedisError as err:
+            print(err)
+
+    async def invalidate(self) -> None:
+        """The invalidate function retires every cached page after the feed changed."""
+        self.invalidations += 1
+        if self.redis is None:
+            return
+        try:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.incr(self.generation_key)
+                pipe.set(self.bumped_key, 1, ex=self.settle)
+                await pipe.execute()
+        except RedisError as err:
+            print(err)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+
+feed_cache = FeedCache(config.FEED_CACHE_TTL, config.DB_READ_YOUR_WRITES_SECONDS)
@@ -0,0 +1,386 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from email.message import EmailMessage
+from email.utils import formataddr
+
+from aiosmtplib import (
+    SMTP,
+    SMTPException,
+    SMTPRecipientsRefused,
+    SMTPResponseException,
+    SMTPServerDisconnected,
+)
+from fastapi_mail import ConnectionConfig
+from redis.asyncio import Redis
+from redis.exceptions import RedisError, ResponseError
+
+from src.services.rendering import TemplateRenderer
+
+logger = logging.getLogger(__name__)
+
+# Moves due retries back to the outbox stream atomically, so a crash between
+# the two steps can neither lose nor duplicate a message
+PROMOTE_DUE_SCRIPT = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, job in ipairs(due) do
+    redis.call('ZREM', KEYS[1], job)
+    redis.call('XADD', KEYS[2], '*', 'job', job)
+end
+return #due
+"""
+
+
+@dataclass
+class EmailJob:
+    """An outgoing templated email, as stored in the outbox."""
+
+    template: str
+    subject: str
+    recipient: str
+    body: dict
+    attempts: int = 0
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+
+    def dumps(self) -> str:
+        return json.dumps(asdict(self), sort_keys=True)
+
+    @classmethod
+    def loads(cls, data: str | bytes) -> "EmailJob":
+        return cls(**json.loads(data))
+
+
+def is_permanent(err: Exception) -> bool:
+    """The is_permanent function tells failures that a retry cannot fix from transient ones.
+
+    Args:
+        err (Exception): Delivery error.
+
+    Returns:
+        bool: True for rejected recipients and other 5xx replies.
+    """
+    if isinstance(err, SMTPRecipientsRefused):
+        return True
+    return isinstance(err, SMTPResponseException) and err.code >= 500
+
+
+class SMTPPool:
+    """Keeps up to size SMTP connections open and reuses them across messages.
+
+    Opening a connection costs a TCP and TLS handshake, the greeting, EHLO
+    and AUTH, which is several times the cost of sending a message over an
+    open one. A batch is split between the connections and sent over them
+    concurrently. A connection that fails at the transport level is closed
+    instead of being returned to the pool, and an idle connection the server
+    has dropped is reopened once before the message counts as failed.
+    """
+
+    def __init__(self, conf: ConnectionConfig, size: int):
+        self.conf = conf
+        self.size = size
+        self._idle: list[SMTP] = []
+        self._semaphore = asyncio.Semaphore(size)
+        self.connects = 0
+        self.sent = 0
+        self.failed = 0
+
+    async def _connect(self) -> SMTP:
+        smtp = SMTP(
+            hostname=self.conf.MAIL_SERVER,
+            port=self.conf.MAIL_PORT,
+            use_tls=self.conf.MAIL_SSL_TLS,
+            start_tls=self.conf.MAIL_STARTTLS,
+            validate_certs=self.conf.VALIDATE_CERTS,
+            timeout=self.conf.TIMEOUT,
+        )
+        await smtp.connect()
+        if self.conf.USE_CREDENTIALS:
+            await smtp.login(self.conf.MAIL_USERNAME, self.conf.MAIL_PASSWORD)
+        self.connects += 1
+        return smtp
+
+    async def _acquire(self) -> SMTP:
+        while self._idle:
+            smtp = self._idle.pop()
+            if smtp.is_connected:
+                return smtp
+        return await self._connect()
+
+    async def _send_one(self, smtp: SMTP, message: EmailMessage) -> SMTP:
+        try:
+            await smtp.send_message(message)
+            return smtp
+        except SMTPServerDisconnected:
+            smtp.close()
+        # The server dropped the idle connection, reconnect once
+        smtp = await self._connect()
+        try:
+            await smtp.send_message(message)
+        except BaseException:
+            smtp.close()
+            raise
+        return smtp
+
+    async def _send_chunk(self, messages: list[EmailMessage]) -> list[Exception | None]:
+        results = []
+        async with self._semaphore:
+            smtp = None
+            for message in messages:
+                try:
+                    if smtp is None:
+                        smtp = await self._acquire()
+                    smtp = await self._send_one(smtp, message)
+                    results.append(None)
+                    self.sent += 1
+                except (SMTPResponseException, SMTPRecipientsRefused) as err:
+                    # The server refused this message, the connection is still fine
+                    results.append(err)
+                    self.failed += 1
+                except (SMTPException, OSError) as err:
+                    results.append(err)
+                    self.failed += 1
+                    if smtp is not None:
+                        smtp.close()
+                    smtp = None
+            if smtp is not None:
+                self._idle.append(smtp)
+        return results
+
+    async def send(self, messages: list[EmailMessage]) -> list[Exception | None]:
+        """The send function sends a batch of messages over pooled connections.
+
+        Args:
+            messages (list[EmailMessage]): Messages to send.
+
+        Returns:
+            list[Exception | None]: None for each sent message, the error otherwise,
+                in the order of messages.
+        """
+        chunks = [list(range(i, len(messages), self.size)) for i in range(self.size)]
+        chunks = [chunk for chunk in chunks if chunk]
+        results: list[Exception | None] = [None] * len(messages)
+        chunk_results = await asyncio.gather(
+            *(self._send_chunk([messages[i] for i in chunk]) for chunk in chunks)
+        )
+        for chunk, chunk_result in zip(chunks, chunk_results):
+            for i, result in zip(chunk, chunk_result):
+                results[i] = result
+        return results
+
+    async def close(self) -> None:
+        while self._idle:
+            smtp = self._idle.pop()
+            try:
+                await smtp.quit()
+            except (SMTPException, OSError):
+                smtp.close()
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "idle": len(self._idle),
+            "connects": self.connects,
+            "sent": self.sent,
+            "failed": self.failed,
+        }
+
+
+class EmailOutbox:
+    """Durable queue of outgoing emails on a Redis stream.
+
+    Requests only append a job to the stream. A worker in every app process
+    reads the stream through a consumer group, renders the batch and sends it
+    over the SMTP pool. A job is acknowledged and deleted only after it was
+    sent, retried or dead-lettered, so a worker that dies mid-batch leaves
+    its jobs pending, and they are claimed by a live worker once they have
+    been idle for claim_idle seconds. Failed jobs wait in a sorted set scored
+    by their due time, with exponential backoff, and jobs that fail
+    permanently or too often move to a dead-letter stream. Without Redis,
+    emails are sent right away, as before.
+    """
+
+    stream = "email:outbox"
+    retries = "email:retry"
+    dead = "email:dead"
+    group = "mailers"
+
+    def __init__(
+        self,
+        pool: SMTPPool,
+        renderer: TemplateRenderer,
+        batch_size: int,
+        max_attempts: int,
+        backoff: float,
+        claim_idle: int,
+    ):
+        self.redis: Redis | None = None
+        self.pool = pool
+        self.renderer = renderer
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.claim_idle = claim_idle
+        self._promote = None
+        self._next_claim = 0.0
+        self.enqueued = 0
+        self.retried = 0
+        self.dead_lettered = 0
+
+    def init(self, redis: Redis) -> None:
+        """The init function attaches the Redis client that stores the outbox.
+
+        Args:
+            redis (Redis): Async Redis client.
+        """
+        self.redis = redis
+        self._promote = redis.register_script(PROMOTE_DUE_SCRIPT)
+
+    async def build_message(self, job: EmailJob) -> EmailMessage:
+        """The build_message function renders a job into an HTML email.
+
+        Args:
+            job (EmailJob): Outbox job.
+
+        Returns:
+            EmailMessage: Message ready to send.
+        """
+        message = EmailMessage()
+        message["Subject"] = job.subject
+        message["From"] = formataddr(
+            (self.pool.conf.MAIL_FROM_NAME, self.pool.conf.MAIL_FROM)
+        )
+        message["To"] = job.recipient
+        html = await self.renderer.render_email(job.template, job.body)
+        message.set_content(html, subtype="html")
+        return message
+
+    async def enqueue(self, job: EmailJob) -> None:
+        """The enqueue function adds an email to the outbox.
+            Without Redis the email is sent right away instead.
+
+        Args:
+            job (EmailJob): Email to send.
+
+        Raises:
+            SMTPException: If Redis is not available and sending right away fails.
+            OSError: If Redis is not available and the SMTP server cannot be reached.
+        """
+        self.enqueued += 1
+        if self.redis is not None:
+            try:
+                await self.redis.xadd(self.stream, {"job": job.dumps()})
+                return
+            except RedisError as err:
+                print(err)
+        # No outbox, send right away
+        (result,) = await self.pool.send([await self.build_message(job)])
+        if result is not None:
+            # Nothing holds the email for a retry, so the caller must know
+            raise result
+
+    def _backoff(self, attempts: int) -> float:
+        return self.backoff * 2 ** (attempts - 1)
+
+    async def process(self, entries: list) -> None:
+        """The process function sends a batch read from the stream and settles every entry.
+
+        Args:
+            entries (list): Stream entries as (id, fields) pairs.
+        """
+        ids, jobs, messages, failed = [], [], [], []
+        for entry_id, fields in entries:
+            ids.append(entry_id)
+            try:
+                job = EmailJob.loads(fields[b"job"])
+                messages.append(await self.build_message(job))
+                jobs.append(job)
+            except Exception as err:
+                # A job that cannot be rendered will never be sent
+                print(err)
+                failed.append((fields or {}).get(b"job", b""))
+        results = await self.pool.send(messages) if messages else []
+
+        now = time.time()
+        async with self.redis.pipeline(transaction=True) as pipe:
+            for job, err in zip(jobs, results):
+                if err is None:
+                    continue
+                job.attempts += 1
+                if is_permanent(err) or job.attempts >= self.max_attempts:
+                    print(err)
+                    failed.append(job.dumps())
+                else:
+                    self.retried += 1
+                    pipe.zadd(
+                        self.retries, {job.dumps(): now + self._backoff(job.attempts)}
+                    )
+            for data in failed:
+                self.dead_lettered += 1
+                pipe.xadd(self.dead, {"job": data}, maxlen=10000, approximate=True)
+            pipe.xack(self.stream, self.group, *ids)
+            pipe.xdel(self.stream, *ids)
+            await pipe.execute()
+
+    async def _create_group(self) -> None:
+        try:
+            await self.redis.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+        except ResponseError as err:
+            if "BUSYGROUP" not in str(err):
+                raise
+
+    async def _read(self, consumer: str) -> list:
+        now = time.monotonic()
+        if now >= self._next_claim:
+            self._next_claim = now + self.claim_idle
+            # Jobs left pending by a worker that died mid-batch
+            claimed = await self.redis.xautoclaim(
+                self.stream,
+                self.group,
+                consumer,
+                self.claim_idle * 1000,
+                count=self.batch_size,
+            )
+            if claimed[1]:
+                return claimed[1]
+        response = await self.redis.xreadgroup(
+            self.group, consumer, {self.stream: ">"}, count=self.batch_size, block=1000
+        )
+        return response[0][1] if response else []
+
+    async def run(self, consumer: str | None = None) -> None:
+        """The run function drains the outbox for the lifetime of the worker.
+            It recreates the consumer group and resumes after any error.
+
+        Args:
+            consumer (str | None, optional): Consumer name, unique per worker process.
+        """
+        consumer = consumer or f"{socket.gethostname()}-{os.getpid()}"
+        while True:
+            try:
+                await self._create_group()
+                while True:
+                    await self._promote(
+                        keys=[self.retries, self.stream],
+                        args=[time.time(), self.batch_size],
+                    )
+                    entries = await self._read(consumer)
+                    if entries:
+                        await self.process(entries)
+            except Exception:
+                # Unsettled entries stay pending and are claimed again, so
+                # any failure only pauses the worker instead of ending it
+                logger.exception("Email outbox worker failed, resuming")
+                await asyncio.sleep(1)
+
+    def stats(self) -> dict:
+        return {
+            "enqueued": self.enqueued,
+            "retried": self.retried,
+            "dead_lettered": self.dead_lettered,
+            "smtp": self.pool.stats(),
+        }
@@ -0,0 +1,103 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from passlib.context import CryptContext
+
+from src.conf.config import config
+
+
+class PasswordHasher:
+    """Runs bcrypt on a dedicated bounded thread pool.
+
+    bcrypt releases the GIL while hashing, so threads give real parallelism
+    without blocking the event loop, and the pool size caps how many CPU
+    cores logins may take. Hashes made with other cost parameters than the
+    current ones are reported by verify_and_update, so they can be replaced
+    on the next successful login.
+    """
+
+    def __init__(self, context: CryptContext, max_workers: int):
+        self.context = context
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="bcrypt"
+        )
+        self._pending = 0
+        self.max_pending = 0
+        self.calls = 0
+        self.rehashes = 0
+        self.queue_time = 0.0
+        self.run_time = 0.0
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        queued_at = time.perf_counter()
+        started_at = queued_at
+
+        def timed():
+            nonlocal started_at
+            started_at = time.perf_counter()
+            return func(*args)
+
+        self._pending += 1
+        self.max_pending = max(self.max_pending, self._pending)
+        try:
+            return await loop.run_in_executor(self._executor, timed)
+        finally:
+            self._pending -= 1
+            self.calls += 1
+            self.queue_time += started_at - queued_at
+            self.run_time += time.perf_counter() - started_at
+
+    async def hash(self, password: str) -> str:
+        """The hash function hashes a password with the current cost parameters.
+
+        Args:
+            password (str): Plain-text password.
+
+        Returns:
+            str: Password hash.
+        """
+        return await self._run(self.context.hash, password)
+
+    async def verify_and_update(
+        self, password: str, hashed_password: str
+    ) -> tuple[bool, str | None]:
+        """The verify_and_update function checks a password and rehashes it when the hash is outdated.
+
+        Args:
+            password (str): Plain-text password.
+            hashed_password (str): Stored password hash.
+
+        Returns:
+            tuple[bool, str | None]: Whether the password matches, and a new hash to store
+                if the stored one uses outdated cost parameters.
+        """
+        verified, new_hash = await self._run(
+            partial(self.context.verify_and_update, password, hashed_password)
+        )
+        if new_hash is not None:
+            self.rehashes += 1
+        return verified, new_hash
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.max_workers,
+            "pending": self._pending,
+            "max_pending": self.max_pending,
+            "calls": self.calls,
+            "rehashes": self.rehashes,
+            "avg_queue_ms": self.queue_time / self.calls * 1000 if self.calls else 0.0,
+            "avg_run_ms": self.run_time / self.calls * 1000 if self.calls else 0.0,
+        }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=config.BCRYPT_ROUNDS
+)
+password_hasher = PasswordHasher(pwd_context, config.PASSWORD_HASH_WORKERS)
@@ -0,0 +1,80 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from src.conf.config import config
+from src.repository.qr import render_qr_code_with_url
+
+
+class QRQueueFull(Exception):
+    """Raised when the QR renderer already has the maximum number of pending jobs."""
+
+
+class QRRenderer:
+    """Renders QR codes on a process pool so PNG encoding does not block the event loop.
+
+    At most max_workers jobs run at once and up to queue_size more may wait
+    for a free worker. Further requests are rejected right away with
+    QRQueueFull instead of piling up, which routes turn into 503 responses.
+    The pool is started lazily with the spawn context, so workers never
+    inherit the event loop, sockets or database connections of the parent.
+    """
+
+    def __init__(self, max_workers: int | None, queue_size: int):
+        self.max_workers = max_workers or multiprocessing.cpu_count()
+        self.max_pending = self.max_workers + queue_size
+        self._executor: ProcessPoolExecutor | None = None
+        self._pending = 0
+        self._rejected = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    async def render(self, url: str) -> bytes:
+        """The render function renders a QR code with URL caption in a worker process.
+
+        Args:
+            url (str): The URL to encode in the QR code.
+
+        Raises:
+            QRQueueFull: If the queue of pending renders is full.
+
+        Returns:
+            bytes: PNG image.
+        """
+        if self._pending >= self.max_pending:
+            self._rejected += 1
+            raise QRQueueFull
+        self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._get_executor(), render_qr_code_with_url, url
+            )
+        except BrokenProcessPool:
+            # A worker died, start a fresh pool for the next request
+            self._executor = None
+            raise
+        finally:
+            self._pending -= 1
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.max_workers,
+            "pending": self._pending,
+            "rejected": self._rejected,
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+qr_renderer = QRRenderer(config.QR_MAX_WORKERS, config.QR_QUEUE_SIZE)
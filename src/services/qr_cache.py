@@ -0,0 +1,147 @@
+import hashlib
+import json
+import logging
+from collections import OrderedDict
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from src.conf.config import config
+from src.repository.qr import QR_RENDER_PARAMS
+
+logger = logging.getLogger(__name__)
+
+
+class QRCache:
+    """Two-level cache of rendered QR code images.
+
+    The first level is an in-process LRU bounded by the total size of the
+    cached PNGs, the second one is Redis, shared by all workers. A Redis hit
+    is promoted to the local LRU. The key is a digest of the URL and the
+    rendering parameters, and it doubles as a strong ETag because equal keys
+    always render to identical bytes.
+    """
+
+    prefix = "qr:"
+
+    def __init__(self, max_bytes: int, ttl: int):
+        self.redis: Redis | None = None
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lru: OrderedDict[str, bytes] = OrderedDict()
+        self._size = 0
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    def init(self, redis: Redis) -> None:
+        """The init function attaches the Redis client used as the second cache level.
+
+        Args:
+            redis (Redis): Async Redis client returning bytes (decode_responses=False).
+        """
+        self.redis = redis
+
+    @staticmethod
+    def key(url: str) -> str:
+        """The key function returns the cache key of the QR code for a URL.
+
+        Args:
+            url (str): The URL encoded in the QR code.
+
+        Returns:
+            str: SHA-256 hex digest of the URL and the rendering parameters.
+        """
+        canonical = json.dumps({"url": url, **QR_RENDER_PARAMS}, sort_keys=True)
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    @staticmethod
+    def etag(key: str) -> str:
+        return f'"{key[:32]}"'
+
+    def _remember(self, key: str, png: bytes) -> None:
+        if len(png) > self.max_bytes:
+            return
+        if key in self._lru:
+            self._size -= len(self._lru.pop(key))
+        self._lru[key] = png
+        self._size += len(png)
+        while self._size > self.max_bytes:
+            _, evicted = self._lru.popitem(last=False)
+            self._size -= len(evicted)
+
+    async def get(self, key: str) -> bytes | None:
+        """The get function returns a cached QR code or None when it is not cached.
+
+        Args:
+            key (str): Cache key, see key.
+
+        Returns:
+            bytes | None: PNG image.
+        """
+        png = self._lru.get(key)
+        if png is not None:
+            self._lru.move_to_end(key)
+            self.local_hits += 1
+            return png
+        if self.redis is not None:
+            try:
+                png = await self.redis.get(self.prefix + key)
+            except RedisError:
+                logger.warning("Cannot read QR code %s from Redis", key, exc_info=True)
+        if png is None:
+            self.misses += 1
+            return None
+        self.redis_hits += 1
+        self._remember(key, png)
+        return png
+
+    async def set(self, key: str, png: bytes) -> None:
+        """The set function stores a rendered QR code in both cache levels.
+
+        Args:
+            key (str): Cache key, see key.
+            png (bytes): PNG image.
+        """
+        self._remember(key, png)
+        if self.redis is None:
+            return
+        try:
+            await self.redis.set(self.prefix + key, png, ex=self.ttl)
+        except RedisError:
+            logger.warning("Cannot store QR code %s in Redis", key, exc_info=True)
+
+    def stats(self) -> dict:
+        total = self.local_hits + self.redis_hits + self.misses
+        hits = self.local_hits + self.redis_hits
+        return {
+            "local_hits": self.local_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "hit_ratio": hits / total if total else 0.0,
+            "local_bytes": self._size,
+            "local_entries": len(self._lru),
+        }
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """The etag_matches function checks an If-None-Match header against an ETag.
+        Comparison is weak, as RFC 9110 requires for If-None-Match.
+
+    Args:
+        if_none_match (str | None): If-None-Match header value.
+        etag (str): Current entity tag.
+
+    Returns:
+        bool: True if the client copy is current.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(",")
+    )
+
+
+qr_cache = QRCache(config.QR_CACHE_MAX_BYTES, config.QR_CACHE_TTL)
@@ -0,0 +1,289 @@
+import math
+import time
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+
+from fastapi import Depends, HTTPException, Request, status
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from src.conf import messages
+from src.conf.config import config
+from src.entity.models import User
+from src.services.auth import auth_service
+from src.services.bans import client_address
+
+# Sliding window log: one sorted set member per admitted request, scored by
+# its time in milliseconds. Grants up to ARGV[4] permits at once, or returns
+# how long until the oldest admitted request leaves the window.
+SLIDING_WINDOW_SCRIPT = """
+local key = KEYS[1]
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+local wanted = tonumber(ARGV[4])
+redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+local granted = math.min(wanted, limit - redis.call('ZCARD', key))
+if granted > 0 then
+    for i = 1, granted do
+        redis.call('ZADD', key, now, ARGV[5] .. ':' .. i)
+    end
+    redis.call('PEXPIRE', key, window)
+    return {granted, 0}
+end
+local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+return {0, math.max(1, tonumber(oldest[2]) + window - now)}
+"""
+
+
+@dataclass(frozen=True, slots=True)
+class RatePolicy:
+    """At most times requests in any window of seconds."""
+
+    times: int
+    seconds: float
+
+    @classmethod
+    def parse(cls, value: str) -> "RatePolicy | None":
+        """The parse function reads a policy written as "times/seconds".
+
+        Args:
+            value (str): Policy, "unlimited" for no limit.
+
+        Returns:
+            RatePolicy | None: Policy or None for no limit.
+        """
+        if value == "unlimited":
+            return None
+        times, _, seconds = value.partition("/")
+        return cls(int(times), float(seconds))
+
+
+def resolve_policy(
+    name: str, email: str | None = None, role: str | None = None
+) -> RatePolicy | None:
+    """The resolve_policy function picks the policy of a route for a client.
+        A per-user policy wins over a per-role one, which wins over the route default.
+        Within each level, the route's own entry wins over the "*" entry.
+
+    Args:
+        name (str): Route policy name, e.g. "auth.login".
+        email (str | None, optional): Email of the authenticated user.
+        role (str | None, optional): Role name of the authenticated user.
+
+    Returns:
+        RatePolicy | None: Policy or None for no limit.
+    """
+    levels = (
+        config.RATE_LIMITS_BY_USER.get(email or "", {}),
+        config.RATE_LIMITS_BY_ROLE.get(role or "", {}),
+        config.RATE_LIMITS,
+    )
+    for level in levels:
+        for key in (name, "*"):
+            if key in level:
+                return RatePolicy.parse(level[key])
+    return None
+
+
+class _Lease:
+    __slots__ = ("tokens", "expires_at", "blocked_until")
+
+    def __init__(self, tokens: int, expires_at: float, blocked_until: float):
+        self.tokens = tokens
+        self.expires_at = expires_at
+        self.blocked_until = blocked_until
+
+
+class RateLimiter:
+    """Cluster-wide rate limiter with an in-process fast path.
+
+    Redis keeps a sliding window log per route and client, updated by one
+    Lua script call. Instead of a single permit, a worker leases a share of
+    the limit and spends it locally until the lease runs out or expires, so
+    only every lease_size-th allowed request costs a round trip. Redis logs
+    leased permits when they are granted, so a lease expires after the same
+    fraction of the window: permits spent late would otherwise already have
+    left the window and could be granted again, allowing close to twice the
+    limit.
+    A denial from Redis comes with the time until the oldest request leaves
+    the window. No other worker can free a permit earlier, so the worker
+    denies that client locally until then. Without Redis, or while it is
+    unreachable, the same window is kept in process, which limits each
+    worker separately.
+    """
+
+    prefix = "rl:"
+
+    def __init__(self, max_entries: int, lease_fraction: float):
+        self.redis: Redis | None = None
+        self.max_entries = max_entries
+        self.lease_fraction = lease_fraction
+        self._script = None
+        self._leases: OrderedDict[str, _Lease] = OrderedDict()
+        self._windows: OrderedDict[str, deque] = OrderedDict()
+        self.local_allows = 0
+        self.local_denies = 0
+        self.redis_calls = 0
+        self.denies = 0
+
+    def init(self, redis: Redis) -> None:
+        """The init function attaches the Redis client that keeps the windows.
+
+        Args:
+            redis (Redis): Async Redis client.
+        """
+        self.redis = redis
+        self._script = redis.register_script(SLIDING_WINDOW_SCRIPT)
+
+    def lease_size(self, policy: RatePolicy) -> int:
+        return max(1, int(policy.times * self.lease_fraction))
+
+    def _bounded_set(self, entries: OrderedDict, key: str, value) -> None:
+        entries[key] = value
+        entries.move_to_end(key)
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+
+    def _acquire_local(
+        self, key: str, wanted: int, policy: RatePolicy, now: float
+    ) -> tuple[int, float]:
+        window = self._windows.get(key)
+        if window is None:
+            window = deque()
+            self._bounded_set(self._windows, key, window)
+        while window and window[0] <= now - policy.seconds:
+            window.popleft()
+        granted = min(wanted, policy.times - len(window))
+        if granted > 0:
+            window.extend([now] * granted)
+            return granted, 0.0
+        return 0, window[0] + policy.seconds - now
+
+    async def _acquire(
+        self, key: str, wanted: int, policy: RatePolicy, now: float
+    ) -> tuple[int, float]:
+        if self.redis is not None:
+            try:
+                self.redis_calls += 1
+                granted, retry_ms = await self._script(
+                    keys=[key],
+                    args=[
+                        int(now * 1000),
+                        int(policy.seconds * 1000),
+                        policy.times,
+                        wanted,
+                        uuid.uuid4().hex,
+                    ],
+                )
+                return int(granted), int(retry_ms) / 1000
+            except RedisError as err:
+                print(err)
+        return self._acquire_local(key, wanted, policy, now)
+
+    async def hit(self, name: str, identity: str, policy: RatePolicy) -> float:
+        """The hit function counts a request against a policy.
+
+        Args:
+            name (str): Route policy name.
+            identity (str): Client identity, e.g. "user:1" or "ip:10.0.0.1".
+            policy (RatePolicy): Policy to apply.
+
+        Returns:
+            float: 0 if the request is allowed, otherwise seconds until it would be.
+        """
+        key = f"{self.prefix}{name}:{identity}"
+        now = time.time()
+        lease = self._leases.get(key)
+        if lease is not None:
+            if lease.blocked_until > now:
+                self.local_denies += 1
+                self.denies += 1
+                return lease.blocked_until - now
+            if lease.tokens > 0 and lease.expires_at > now:
+                lease.tokens -= 1
+                self.local_allows += 1
+                return 0.0
+        granted, retry_after = await self._acquire(
+            key, self.lease_size(policy), policy, now
+        )
+        if granted:
+            expires_at = now + policy.seconds * self.lease_fraction
+            self._bounded_set(self._leases, key, _Lease(granted - 1, expires_at, 0.0))
+            return 0.0
+        self.denies += 1
+        self._bounded_set(self._leases, key, _Lease(0, 0.0, now + retry_after))
+        return retry_after
+
+    async def check(
+        self,
+        name: str,
+        identity: str,
+        email: str | None = None,
+        role: str | None = None,
+    ) -> None:
+        """The check function enforces the policy of a route for a client.
+
+        Args:
+            name (str): Route policy name.
+            identity (str): Client identity.
+            email (str | None, optional): Email of the authenticated user.
+            role (str | None, optional): Role name of the authenticated user.
+
+        Raises:
+            HTTPException: 429 with Retry-After when the limit is reached.
+        """
+        policy = resolve_policy(name, email, role)
+        if policy is None:
+            return
+        retry_after = await self.hit(name, identity, policy)
+        if retry_after > 0:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail=messages.TOO_MANY_REQUESTS,
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
+
+    def clear(self) -> None:
+        self._leases.clear()
+        self._windows.clear()
+
+    def stats(self) -> dict:
+        return {
+            "local_allows": self.local_allows,
+            "local_denies": self.local_denies,
+            "redis_calls": self.redis_calls,
+            "denies": self.denies,
+            "entries": len(self._leases),
+        }
+
+
+limiter = RateLimiter(config.RATE_LIMIT_LOCAL_SIZE, config.RATE_LIMIT_LEASE_FRACTION)
+
+
+def rate_limit(name: str, per_user: bool = False):
+    """The rate_limit function builds a dependency that enforces a route's rate limit.
+
+    Args:
+        name (str): Route policy name, a key of the RATE_LIMITS settings.
+        per_user (bool, optional): Count requests per authenticated user, which
+            enables per-user and per-role policies, instead of per client IP.
+
+    Returns:
+        Callable: Dependency.
+    """
+    if per_user:
+
+        async def wrapper(
+            user: User = Depends(auth_service.get_current_active_user),
+        ):
+            role = user.role.name if user.role is not None else None
+            await limiter.check(name, f"user:{user.id}", user.email, role)
+
+    else:
+
+        async def wrapper(request: Request):
+            await limiter.check(name, f"ip:{client_address(request)}")
+
+    return wrapper
@@ -0,0 +1,138 @@
+import re
+from pathlib import Path
+
+from jinja2 import (
+    Environment,
+    FileSystemBytecodeCache,
+    FileSystemLoader,
+    select_autoescape,
+)
+from markupsafe import escape
+
+from src.conf.config import config
+
+TEMPLATE_DIRS = (
+    Path(__file__).resolve().parents[2] / "templates",
+    Path(__file__).parent / "templates",
+)
+
+
+class Skeleton:
+    """A template rendered once, with markers in place of its per-call fields.
+
+    parts holds the static text around the fields, so parts has one item
+    more than fields, and a field may occur several times.
+    """
+
+    def __init__(self, fields: tuple[str, ...], parts: list[str], slots: list[str]):
+        self.fields = fields
+        self.parts = parts
+        self.slots = slots
+
+    def fill(self, context: dict) -> str:
+        chunks = [self.parts[0]]
+        for slot, part in zip(self.slots, self.parts[1:]):
+            chunks.append(escape(context[slot]))
+            chunks.append(part)
+        return "".join(chunks)
+
+
+class TemplateRenderer:
+    """One Jinja environment for the page templates and the email templates.
+
+    Templates are compiled once per process, and the compiled code is kept
+    in a bytecode cache on disk, so later processes skip parsing. Auto
+    reload is off by default, so a cached template is returned without
+    checking its file on every render. Rendering is async. Emails whose
+    per-user fields are plain interpolations can be prerendered into a
+    Skeleton; sending one then only escapes and joins the fields.
+    """
+
+    def __init__(self, directories, bytecode_cache: bool, auto_reload: bool):
+        self.env = Environment(
+            loader=FileSystemLoader([str(directory) for directory in directories]),
+            autoescape=select_autoescape(["html", "xml"]),
+            enable_async=True,
+            auto_reload=auto_reload,
+            bytecode_cache=FileSystemBytecodeCache() if bytecode_cache else None,
+        )
+        self._skeletons: dict[str, Skeleton] = {}
+        self.renders = 0
+        self.skeleton_fills = 0
+
+    def preload(self) -> int:
+        """The preload function compiles every template, so no request pays for it.
+
+        Returns:
+            int: Number of compiled templates.
+        """
+        names = self.env.list_templates(extensions=["html"])
+        for name in names:
+            self.env.get_template(name)
+        return len(names)
+
+    async def render(self, name: str, **context) -> str:
+        """The render function renders a template.
+
+        Args:
+            name (str): Template name.
+            **context: Template variables.
+
+        Returns:
+            str: Rendered template.
+        """
+        self.renders += 1
+        return await self.env.get_template(name).render_async(**context)
+
+    async def prerender(self, name: str, fields: tuple[str, ...]) -> bool:
+        """The prerender function renders the static part of a template once.
+            Use it only for templates whose fields are plain {{ field }} interpolations,
+            neither filtered nor tested in conditions.
+
+        Args:
+            name (str): Template name.
+            fields (tuple[str, ...]): Names of the per-call fields.
+
+        Returns:
+            bool: False if a field does not appear verbatim, then the template is
+                always rendered in full.
+        """
+        markers = {field: f"\x00{field}\x00" for field in fields}
+        html = await self.env.get_template(name).render_async(**markers)
+        pattern = "\x00(" + "|".join(map(re.escape, fields)) + ")\x00"
+        # Splitting on a group alternates static parts and matched field names
+        chunks = re.split(pattern, html)
+        parts, slots = chunks[0::2], chunks[1::2]
+        if set(slots) != set(fields) or any("\x00" in part for part in parts):
+            return False
+        self._skeletons[name] = Skeleton(tuple(fields), parts, slots)
+        return True
+
+    async def render_email(self, name: str, context: dict) -> str:
+        """The render_email function renders an email from its skeleton when there is one.
+
+        Args:
+            name (str): Template name.
+            context (dict): Template variables.
+
+        Returns:
+            str: Rendered email.
+        """
+        skeleton = self._skeletons.get(name)
+        if skeleton is not None and set(context) == set(skeleton.fields):
+            self.skeleton_fills += 1
+            return skeleton.fill(context)
+        return await self.render(name, **context)
+
+    def stats(self) -> dict:
+        return {
+            "compiled": len(self.env.cache or {}),
+            "skeletons": len(self._skeletons),
+            "renders": self.renders,
+            "skeleton_fills": self.skeleton_fills,
+        }
+
+
+renderer = TemplateRenderer(
+    TEMPLATE_DIRS, config.TEMPLATE_BYTECODE_CACHE, config.TEMPLATE_AUTO_RELOAD
+)
@@ -0,0 +1,358 @@
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import urllib.request
+import uuid
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+from urllib.parse import quote
+
+import cloudinary
+import cloudinary.uploader
+from cloudinary import CloudinaryImage
+from PIL import Image, ImageDraw, ImageFilter, ImageOps, UnidentifiedImageError
+
+from src.conf.config import config
+
+
+@dataclass(frozen=True)
+class StoredObject:
+    key: str
+    url: str
+    version: str | None = None
+
+
+class StorageBackend(ABC):
+    """Interface of an image storage backend.
+
+    Backends do blocking I/O, so every call runs on a dedicated bounded
+    thread pool instead of the event loop or the shared Starlette
+    threadpool. The pool size caps concurrent storage operations.
+    """
+
+    chunk_size = 1024 * 1024
+
+    def __init__(self, max_workers: int):
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="storage"
+        )
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, partial(func, *args, **kwargs)
+        )
+
+    async def digest(self, file) -> str:
+        """The digest function computes the SHA-256 of a file by streaming it in chunks.
+            The file is rewound afterwards, so it can be stored right away.
+
+        Args:
+            file (file): File object to hash.
+
+        Returns:
+            str: Hex digest of the content.
+        """
+
+        def sha256(file):
+            content_hash = hashlib.sha256()
+            for chunk in iter(partial(file.read, self.chunk_size), b""):
+                content_hash.update(chunk)
+            file.seek(0)
+            return content_hash.hexdigest()
+
+        return await self._run(sha256, file)
+
+    @abstractmethod
+    async def put(self, file, key: str | None = None) -> StoredObject:
+        """The put function stores a file.
+
+        Args:
+            file (file): File object to store.
+            key (str | None, optional): Key to store the file under, generated when omitted.
+
+        Returns:
+            StoredObject: Key and delivery URL of the stored file.
+        """
+
+    @abstractmethod
+    async def get(self, key: str) -> bytes:
+        """The get function returns the content of a stored file.
+
+        Args:
+            key (str): Key of the file.
+
+        Returns:
+            bytes: File content.
+        """
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        """The delete function removes a stored file.
+
+        Args:
+            key (str): Key of the file.
+        """
+
+    @abstractmethod
+    def url(self, key: str) -> str:
+        """The url function returns the delivery URL of a stored file.
+
+        Args:
+            key (str): Key of the file.
+
+        Returns:
+            str: Delivery URL.
+        """
+
+    @abstractmethod
+    async def transform(self, key: str, **transformations) -> str:
+        """The transform function returns the URL of a transformed version of a stored image.
+
+        Args:
+            key (str): Key of the source image.
+            **transformations: Transformation parameters, see schemas.image.Transformation.
+                format selects the output file format.
+
+        Returns:
+            str: Delivery URL of the transformed image.
+        """
+
+    @abstractmethod
+    def key_from_url(self, url: str) -> str:
+        """The key_from_url function extracts the storage key from a delivery URL.
+
+        Args:
+            url (str): Delivery URL.
+
+        Returns:
+            str: Storage key.
+        """
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class CloudinaryStorage(StorageBackend):
+    """Stores images in Cloudinary. Keys are public ids with the file extension."""
+
+    def __init__(self, max_workers: int):
+        super().__init__(max_workers)
+        cloudinary.config(
+            cloud_name=config.CLOUDINARY_NAME,
+            api_key=config.CLOUDINARY_API_KEY,
+            api_secret=config.CLOUDINARY_API_SECRET,
+            secure=True,
+        )
+
+    async def put(self, file, key: str | None = None) -> StoredObject:
+        options = {"public_id": key, "overwrite": True} if key else {}
+        result = await self._run(cloudinary.uploader.upload, file, **options)
+        url = result.get("url")
+        stored_key = (
+            f"{result['public_id']}.{result['format']}"
+            if "public_id" in result and "format" in result
+            else self.key_from_url(url)
+        )
+        return StoredObject(key=stored_key, url=url, version=result.get("version"))
+
+    async def get(self, key: str) -> bytes:
+        def download(url):
+            with urllib.request.urlopen(url) as response:
+                return response.read()
+
+        return await self._run(download, self.url(key))
+
+    async def delete(self, key: str) -> None:
+        await self._run(cloudinary.uploader.destroy, key.rsplit(".", 1)[0])
+
+    def url(self, key: str) -> str:
+        return CloudinaryImage(key).build_url()
+
+    async def transform(self, key: str, **transformations) -> str:
+        output_format = transformations.pop("format", None)
+        url = CloudinaryImage(key).build_url(**transformations)
+        if output_format:
+            url = f"{url.rsplit('.', 1)[0]}.{output_format}"
+        return url
+
+    def key_from_url(self, url: str) -> str:
+        return url.split("/")[-1]
+
+
+class LocalStorage(StorageBackend):
+    """Stores images on the local disk and renders transformations with Pillow.
+
+    Files are served under LOCAL_STORAGE_URL by the media route, see routes.media.
+    """
+
+    def __init__(self, max_workers: int, root: str, base_url: str):
+        super().__init__(max_workers)
+        self.root = Path(root).resolve()
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.base_url = base_url.rstrip("/")
+
+    def path(self, key: str) -> Path:
+        """The path function maps a key to a file inside the storage root.
+
+        Args:
+            key (str): Key of the file.
+
+        Raises:
+            FileNotFoundError: If the key points outside the storage root.
+
+        Returns:
+            Path: File path.
+        """
+        path = (self.root / key).resolve()
+        if not path.is_relative_to(self.root):
+            raise FileNotFoundError(key)
+        return path
+
+    def _write(self, file, key: str | None) -> str:
+        try:
+            extension = f".{Image.open(file).format.lower()}"
+        except (UnidentifiedImageError, AttributeError):
+            extension = ".bin"
+        file.seek(0)
+        key = f"{key or uuid.uuid4().hex}{extension}"
+        path = self.path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with atomic_path(path) as temporary, temporary.open("wb") as destination:
+            shutil.copyfileobj(file, destination)
+        return key
+
+    async def put(self, file, key: str | None = None) -> StoredObject:
+        stored_key = await self._run(self._write, file, key)
+        return StoredObject(key=stored_key, url=self.url(stored_key))
+
+    async def get(self, key: str) -> bytes:
+        return await self._run(self.path(key).read_bytes)
+
+    async def delete(self, key: str) -> None:
+        await self._run(self.path(key).unlink, missing_ok=True)
+
+    def url(self, key: str) -> str:
+        return f"{self.base_url}/{quote(key)}"
+
+    async def transform(self, key: str, **transformations) -> str:
+        params = {k: str(v) for k, v in transformations.items() if v is not None}
+        output_format = params.pop("format", None) or key.rsplit(".", 1)[-1]
+        source = self.path(key)
+        stat = await self._run(os.stat, source)
+        # Keys are reused, e.g. by avatars, so the derived file is named
+        # after the source version too and a re-upload renders a new one
+        digest = hashlib.sha1(
+            json.dumps(
+                [params, stat.st_mtime_ns, stat.st_size], sort_keys=True
+            ).encode()
+        ).hexdigest()[:16]
+        derived_key = f"derived/{Path(key).stem}_{digest}.{output_format}"
+        destination = self.path(derived_key)
+        if not destination.exists():
+            await self._run(render_transformation, source, destination, params)
+        return self.url(derived_key)
+
+    def key_from_url(self, url: str) -> str:
+        return url.removeprefix(f"{self.base_url}/")
+
+
+@contextmanager
+def atomic_path(path: Path):
+    """The atomic_path function yields a temporary path that replaces path once the block succeeds.
+        Readers never see a partially written file, and concurrent writers of
+        the same path leave one complete file behind.
+
+    Args:
+        path (Path): Final file path.
+
+    Yields:
+        Path: Temporary path in the same directory.
+    """
+    temporary = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        yield temporary
+        os.replace(temporary, path)
+    finally:
+        temporary.unlink(missing_ok=True)
+
+
+def render_transformation(source: Path, destination: Path, params: dict) -> None:
+    """The render_transformation function applies a subset of Cloudinary transformations with Pillow.
+
+    Args:
+        source (Path): Source image.
+        destination (Path): Output file, its suffix selects the format.
+        params (dict): Transformation parameters as strings.
+    """
+    img = ImageOps.exif_transpose(Image.open(source)).convert("RGB")
+    size = (int(params.get("width", img.width)), int(params.get("height", img.height)))
+    crop = params.get("crop")
+    if crop in ("fill", "lfill", "crop", "thumb"):
+        img = ImageOps.fit(img, size)
+    elif crop == "scale":
+        img = img.resize(size)
+    elif crop in ("fit", "limit"):
+        img.thumbnail(size)
+    elif crop in ("pad", "mpad"):
+        img = ImageOps.pad(img, size, color=params.get("background", "black"))
+
+    effect = params.get("effect")
+    if effect == "grayscale":
+        img = ImageOps.grayscale(img).convert("RGB")
+    elif effect == "monochrome":
+        img = img.convert("1").convert("RGB")
+    elif effect == "negate":
+        img = ImageOps.invert(img)
+    elif effect == "sepia":
+        img = ImageOps.colorize(ImageOps.grayscale(img), "#3b2a1a", "#f1e3c8")
+    elif effect == "oil_paint":
+        img = img.filter(ImageFilter.ModeFilter(5))
+    elif effect == "cartoonify":
+        img = ImageOps.posterize(img, 3)
+
+    if "blur" in params:
+        img = img.filter(ImageFilter.GaussianBlur(int(params["blur"]) / 100))
+    if "sharpen" in params:
+        img = img.filter(ImageFilter.UnsharpMask(percent=int(params["sharpen"])))
+    if "angle" in params:
+        img = img.rotate(-int(params["angle"]), expand=True)
+    if params.get("radius") == "max":
+        mask = Image.new("L", img.size, 0)
+        ImageDraw.Draw(mask).ellipse((0, 0, *img.size), fill=255)
+        img.putalpha(mask)
+
+    output_format = destination.suffix.lstrip(".").upper()
+    output_format = "JPEG" if output_format == "JPG" else output_format
+    if output_format == "JPEG":
+        img = img.convert("RGB")
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    with atomic_path(destination) as temporary:
+        img.save(temporary, format=output_format)
+
+
+def get_storage(backend: str) -> StorageBackend:
+    """The get_storage function creates the storage backend selected in settings.
+
+    Args:
+        backend (str): "cloudinary" or "local".
+
+    Returns:
+        StorageBackend: Storage backend.
+    """
+    if backend == "local":
+        return LocalStorage(
+            config.STORAGE_MAX_WORKERS,
+            config.LOCAL_STORAGE_DIR,
+            config.LOCAL_STORAGE_URL,
+        )
+    return CloudinaryStorage(config.STORAGE_MAX_WORKERS)
+
+
+storage = get_storage(config.STORAGE_BACKEND)
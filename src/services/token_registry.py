@@ -0,0 +1,126 @@
+import asyncio
+import logging
+import time
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+
+class TokenRegistry:
+    """Registry of revoked access tokens, keyed by their jti claim.
+
+    Revocations live in Redis as revoked:<jti> keys that expire together
+    with the token, so the registry never outgrows the set of tokens that
+    are still valid. Every worker mirrors the registry in memory: revocations
+    are announced on a pub/sub channel, and the listener reloads all keys
+    whenever it (re)subscribes. Checking a token is then a dict lookup
+    instead of a Redis round trip or a database write.
+    """
+
+    prefix = "revoked:"
+    channel = "tokens:revoked"
+
+    def __init__(self):
+        self.redis: Redis | None = None
+        self._revoked: dict[str, float] = {}
+        self._prune_at = 1024
+        self.revocations = 0
+
+    def init(self, redis: Redis) -> None:
+        """The init function attaches the Redis client that stores revocations.
+
+        Args:
+            redis (Redis): Async Redis client.
+        """
+        self.redis = redis
+
+    def _remember(self, jti: str, exp: float) -> None:
+        now = time.time()
+        if exp <= now:
+            return
+        self._revoked[jti] = exp
+        if len(self._revoked) >= self._prune_at:
+            # Drop revocations of tokens that have expired anyway
+            self._revoked = {
+                key: value for key, value in self._revoked.items() if value > now
+            }
+            self._prune_at = max(1024, 2 * len(self._revoked))
+
+    def is_revoked(self, jti: str | None) -> bool:
+        """The is_revoked function checks whether a token was revoked.
+
+        Args:
+            jti (str | None): Token id, None for tokens issued before ids were added.
+
+        Returns:
+            bool: True if the token was revoked.
+        """
+        if jti is None:
+            return False
+        exp = self._revoked.get(jti)
+        return exp is not None and exp > time.time()
+
+    async def revoke(self, jti: str, exp: float) -> None:
+        """The revoke function revokes a token on every worker until it expires.
+
+        Args:
+            jti (str): Token id.
+            exp (float): Token expiry as a UNIX timestamp.
+        """
+        self.revocations += 1
+        self._remember(jti, exp)
+        ttl = int(exp - time.time()) + 1
+        if self.redis is None or ttl <= 0:
+            return
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.set(self.prefix + jti, exp, ex=ttl)
+                pipe.publish(self.channel, f"{jti}:{exp}")
+                await pipe.execute()
+        except RedisError:
+            logger.warning("Cannot store revocation of token %s", jti, exc_info=True)
+
+    async def _load(self) -> None:
+        keys = [key async for key in self.redis.scan_iter(match=self.prefix + "*")]
+        if not keys:
+            return
+        for key, exp in zip(keys, await self.redis.mget(keys)):
+            if exp is not None:
+                key = key.decode() if isinstance(key, bytes) else key
+                self._remember(key.removeprefix(self.prefix), float(exp))
+
+    async def listen(self) -> None:
+        """The listen function mirrors revocations made by other workers.
+            It runs for the lifetime of the worker and resubscribes after any error,
+            reloading every stored revocation, because messages may have been missed.
+        """
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    await self._load()
+                    while True:
+                        message = await pubsub.get_message(
+                            ignore_subscribe_messages=True, timeout=1.0
+                        )
+                        if message is None:
+                            continue
+                        data = message["data"]
+                        if isinstance(data, bytes):
+                            data = data.decode()
+                        jti, _, exp = data.rpartition(":")
+                        self._remember(jti, float(exp))
+            except Exception:
+                # Any failure, not only a lost connection or a malformed
+                # message, must not end the listener, or this worker would
+                # keep accepting tokens revoked elsewhere
+                logger.exception("Token revocation listener failed, resubscribing")
+                await asyncio.sleep(1)
+
+    def stats(self) -> dict:
+        return {"revocations": self.revocations, "revoked": len(self._revoked)}
+
+
+token_registry = TokenRegistry()
@@ -0,0 +1,296 @@
+import asyncio
+import struct
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from src.conf.config import config
+from src.entity.models import Role, User
+
+ROLES = list(Role)
+NO_ROLE = 255
+
+# Reads the invalidation epoch of a user and the cached record in one round trip
+GET_USER_SCRIPT = """
+return {redis.call('GET', KEYS[1]) or '0', redis.call('GET', KEYS[2])}
+"""
+
+# Caches a record only if the user was not invalidated since the epoch was read
+SET_USER_SCRIPT = """
+if (redis.call('GET', KEYS[1]) or '0') ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[2], ARGV[2], 'EX', ARGV[3])
+return 1
+"""
+
+
+@dataclass(frozen=True, slots=True)
+class CachedUser:
+    """Fields of the current user that authorization needs, as stored in the auth cache.
+
+    Encoded with a fixed struct header followed by the UTF-8 email and
+    avatar, so decoding never runs code from the cache. Bump version when
+    the layout changes; the version is part of the cache key, so entries
+    written by older code are simply missed.
+    """
+
+    id: int
+    email: str
+    role: Role | None
+    is_active: bool
+    confirmed: bool
+    avatar: str | None
+
+    version = 1
+    # id, role index, is_active, confirmed, email length, avatar length
+    _header = struct.Struct("!QB??HH")
+
+    @classmethod
+    def from_user(cls, user: User) -> "CachedUser":
+        return cls(
+            id=user.id,
+            email=user.email,
+            role=user.role,
+            is_active=bool(user.is_active),
+            confirmed=bool(user.confirmed),
+            avatar=user.avatar,
+        )
+
+    @classmethod
+    def key(cls, email: str) -> str:
+        return f"user:v{cls.version}:{email}"
+
+    def encode(self) -> bytes:
+        email = self.email.encode()
+        avatar = (self.avatar or "").encode()
+        role = NO_ROLE if self.role is None else ROLES.index(self.role)
+        header = self._header.pack(
+            self.id, role, self.is_active, self.confirmed, len(email), len(avatar)
+        )
+        return header + email + avatar
+
+    @classmethod
+    def decode(cls, data: bytes) -> "CachedUser":
+        """The decode function restores a cached user from its encoded form.
+
+        Args:
+            data (bytes): Value written by encode.
+
+        Raises:
+            struct.error: If the value is truncated.
+            ValueError: If the value does not match the layout.
+
+        Returns:
+            CachedUser: Cached user.
+        """
+        user_id, role, is_active, confirmed, email_len, avatar_len = (
+            cls._header.unpack_from(data)
+        )
+        offset = cls._header.size
+        if len(data) != offset + email_len + avatar_len:
+            raise ValueError("Invalid cached user")
+        email = data[offset : offset + email_len].decode()
+        avatar = data[offset + email_len :].decode() or None
+        return cls(
+            id=user_id,
+            email=email,
+            role=None if role == NO_ROLE else ROLES[role],
+            is_active=is_active,
+            confirmed=confirmed,
+            avatar=avatar,
+        )
+
+
+class UserCache:
+    """Two-tier cache of CachedUser records used by Auth.get_current_user.
+
+    The first tier is a per-worker LRU with a short TTL, the second one is
+    Redis. A change to a user deletes the Redis entry and publishes the
+    email on a pub/sub channel; every worker listens on it and drops its
+    local entry, so a ban or role change applies cluster-wide right away.
+    The local TTL bounds staleness if a message is lost while reconnecting.
+
+    Every invalidation also bumps an epoch of the user. A miss returns the
+    epoch it saw, and set only caches the row loaded from the database if
+    the epoch is still the same, so a load that raced with a change cannot
+    write the old row back.
+    """
+
+    channel = "user_cache:invalidate"
+    epoch_prefix = "user_cache:epoch:"
+
+    def __init__(self, max_entries: int, local_ttl: float, ttl: int):
+        self.redis: Redis | None = None
+        self.max_entries = max_entries
+        self.local_ttl = local_ttl
+        self.ttl = ttl
+        self._local: OrderedDict[str, tuple[float, CachedUser]] = OrderedDict()
+        self._get_script = None
+        self._set_script = None
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def init(self, redis: Redis) -> None:
+        """The init function attaches the Redis client used as the second tier.
+
+        Args:
+            redis (Redis): Async Redis client.
+        """
+        self.redis = redis
+        self._get_script = redis.register_script(GET_USER_SCRIPT)
+        self._set_script = redis.register_script(SET_USER_SCRIPT)
+
+    def _keys(self, email: str) -> list[str]:
+        return [f"{self.epoch_prefix}{email}", CachedUser.key(email)]
+
+    def _remember(self, user: CachedUser) -> None:
+        if self.max_entries <= 0:
+            return
+        self._local[user.email] = (time.monotonic() + self.local_ttl, user)
+        self._local.move_to_end(user.email)
+        while len(self._local) > self.max_entries:
+            self._local.popitem(last=False)
+
+    def forget(self, email: str) -> None:
+        self._local.pop(email, None)
+
+    def clear(self) -> None:
+        self._local.clear()
+
+    async def get(self, email: str) -> tuple[CachedUser | None, str | None]:
+        """The get function returns the cached user with the email and the user's invalidation epoch.
+            Pass the epoch to set when the user has to be loaded from the database.
+
+        Args:
+            email (str): User email.
+
+        Returns:
+            tuple[CachedUser | None, str | None]: Cached user or None on a miss, and the
+                epoch or None when Redis was not asked or is not available.
+        """
+        entry = self._local.get(email)
+        if entry is not None:
+            expires_at, user = entry
+            if expires_at > time.monotonic():
+                self._local.move_to_end(email)
+                self.local_hits += 1
+                return user, None
+            self.forget(email)
+        user = epoch = None
+        if self.redis is not None:
+            try:
+                epoch, data = await self._get_script(keys=self._keys(email))
+                user = CachedUser.decode(data) if data is not None else None
+            except (RedisError, struct.error, ValueError) as err:
+                print(err)
+        if isinstance(epoch, bytes):
+            epoch = epoch.decode()
+        if user is None:
+            self.misses += 1
+            return None, epoch
+        self.redis_hits += 1
+        self._remember(user)
+        return user, epoch
+
+    async def set(self, user: User, epoch: str | None) -> CachedUser:
+        """The set function caches a user loaded from the database in both tiers.
+            Nothing is cached if the user was invalidated after get returned epoch, or
+            if the epoch is unknown while Redis is attached.
+
+        Args:
+            user (User): User to cache.
+            epoch (str | None): Epoch returned by get before the user was loaded.
+
+        Returns:
+            CachedUser: Cached representation of the user.
+        """
+        cached = CachedUser.from_user(user)
+        if self.redis is None:
+            self._remember(cached)
+            return cached
+        if epoch is None:
+            return cached
+        try:
+            stored = await self._set_script(
+                keys=self._keys(user.email), args=[epoch, cached.encode(), self.ttl]
+            )
+        except RedisError as err:
+            print(err)
+            return cached
+        if stored:
+            self._remember(cached)
+        return cached
+
+    async def invalidate(self, email: str) -> None:
+        """The invalidate function drops a changed user from every worker and from Redis.
+
+        Args:
+            email (str): Email of the changed user.
+        """
+        self.invalidations += 1
+        self.forget(email)
+        if self.redis is None:
+            return
+        epoch_key, key = self._keys(email)
+        try:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.incr(epoch_key)
+                # Outlives any load that read the previous epoch
+                pipe.expire(epoch_key, self.ttl)
+                pipe.delete(key)
+                pipe.publish(self.channel, email)
+                await pipe.execute()
+        except RedisError as err:
+            print(err)
+
+    async def listen(self) -> None:
+        """The listen function drops local entries announced on the invalidation channel.
+            It runs for the lifetime of the worker and resubscribes after connection errors.
+            Local entries are cleared on every (re)subscription, because messages may have
+            been missed while disconnected.
+        """
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    self.clear()
+                    while True:
+                        # A bounded wait, so an idle channel is not taken for a
+                        # dead connection by the socket timeout
+                        message = await pubsub.get_message(
+                            ignore_subscribe_messages=True, timeout=1.0
+                        )
+                        if message is None:
+                            continue
+                        email = message["data"]
+                        if isinstance(email, bytes):
+                            email = email.decode()
+                        self.forget(email)
+            except Exception as err:
+                # Any failure, not only a lost connection, must not end the
+                # listener, or this worker would keep stale entries
+                print(err)
+                await asyncio.sleep(1)
+
+    def stats(self) -> dict:
+        total = self.local_hits + self.redis_hits + self.misses
+        return {
+            "local_hits": self.local_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "local_hit_ratio": self.local_hits / total if total else 0.0,
+            "redis_hit_ratio": self.redis_hits / total if total else 0.0,
+            "local_entries": len(self._local),
+            "invalidations": self.invalidations,
+        }
+
+
+user_cache = UserCache(
+    config.USER_CACHE_LOCAL_SIZE, config.USER_CACHE_LOCAL_TTL, config.USER_CACHE_TTL
+)
@@ -3,12 +3,13 @@ from datetime import date
 
 import pytest
 import pytest_asyncio
+from fastapi import Request
 from fastapi.testclient import TestClient
 from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.pool import StaticPool
 
 from main import app
-from src.database.db import get_db
+from src.database.db import get_db, get_read_db
 from src.entity.models import Base, User
 from src.services.auth import auth_service
 
@@ -75,8 +76,9 @@ def init_models_wrap():
 def client():
     # Dependency override
 
-    async def override_get_db():
+    async def override_get_db(request: Request):
         session = TestingSessionLocal()
+        request.state.db = session
         try:
             yield session
         except Exception as err:
@@ -86,6 +88,7 @@ def client():
             await session.close()
 
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
 
     test_client = TestClient(app)
     test_client.headers.update({"X-Forwarded-For": "127.0.0.1"})
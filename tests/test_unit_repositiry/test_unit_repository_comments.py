@@ -79,8 +79,8 @@ class TestCommentRepository(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(result.image_id, mock_image.id)
         self.assertEqual(result.user_id, self.user.id)
         self.session.execute.assert_called_once()
-        self.session.commit.assert_called_once()
-        self.session.refresh.assert_called_once_with(result)
+        self.session.flush.assert_called_once()
+        self.session.refresh.assert_not_called()
 
     @pytest.mark.asyncio
     async def test_update_comment(self):
@@ -102,8 +102,8 @@ class TestCommentRepository(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(updated_comment.name, updated_body.name)
         mock_comment.name = updated_body.name
         self.session.execute.assert_called_once()
-        self.session.commit.assert_called_once()
-        self.session.refresh.assert_called_once_with(mock_comment)
+        self.session.flush.assert_called_once()
+        self.session.refresh.assert_not_called()
 
     @pytest.mark.asyncio
     async def test_delete_comment(self):
@@ -122,4 +122,4 @@ class TestCommentRepository(unittest.IsolatedAsyncioTestCase):
 
         self.session.execute.assert_called_once()
         self.session.delete.assert_called_once_with(mock_comment)
-        self.session.commit.assert_called_once()
+        self.session.flush.assert_called_once()
@@ -1,3 +1,4 @@
+import io
 import unittest
 from datetime import datetime
 from unittest.mock import AsyncMock, MagicMock, patch
@@ -6,16 +7,21 @@ import pytest
 from fastapi import UploadFile
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.database.db import commit
 from src.entity.models import Image, User
 from src.repository.images import (
+    decode_cursor,
     delete_image,
+    encode_cursor,
     get_all_images,
     get_foravatar_url,
     get_image,
     get_transformed_url,
     save_transformed_image,
+    transformation_key,
     update_image,
     upload_image,
+    upload_images,
 )
 from src.schemas.image import ImageUpdateSchema
 
@@ -23,6 +29,7 @@ from src.schemas.image import ImageUpdateSchema
 class TestImageRepository(unittest.IsolatedAsyncioTestCase):
     def setUp(self):
         self.session = AsyncMock(spec=AsyncSession)
+        self.session.begin_nested = MagicMock()
         self.user = User(
             id=1,
             username="test_user",
@@ -45,16 +52,72 @@ class TestImageRepository(unittest.IsolatedAsyncioTestCase):
     @patch("cloudinary.uploader.upload")
     async def test_upload_image(self, mock_upload):
         mock_upload.return_value = {"url": "http://example.com/image.jpg"}
-        mock_file = MagicMock(spec=UploadFile)
-        mock_file.filename = "test_image.jpg"
-        mock_file.content_type = "image/jpeg"
-        mock_file.read.return_value = b"file_content"
+        mocked_hash_result = MagicMock()
+        mocked_hash_result.scalar_one_or_none.return_value = None
+        self.session.execute.return_value = mocked_hash_result
+        file = io.BytesIO(b"file_content")
         image = await upload_image(
-            file=mock_file, description="Test Image", db=self.session, user=self.user
+            file=file, description="Test Image", db=self.session, user=self.user
         )
+        mock_upload.assert_called_once()
         self.assertEqual(image.url, "http://example.com/image.jpg")
         self.assertEqual(image.description, "Test Image")
         self.assertEqual(image.user_id, self.user.id)
+        self.assertEqual(len(image.content_hash), 64)
+        self.assertEqual(file.tell(), 0)
+
+    @patch("cloudinary.uploader.upload")
+    async def test_upload_duplicate_image(self, mock_upload):
+        mocked_hash_result = MagicMock()
+        mocked_hash_result.scalar_one_or_none.return_value = (
+            "http://example.com/existing.jpg"
+        )
+        self.session.execute.return_value = mocked_hash_result
+        image = await upload_image(
+            file=io.BytesIO(b"file_content"),
+            description="Test Image",
+            db=self.session,
+            user=self.user,
+        )
+        mock_upload.assert_not_called()
+        self.assertEqual(image.url, "http://example.com/existing.jpg")
+
+    @patch("cloudinary.uploader.upload")
+    async def test_upload_images(self, mock_upload):
+        def upload(file, **kwargs):
+            content = file.read()
+            if content == b"broken":
+                raise ValueError("storage error")
+            return {"url": f"http://example.com/{content.decode()}.jpg"}
+
+        mock_upload.side_effect = upload
+        self.session.info = {}
+        mocked_hash_result = MagicMock()
+        mocked_hash_result.all.return_value = []
+        self.session.execute.return_value = mocked_hash_result
+        files = [
+            (io.BytesIO(b"first"), "one"),
+            (io.BytesIO(b"broken"), "two"),
+            (io.BytesIO(b"first"), "three"),
+        ]
+        results = await upload_images(files, self.session, self.user, concurrency=2)
+
+        self.assertEqual(mock_upload.call_count, 2)
+        self.assertEqual(results[0].url, "http://example.com/first.jpg")
+        self.assertIsInstance(results[1], ValueError)
+        self.assertEqual(results[2].url, results[0].url)
+        self.assertEqual(results[2].description, "three")
+        self.assertEqual(self.session.add.call_count, 2)
+        # Hash lookup and one counter update for the whole batch
+        self.assertEqual(self.session.execute.call_count, 2)
+        self.session.flush.assert_called_once()
+
+        # A failed commit removes the files stored for the batch
+        self.session.commit.side_effect = ValueError("commit failed")
+        with patch("cloudinary.uploader.destroy") as mock_destroy:
+            with self.assertRaises(ValueError):
+                await commit(self.session)
+        mock_destroy.assert_called_once_with("first")
 
     async def test_update_image(self):
         body = ImageUpdateSchema(description="New Description")
@@ -66,15 +129,13 @@ class TestImageRepository(unittest.IsolatedAsyncioTestCase):
             user_id=self.user.id,
         )
 
-        mocked_image_result = MagicMock()
-        mocked_image_result.unique.return_value.scalar_one_or_none.return_value = image
-        self.session.execute.return_value = mocked_image_result
+        self.session.get.return_value = image
 
         updated_image = await update_image(image_id=1, body=body, db=self.session)
 
         self.assertEqual(updated_image.description, "New Description")
-        self.session.commit.assert_called_once()
-        self.session.refresh.assert_called_with(updated_image)
+        self.session.flush.assert_called_once()
+        self.session.refresh.assert_not_called()
 
     async def test_get_all_images(self):
         limit = 10
@@ -89,12 +150,41 @@ class TestImageRepository(unittest.IsolatedAsyncioTestCase):
             for i in range(5)
         ]
         mocked_images = MagicMock()
-        mocked_images.unique.return_value.scalars.return_value.all.return_value = images
+        mocked_images.scalars.return_value.all.return_value = images
         self.session.execute.return_value = mocked_images
         result = await get_all_images(limit, offset, self.session)
         self.assertEqual(result, images)
         self.assertEqual(len(result), len(images))
 
+    async def test_get_all_images_with_cursor(self):
+        images = [
+            Image(
+                id=i,
+                description=f"Image {i}",
+                created_at=datetime.now(),
+                updated_at=datetime.now(),
+            )
+            for i in range(3)
+        ]
+        mocked_images = MagicMock()
+        mocked_images.scalars.return_value.all.return_value = images
+        self.session.execute.return_value = mocked_images
+        cursor = encode_cursor(self.image)
+        result = await get_all_images(10, 0, self.session, cursor)
+        self.assertEqual(result, images)
+        stmt = self.session.execute.call_args[0][0]
+        self.assertIsNone(stmt._offset_clause)
+        self.assertIsNotNone(stmt.whereclause)
+
+    async def test_get_all_images_invalid_cursor(self):
+        with self.assertRaises(ValueError):
+            await get_all_images(10, 0, self.session, "not-a-cursor")
+        self.session.execute.assert_not_called()
+
+    def test_cursor_round_trip(self):
+        cursor = encode_cursor(self.image)
+        self.assertEqual(decode_cursor(cursor), (self.image.created_at, self.image.id))
+
     async def test_get_image(self):
         image = Image(
             id=1,
@@ -105,26 +195,56 @@ class TestImageRepository(unittest.IsolatedAsyncioTestCase):
         )
 
         mocked_image = MagicMock()
-        mocked_image.unique.return_value.scalar_one_or_none.return_value = image
+        mocked_image.scalar_one_or_none.return_value = image
         self.session.execute.return_value = mocked_image
         result = await get_image(1, self.session, self.user)
         self.assertEqual(result, image)
 
     @patch("cloudinary.uploader.destroy")
     async def test_delete_image(self, mock_destroy):
-        mocked_image_result = MagicMock()
-        mocked_image_result.scalar_one_or_none.return_value = self.image
-        mocked_user_result = MagicMock()
-        mocked_user_result.scalar_one_or_none.return_value = self.user
-        self.session.execute.side_effect = [mocked_image_result, mocked_user_result]
+        self.session.info = {}
+        self.session.get.return_value = self.image
+        self.session.execute.return_value = MagicMock()
         mock_destroy.return_value = {"result": "ok"}
 
         deleted_image = await delete_image(image_id=1, db=self.session)
 
+        self.session.delete.assert_called_once_with(self.image)
+        self.session.flush.assert_called_once()
+        self.assertEqual(deleted_image, self.image)
+        # The file is removed only once the deletion commits
+        mock_destroy.assert_not_called()
+        await commit(self.session)
         mock_destroy.assert_called_once_with("image")
+
+    @patch("cloudinary.uploader.destroy")
+    async def test_delete_shared_image(self, mock_destroy):
+        self.session.info = {}
+        self.image.content_hash = "a" * 64
+        self.session.get.return_value = self.image
+        mocked_shared_result = MagicMock()
+        mocked_shared_result.scalar_one_or_none.return_value = 2
+        self.session.execute.side_effect = [
+            MagicMock(),
+            MagicMock(),
+            mocked_shared_result,
+        ]
+
+        deleted_image = await delete_image(image_id=1, db=self.session)
+        await commit(self.session)
+
+        mock_destroy.assert_not_called()
         self.session.delete.assert_called_once_with(self.image)
-        self.session.commit.assert_called_once()
         self.assertEqual(deleted_image, self.image)
+        # Sharers are locked first and re-checked after the delete is flushed
+        lock = self.session.execute.await_args_list[0].args[0]
+        self.assertTrue(lock._for_update_arg is not None)
+
+    async def test_delete_missing_image(self):
+        self.session.get.return_value = None
+
+        self.assertIsNone(await delete_image(image_id=1, db=self.session))
+        self.session.delete.assert_not_called()
 
     async def test_save_transformed_image(self):
         image_url = "http://example.com/transformed_image.jpg"
@@ -136,8 +256,8 @@ class TestImageRepository(unittest.IsolatedAsyncioTestCase):
             db=self.session,
         )
         self.session.add.assert_called_once()
-        self.session.commit.assert_called_once()
-        self.session.refresh.assert_called()
+        self.session.flush.assert_called_once()
+        self.session.refresh.assert_not_called()
         self.assertEqual(saved_image.url, image_url)
         self.assertEqual(saved_image.description, image_description)
         self.assertEqual(saved_image.user_id, self.user.id)
@@ -147,11 +267,16 @@ class TestImageRepository(unittest.IsolatedAsyncioTestCase):
     async def test_get_transformed_url(self, mock_build_url):
         mock_build_url.return_value = "http://example.com/transformed_image.jpg"
 
-        async def mock_get_image(image_id, db, user):
+        async def mock_get_image(image_id, db, user, **kwargs):
             mock_image = MagicMock()
+            mock_image.id = 1
             mock_image.url = "http://example.com/image.jpg"
             return mock_image
 
+        memo = MagicMock()
+        memo.scalar_one_or_none.return_value = None
+        self.session.execute.return_value = memo
+
         with patch("src.repository.images.get_image", side_effect=mock_get_image):
             result = await get_transformed_url(
                 image_id=1,
@@ -163,19 +288,24 @@ class TestImageRepository(unittest.IsolatedAsyncioTestCase):
         expected_url = "http://example.com/transformed_image.jpg"
         assert result == expected_url
         self.session.add.assert_called()
-        self.session.commit.assert_called_once()
-        self.session.refresh.assert_called()
+        self.assertEqual(self.session.flush.call_count, 2)
+        self.session.refresh.assert_not_called()
 
     @pytest.mark.asyncio
     @patch("cloudinary.CloudinaryImage.build_url")
     async def test_get_foravatar_url(self, mock_build_url):
         mock_build_url.return_value = "http://example.com/transformed_image.jpg"
 
-        async def mock_get_image(image_id, db, user):
+        async def mock_get_image(image_id, db, user, **kwargs):
             mock_image = MagicMock()
+            mock_image.id = 1
             mock_image.url = "http://example.com/image.jpg"
             return mock_image
 
+        memo = MagicMock()
+        memo.scalar_one_or_none.return_value = None
+        self.session.execute.return_value = memo
+
         with patch("src.repository.images.get_image", side_effect=mock_get_image):
             result = await get_foravatar_url(
                 image_id=1,
@@ -187,8 +317,43 @@ class TestImageRepository(unittest.IsolatedAsyncioTestCase):
         expected_url = "http://example.com/transformed_image.png"
         self.assertEqual(result, expected_url)
         self.session.add.assert_called()
-        self.session.commit.assert_called_once()
-        self.session.refresh.assert_called()
+        self.assertEqual(self.session.flush.call_count, 2)
+        self.session.refresh.assert_not_called()
+
+    @patch("cloudinary.CloudinaryImage.build_url")
+    async def test_get_transformed_url_memoized(self, mock_build_url):
+        async def mock_get_image(image_id, db, user, **kwargs):
+            mock_image = MagicMock()
+            mock_image.id = 1
+            mock_image.url = "http://example.com/image.jpg"
+            return mock_image
+
+        memo = MagicMock()
+        memo.scalar_one_or_none.return_value = "http://example.com/memo.jpg"
+        self.session.execute.return_value = memo
+
+        with patch("src.repository.images.get_image", side_effect=mock_get_image):
+            result = await get_transformed_url(
+                image_id=1,
+                transformations={"crop": "fill"},
+                user=self.user,
+                db=self.session,
+            )
+
+        self.assertEqual(result, "http://example.com/memo.jpg")
+        mock_build_url.assert_not_called()
+        self.session.add.assert_not_called()
+        self.session.flush.assert_not_called()
+
+    def test_transformation_key(self):
+        self.assertEqual(
+            transformation_key("transform", {"width": 100, "crop": "fill", "angle": None}),
+            transformation_key("transform", {"crop": "fill", "width": "100"}),
+        )
+        self.assertNotEqual(
+            transformation_key("transform", {"crop": "fill"}),
+            transformation_key("avatar", {"crop": "fill"}),
+        )
 
 
 if __name__ == "__main__":
@@ -1,5 +1,5 @@
 import unittest
-from unittest.mock import AsyncMock, MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -20,21 +20,19 @@ class TestTagRepository(unittest.IsolatedAsyncioTestCase):
         self.session = AsyncMock(spec=AsyncSession)
         self.tags = [Tag(name="tag1"), Tag(name="tag2"), Tag(name="tag3")]
 
-    @patch("src.repository.tags.get_tag")
-    async def test_create_tags(self, mock_get_tag):
+    async def test_create_tags(self):
         body = TagSchema(tag_list=["new_tag1", "existing_tag1", "new_tag2"])
         existing_tags = [Tag(name="existing_tag1"), Tag(name="existing_tag2")]
         execute_result = MagicMock()
         execute_result.scalars.return_value.all.return_value = existing_tags
         self.session.execute.return_value = execute_result
-        mock_get_tag.side_effect = lambda name, db: Tag(name=name)
 
         result = await create_tags(body, self.session)
 
         self.session.execute.assert_called_once()
         self.assertEqual(self.session.add.call_count, 2)
-        self.session.commit.assert_called_once()
-        self.assertEqual(self.session.refresh.call_count, 2)
+        self.session.flush.assert_called_once()
+        self.session.refresh.assert_not_called()
         result_tag_names = [tag.name for tag in result]
         self.assertSetEqual(set(result_tag_names), set(body.tag_list))
 
@@ -74,8 +72,8 @@ class TestTagRepository(unittest.IsolatedAsyncioTestCase):
         result = await update_tag(tag_id, body, self.session)
 
         self.session.execute.assert_called_once()
-        self.session.commit.assert_called_once()
-        self.session.refresh.assert_called_once_with(tag)
+        self.session.flush.assert_called_once()
+        self.session.refresh.assert_not_called()
 
         self.assertEqual(result.name, "updated_tag")
         self.assertEqual(result.id, 1)
@@ -91,7 +89,7 @@ class TestTagRepository(unittest.IsolatedAsyncioTestCase):
         result = await update_tag(tag_id, body, self.session)
 
         self.session.execute.assert_called_once()
-        self.session.commit.assert_not_called()
+        self.session.flush.assert_not_called()
         self.session.refresh.assert_not_called()
 
         self.assertIsNone(result)
@@ -107,7 +105,7 @@ class TestTagRepository(unittest.IsolatedAsyncioTestCase):
 
         self.session.execute.assert_called_once()
         self.session.delete.assert_called_once_with(tag)
-        self.session.commit.assert_called_once()
+        self.session.flush.assert_called_once()
 
         self.assertEqual(result, tag)
 
@@ -121,7 +119,7 @@ class TestTagRepository(unittest.IsolatedAsyncioTestCase):
 
         self.session.execute.assert_called_once()
         self.session.delete.assert_not_called()
-        self.session.commit.assert_not_called()
+        self.session.flush.assert_not_called()
 
         self.assertIsNone(result)
 
@@ -148,6 +146,7 @@ class TestRepositoryTagForImage(unittest.IsolatedAsyncioTestCase):
             id=self.image_id, user_id=self.user.id
         )
         self.session.execute.return_value = execute_result
+        self.session.begin_nested = MagicMock()
 
         # Mocking the create_tags function
         mock_created_tags = [Tag(id=1, name="tag1"), Tag(id=2, name="tag2")]
@@ -161,7 +160,7 @@ class TestRepositoryTagForImage(unittest.IsolatedAsyncioTestCase):
 
         # Asserting database operations
         create_tags_mock.assert_called_once_with(self.tag_schema, self.session)
-        self.session.commit.assert_called_once()
+        self.session.begin_nested.assert_called_once()
 
         # Asserting the result
         self.assertEqual(result, mock_created_tags)
@@ -14,7 +14,6 @@ from src.repository.users import (
     set_user_status,
     update_avatar_url,
     update_password,
-    update_token,
     update_user,
     update_user_role,
 )
@@ -72,8 +71,8 @@ class TestAsyncUsers(unittest.IsolatedAsyncioTestCase):
         )
         result = await create_user(body, self.session)
         self.session.add.assert_called_once()
-        self.session.commit.assert_called_once()
-        self.session.refresh.assert_called_once()
+        self.session.flush.assert_called_once()
+        self.session.refresh.assert_not_called()
         self.assertEqual(result.username, user.username)
         self.assertEqual(result.email, user.email)
         self.assertEqual(result.password, user.password)
@@ -94,7 +93,7 @@ class TestAsyncUsers(unittest.IsolatedAsyncioTestCase):
             await confirmed_email(email, self.session)
 
             self.assertTrue(user.confirmed)
-            self.session.commit.assert_called_once()
+            self.session.flush.assert_called_once()
 
     async def test_update_avatar_url(self):
         email = "test_user@example.com"
@@ -113,8 +112,8 @@ class TestAsyncUsers(unittest.IsolatedAsyncioTestCase):
         ):
             result = await update_avatar_url(email, avatar_url, self.session)
             self.assertEqual(result.avatar, avatar_url)
-            self.session.commit.assert_called_once()
-            self.session.refresh.assert_called_once_with(user)
+            self.session.flush.assert_called_once()
+            self.session.refresh.assert_not_called()
 
     async def test_update_password(self):
         user = User(
@@ -128,8 +127,8 @@ class TestAsyncUsers(unittest.IsolatedAsyncioTestCase):
 
         result = await update_password(user, new_password, self.session)
         self.assertEqual(result.password, new_password)
-        self.session.commit.assert_called_once()
-        self.session.refresh.assert_called_once_with(user)
+        self.session.flush.assert_called_once()
+        self.session.refresh.assert_not_called()
 
     async def test_update_user(self):
         user_update = UserUpdate(username="new_username", email="new_email@example.com")
@@ -140,8 +139,8 @@ class TestAsyncUsers(unittest.IsolatedAsyncioTestCase):
 
         self.assertEqual(updated_user.username, "new_username")
         self.assertEqual(updated_user.email, "new_email@example.com")
-        self.session.commit.assert_called_once()
-        self.session.refresh.assert_called_once_with(updated_user)
+        self.session.flush.assert_called_once()
+        self.session.refresh.assert_not_called()
 
     async def test_update_user_partial(self):
         user_update = UserUpdate(username=None, email="new_email@example.com")
@@ -152,8 +151,8 @@ class TestAsyncUsers(unittest.IsolatedAsyncioTestCase):
 
         self.assertEqual(updated_user.username, self.username)
         self.assertEqual(updated_user.email, "new_email@example.com")
-        self.session.commit.assert_called_once()
-        self.session.refresh.assert_called_once_with(updated_user)
+        self.session.flush.assert_called_once()
+        self.session.refresh.assert_not_called()
 
     @patch("src.repository.users.get_user_by_email")
     async def test_set_user_status_found(self, mock_get_user_by_email):
@@ -164,8 +163,8 @@ class TestAsyncUsers(unittest.IsolatedAsyncioTestCase):
         )
 
         self.assertTrue(updated_user.is_active)
-        self.session.commit.assert_called_once()
-        self.session.refresh.assert_called_once_with(updated_user)
+        self.session.flush.assert_called_once()
+        self.session.refresh.assert_not_called()
 
     @patch("src.repository.users.get_user_by_email")
     async def test_set_user_status_not_found(self, mock_get_user_by_email):
@@ -178,7 +177,7 @@ class TestAsyncUsers(unittest.IsolatedAsyncioTestCase):
 
         self.assertEqual(context.exception.status_code, status.HTTP_404_NOT_FOUND)
         self.assertEqual(context.exception.detail, messages.USER_NOT_FOUND)
-        self.session.commit.assert_not_called()
+        self.session.flush.assert_not_called()
         self.session.refresh.assert_not_called()
 
     @patch("src.repository.users.get_user_by_email")
@@ -192,8 +191,8 @@ class TestAsyncUsers(unittest.IsolatedAsyncioTestCase):
         )
 
         self.assertEqual(updated_user.role, new_role)
-        self.session.commit.assert_called_once()
-        self.session.refresh.assert_called_once_with(updated_user)
+        self.session.flush.assert_called_once()
+        self.session.refresh.assert_not_called()
 
     @patch("src.repository.users.get_user_by_email")
     async def test_update_user_role_not_found(self, mock_get_user_by_email):
@@ -206,13 +205,5 @@ class TestAsyncUsers(unittest.IsolatedAsyncioTestCase):
 
         self.assertEqual(context.exception.status_code, status.HTTP_404_NOT_FOUND)
         self.assertEqual(context.exception.detail, messages.USER_NOT_FOUND)
-        self.session.commit.assert_not_called()
+        self.session.flush.assert_not_called()
         self.session.refresh.assert_not_called()
-
-    async def test_update_token(self):
-        token = "test_token"
-        mocked_user = MagicMock()
-        mocked_user.scalar_one_or_none.return_value = self.user
-        self.session.execute.return_value = mocked_user
-        await update_token(self.user, token, self.session)
-        self.session.commit.assert_called_once()
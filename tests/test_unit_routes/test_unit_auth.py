@@ -21,21 +21,6 @@
 #         self.redis_mock = self.redis_patch.start()
 #         self.redis_mock.get.return_value = None
 
-#         self.limiter_redis_patch = patch(
-#             "fastapi_limiter.FastAPILimiter.redis", AsyncMock()
-#         )
-#         self.limiter_redis_mock = self.limiter_redis_patch.start()
-
-#         self.limiter_identifier_patch = patch(
-#             "fastapi_limiter.FastAPILimiter.identifier", AsyncMock()
-#         )
-#         self.limiter_identifier_mock = self.limiter_identifier_patch.start()
-
-#         self.limiter_http_callback_patch = patch(
-#             "fastapi_limiter.FastAPILimiter.http_callback", AsyncMock()
-#         )
-#         self.limiter_http_callback_mock = self.limiter_http_callback_patch.start()
-
 #         self.create_user_patch = patch(
 #             "src.repository.users.create_user", new_callable=AsyncMock
 #         )
@@ -48,9 +33,6 @@
 
 #     def tearDown(self):
 #         self.redis_patch.stop()
-#         self.limiter_redis_patch.stop()
-#         self.limiter_identifier_patch.stop()
-#         self.limiter_http_callback_patch.stop()
 #         self.create_user_patch.stop()
 
 #     async def test_signup(self):
@@ -85,6 +67,7 @@ from src.entity.models import User
 from tests.conftest import TestingSessionLocal
 from src.services.auth import auth_service
 from src.conf import messages
+from src.conf.config import config
 
 
 class TestSignup:
@@ -98,13 +81,8 @@ class TestSignup:
     def setup_monkeypatch(monkeypatch):
         with patch.object(auth_service, "cache") as redis_mock:
             redis_mock.get.return_value = None
-            monkeypatch.setattr("fastapi_limiter.FastAPILimiter.redis", AsyncMock())
-            monkeypatch.setattr(
-                "fastapi_limiter.FastAPILimiter.identifier", AsyncMock()
-            )
-            monkeypatch.setattr(
-                "fastapi_limiter.FastAPILimiter.http_callback", AsyncMock()
-            )
+            # No route limits, so the tests can sign up and log in repeatedly
+            monkeypatch.setattr(config, "RATE_LIMITS", {})
 
     def test_signup(self, client, monkeypatch):
         self.setup_monkeypatch(monkeypatch)
@@ -0,0 +1,232 @@
+import asyncio
+import io
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from src.services.auth import auth_service
+from src.services.user_cache import user_cache
+from tests.conftest import test_user
+
+
+@contextmanager
+def count_queries():
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(Engine, "before_cursor_execute", before_cursor_execute)
+
+
+class TestImageQueryCount:
+    """Every image endpoint must keep a fixed number of SQL statements,
+    independent of how many comments and tags the image has."""
+
+    @pytest.fixture(autouse=True)
+    def setup_monkeypatch(self, monkeypatch):
+        # Keep the current user uncached, so every request loads it
+        monkeypatch.setattr(user_cache, "max_entries", 0)
+        monkeypatch.setattr(user_cache, "redis", None)
+        monkeypatch.setattr(
+            "cloudinary.uploader.upload",
+            lambda *args, **kwargs: {
+                "url": "http://res.cloudinary.com/demo/image/upload/v1/sample.jpg"
+            },
+        )
+        monkeypatch.setattr(
+            "cloudinary.uploader.destroy", lambda *args, **kwargs: {"result": "ok"}
+        )
+
+    @pytest.fixture()
+    def headers(self):
+        token = asyncio.run(
+            auth_service.create_access_token(data={"sub": test_user["email"]})
+        )
+        return {"Authorization": f"Bearer {token}"}
+
+    @pytest.fixture()
+    def image_id(self, client, headers):
+        response = client.post(
+            "api/images/upload/",
+            files={"file": ("sample.jpg", io.BytesIO(b"image"), "image/jpeg")},
+            data={"description": "sample"},
+            headers=headers,
+        )
+        assert response.status_code == 201, response.text
+        image_id = response.json()["id"]
+        for i in range(3):
+            client.post(
+                "api/comments/create",
+                params={"image_id": image_id},
+                json={"name": f"comment {i}"},
+                headers=headers,
+            )
+        client.post(
+            "api/tags/add_tags_for_image",
+            params={"image_id": image_id},
+            json={"tag_list": ["one", "two", "three"]},
+            headers=headers,
+        )
+        return image_id
+
+    def test_upload_image(self, client, headers):
+        with count_queries() as statements:
+            response = client.post(
+                "api/images/upload/",
+                files={"file": ("sample.jpg", io.BytesIO(b"image"), "image/jpeg")},
+                data={"description": "sample"},
+                headers=headers,
+            )
+        assert response.status_code == 201, response.text
+        assert len(statements) == 4, statements
+
+    def test_get_all_images(self, client, image_id):
+        with count_queries() as statements:
+            response = client.get("api/images/show/", params={"limit": 10})
+        assert response.status_code == 200, response.text
+        assert isinstance(response.json(), list)
+        assert len(statements) == 3, statements
+        assert not any(
+            "comments" in statement and "tags" in statement
+            for statement in statements
+        )
+
+    def test_get_image_feed(self, client, image_id):
+        with count_queries() as statements:
+            response = client.get("api/images/feed/", params={"limit": 10})
+        assert response.status_code == 200, response.text
+        assert image_id in [item["id"] for item in response.json()["items"]]
+        assert len(statements) == 3, statements
+        response = client.get("api/images/feed/", params={"cursor": "garbage"})
+        assert response.status_code == 400, response.text
+
+    def test_get_image(self, client, headers, image_id):
+        with count_queries() as statements:
+            response = client.get(
+                "api/images/", params={"image_id": image_id}, headers=headers
+            )
+        assert response.status_code == 200, response.text
+        data = response.json()
+        assert len(data["comments"]) == 3
+        assert len(data["tags"]) == 3
+        assert len(statements) == 4, statements
+        assert not any(
+            "comments" in statement and "tags" in statement
+            for statement in statements
+        )
+
+    def test_update_image(self, client, headers, image_id):
+        with count_queries() as statements:
+            response = client.put(
+                f"api/images/update/{image_id}",
+                json={"description": "updated"},
+                headers=headers,
+            )
+        assert response.status_code == 200, response.text
+        assert response.json()["description"] == "updated"
+        assert len(statements) == 5, statements
+
+    def test_update_image_requires_owner(self, client, image_id):
+        response = client.put(
+            f"api/images/update/{image_id}", json={"description": "updated"}
+        )
+        assert response.status_code == 401, response.text
+
+    def test_upload_batch(self, client, headers, monkeypatch, caplog):
+        calls = []
+
+        def upload(file, **kwargs):
+            content = file.read()
+            calls.append(content)
+            if content == b"broken":
+                raise ValueError("storage error")
+            return {"url": f"http://res.cloudinary.com/demo/{content.decode()}.jpg"}
+
+        monkeypatch.setattr("cloudinary.uploader.upload", upload)
+        files = [
+            ("files", (f"{name}.jpg", io.BytesIO(name.encode()), "image/jpeg"))
+            for name in ("first", "second", "first", "broken")
+        ]
+        with count_queries() as statements:
+            response = client.post(
+                "api/images/upload/batch/",
+                files=files,
+                data={"descriptions": ["one", "two", "three", "four"]},
+                headers=headers,
+            )
+        assert response.status_code == 201, response.text
+        body = response.json()
+        assert body["created"] == 3
+        assert body["failed"] == 1
+        items = body["items"]
+        assert [item["image"]["description"] for item in items[:3]] == [
+            "one",
+            "two",
+            "three",
+        ]
+        assert items[0]["image"]["url"] == items[2]["image"]["url"]
+        assert items[3]["image"] is None and items[3]["error"]
+        assert "'broken.jpg' failed" in caplog.text
+        assert sorted(calls) == [b"broken", b"first", b"second"]
+        assert len(statements) == 6, statements
+
+    def test_upload_batch_descriptions_mismatch(self, client, headers):
+        response = client.post(
+            "api/images/upload/batch/",
+            files=[("files", ("a.jpg", io.BytesIO(b"a"), "image/jpeg"))],
+            data={"descriptions": ["one", "two"]},
+            headers=headers,
+        )
+        assert response.status_code == 400, response.text
+
+    def test_qr_code(self, client, headers, image_id):
+        with count_queries() as statements:
+            response = client.get(
+                "api/images/qr_code", params={"image_id": image_id}, headers=headers
+            )
+        assert response.status_code == 200, response.text
+        assert len(statements) == 2, statements
+
+    def test_qr_code_not_modified(self, client, headers, image_id):
+        response = client.get(
+            "api/images/qr_code", params={"image_id": image_id}, headers=headers
+        )
+        assert response.status_code == 200, response.text
+        etag = response.headers["etag"]
+        response = client.get(
+            "api/images/qr_code",
+            params={"image_id": image_id},
+            headers={**headers, "If-None-Match": etag},
+        )
+        assert response.status_code == 304
+        assert response.headers["etag"] == etag
+        assert response.content == b""
+
+    def test_transform_ignores_if_none_match(self, client, headers, image_id):
+        params = {"image_id": image_id}
+        body = {"gravity": "center", "crop": "thumb", "effect": "sepia"}
+        response = client.post(
+            "api/images/transform", params=params, json=body, headers=headers
+        )
+        assert response.status_code == 200, response.text
+        response = client.post(
+            "api/images/transform",
+            params=params,
+            json=body,
+            headers={**headers, "If-None-Match": response.headers["etag"]},
+        )
+        assert response.status_code == 200, response.text
+        assert response.headers["content-type"] == "image/png"
+
+    def test_delete_image(self, client, headers, image_id):
+        with count_queries() as statements:
+            response = client.delete(f"api/images/{image_id}", headers=headers)
+        assert response.status_code == 200, response.text
+        assert len(statements) == 10, statements
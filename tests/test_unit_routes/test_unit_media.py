@@ -0,0 +1,94 @@
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.routes import media
+from src.routes.media import parse_range
+from src.services.storage import LocalStorage
+
+
+class TestParseRange(unittest.TestCase):
+    def test_bounded_range(self):
+        self.assertEqual(parse_range("bytes=0-99", 1000), (0, 99))
+
+    def test_open_range(self):
+        self.assertEqual(parse_range("bytes=900-", 1000), (900, 999))
+
+    def test_suffix_range(self):
+        self.assertEqual(parse_range("bytes=-100", 1000), (900, 999))
+
+    def test_end_is_clamped(self):
+        self.assertEqual(parse_range("bytes=500-5000", 1000), (500, 999))
+
+    def test_unsatisfiable(self):
+        with self.assertRaises(ValueError):
+            parse_range("bytes=1000-", 1000)
+
+    def test_multiple_ranges(self):
+        with self.assertRaises(ValueError):
+            parse_range("bytes=0-1,5-6", 1000)
+
+
+class TestGetMedia(unittest.TestCase):
+    content = bytes(range(256)) * 4
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.storage = LocalStorage(2, self.tmp.name, "/media")
+        self.storage.path("sample.png").write_bytes(self.content)
+        self.storage_patch = patch.object(media, "storage", self.storage)
+        self.storage_patch.start()
+        app = FastAPI()
+        app.include_router(media.router)
+        self.client = TestClient(app)
+        self.url = f"{media.router.prefix}/sample.png"
+
+    def tearDown(self):
+        self.storage_patch.stop()
+        self.storage.shutdown()
+        self.tmp.cleanup()
+
+    def test_get(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, self.content)
+        self.assertEqual(response.headers["content-type"], "image/png")
+        self.assertEqual(response.headers["accept-ranges"], "bytes")
+        self.assertIn("etag", response.headers)
+
+    def test_head(self):
+        response = self.client.head(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response.headers["content-length"], str(len(self.content)))
+
+    def test_range(self):
+        response = self.client.get(self.url, headers={"Range": "bytes=100-199"})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.content, self.content[100:200])
+        self.assertEqual(
+            response.headers["content-range"], f"bytes 100-199/{len(self.content)}"
+        )
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get(self.url, headers={"Range": "bytes=5000-"})
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(
+            response.headers["content-range"], f"bytes */{len(self.content)}"
+        )
+
+    def test_missing_file(self):
+        response = self.client.get(f"{media.router.prefix}/missing.png")
+        self.assertEqual(response.status_code, 404)
+
+    def test_partial_upload_is_not_served(self):
+        self.storage.path(".sample.png.0123abcd.tmp").write_bytes(b"partial")
+        response = self.client.get(f"{media.router.prefix}/.sample.png.0123abcd.tmp")
+        self.assertEqual(response.status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,11 @@
+import asyncio
+import io
 import unittest
 from unittest.mock import AsyncMock, MagicMock, patch
 from unittest import TestCase
 from fastapi import BackgroundTasks, Request, HTTPException, status
 from httpx import AsyncClient
+import pytest
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.db import get_db
@@ -12,6 +15,8 @@ from src.schemas.user import UserSchema
 from src.repository import users as repositories_users
 from src.routes import users as routes_users
 from src.services.auth import auth_service
+from src.services.user_cache import user_cache
+from tests.conftest import test_user
 
 
 # class TestSignupEndpoint(unittest.IsolatedAsyncioTestCase):
@@ -97,5 +102,36 @@ class TestSignupEndpoint(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(response.username, "testuser")
         self.assertEqual(response.email, "test@example.com")
 
+class TestAvatarEndpoint:
+    @pytest.fixture(autouse=True)
+    def setup_monkeypatch(self, monkeypatch):
+        monkeypatch.setattr(user_cache, "redis", None)
+        monkeypatch.setattr(
+            "cloudinary.uploader.upload",
+            lambda *args, **kwargs: {
+                "url": "http://res.cloudinary.com/demo/image/upload/v7/restapp/a.png",
+                "public_id": kwargs["public_id"],
+                "format": "png",
+                "version": "7",
+            },
+        )
+
+    def test_avatar_user(self, client):
+        token = asyncio.run(
+            auth_service.create_access_token(data={"sub": test_user["email"]})
+        )
+        invalidate = AsyncMock()
+        with patch.object(user_cache, "invalidate", invalidate):
+            response = client.patch(
+                "api/users/avatar",
+                files={"file": ("avatar.png", io.BytesIO(b"avatar"), "image/png")},
+                headers={"Authorization": f"Bearer {token}"},
+            )
+        assert response.status_code == 200, response.text
+        assert "restapp" in response.json()["avatar"]
+        # The cache is only invalidated once the new avatar is committed
+        invalidate.assert_awaited_once_with(test_user["email"])
+
+
 if __name__ == "__main__":
     unittest.main()
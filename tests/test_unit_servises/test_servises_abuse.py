@@ -0,0 +1,67 @@
+import unittest
+from ipaddress import ip_address
+from unittest.mock import AsyncMock, MagicMock
+
+from redis.exceptions import RedisError
+
+from src.services.abuse import AbuseDetector
+from src.services.bans import BanList
+
+
+class TestAbuseDetector(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.bans = BanList([], refresh_interval=5)
+        self.detector = AbuseDetector(
+            self.bans,
+            threshold=3,
+            window=60,
+            ban_ttl=900,
+            status_codes=[401, 403, 429],
+            exempt_networks=["127.0.0.0/8"],
+            max_entries=100,
+        )
+        self.address = ip_address("203.0.113.7")
+
+    def test_watches(self):
+        self.assertTrue(self.detector.watches(401))
+        self.assertTrue(self.detector.watches(429))
+        self.assertFalse(self.detector.watches(404))
+
+    async def test_bans_after_threshold(self):
+        self.assertFalse(await self.detector.record(self.address))
+        self.assertFalse(await self.detector.record(self.address))
+        self.assertFalse(await self.detector.record(ip_address("203.0.113.8")))
+        self.assertTrue(await self.detector.record(self.address))
+        self.assertTrue(self.bans.is_banned(self.address))
+        self.assertFalse(self.bans.is_banned(ip_address("203.0.113.8")))
+        self.assertLess(self.bans.networks()["203.0.113.7/32"], float("inf"))
+        self.assertEqual(self.detector.stats()["banned"], 1)
+
+    async def test_exempt_and_unknown_addresses(self):
+        for _ in range(5):
+            self.assertFalse(await self.detector.record(ip_address("127.0.0.1")))
+            self.assertFalse(await self.detector.record(None))
+        self.assertEqual(self.detector.stats()["failures"], 0)
+
+    async def test_counts_in_redis(self):
+        pipe = MagicMock()
+        pipe.execute = AsyncMock(return_value=[0, 1, 3, True])
+        redis = MagicMock()
+        redis.pipeline.return_value.__aenter__.return_value = pipe
+        redis.delete = AsyncMock()
+        self.detector.init(redis)
+        self.bans.ban = AsyncMock(return_value="203.0.113.7/32")
+        self.assertTrue(await self.detector.record(self.address))
+        self.bans.ban.assert_awaited_once_with("203.0.113.7", 900)
+        redis.delete.assert_awaited_once_with("abuse:203.0.113.7")
+
+    async def test_redis_error_falls_back_to_local_window(self):
+        redis = MagicMock()
+        redis.pipeline.side_effect = RedisError
+        self.detector.init(redis)
+        self.assertFalse(await self.detector.record(self.address))
+        self.assertEqual(self.detector.stats()["tracked"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,3 +1,4 @@
+import time
 import unittest
 from datetime import timedelta
 from unittest.mock import AsyncMock, patch
@@ -7,8 +8,8 @@ from jose import jwt
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.conf import messages
-from src.entity.models import Role, User
-from src.services.auth import Auth
+from src.entity.models import Image, Role, User
+from src.services.auth import Auth, TokenCache, image_owner_or_admin
 
 
 class TestAuth(unittest.IsolatedAsyncioTestCase):
@@ -124,6 +125,73 @@ class TestAuth(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(context.exception.status_code, status.HTTP_401_UNAUTHORIZED)
         self.assertEqual(context.exception.detail, "Could not validate credentials")
 
+    async def test_decode_access_token_is_cached(self):
+        self.auth.token_cache = TokenCache(max_entries=10)
+        token = await self.auth.create_access_token({"sub": self.user_email})
+        with patch("src.services.auth.jwt.decode", wraps=jwt.decode) as mock_decode:
+            first = self.auth.decode_access_token(token)
+            second = self.auth.decode_access_token(token)
+        self.assertEqual(first["sub"], self.user_email)
+        self.assertIs(first, second)
+        mock_decode.assert_called_once()
+        self.assertEqual(self.auth.token_cache.stats()["hits"], 1)
+
+    def test_decode_access_token_rejects_other_scopes(self):
+        self.auth.token_cache = TokenCache(max_entries=10)
+        token = self.auth.create_email_token({"sub": self.user_email})
+        self.assertIsNone(self.auth.decode_access_token(token))
+        self.assertIsNone(self.auth.decode_access_token("invalid_token"))
+        self.assertEqual(self.auth.token_cache.stats()["entries"], 0)
+
+
+class TestTokenCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = TokenCache(max_entries=2)
+
+    def test_expired_payload(self):
+        self.cache.set("token", {"sub": "a", "exp": time.time() - 1})
+        self.assertIsNone(self.cache.get("token"))
+        self.assertEqual(self.cache.stats()["entries"], 0)
+
+    def test_bounded(self):
+        exp = time.time() + 60
+        for token in ("a", "b", "c"):
+            self.cache.set(token, {"sub": token, "exp": exp})
+        self.assertIsNone(self.cache.get("a"))
+        self.assertEqual(self.cache.get("c")["sub"], "c")
+
+
+class TestImageOwnerOrAdmin(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.session = AsyncMock(spec=AsyncSession)
+        self.image = Image(id=1, user_id=1, url="http://example.com/image.jpg")
+        self.owner = User(id=1, role=Role.user)
+        self.dependency = image_owner_or_admin()
+
+    async def test_owner(self):
+        self.session.get.return_value = self.image
+        image = await self.dependency(1, self.owner, self.session)
+        self.assertIs(image, self.image)
+        self.session.get.assert_called_once()
+        self.session.execute.assert_not_called()
+
+    async def test_admin(self):
+        self.session.get.return_value = self.image
+        admin = User(id=2, role=Role.admin)
+        self.assertIs(await self.dependency(1, admin, self.session), self.image)
+
+    async def test_other_user(self):
+        self.session.get.return_value = self.image
+        with self.assertRaises(HTTPException) as context:
+            await self.dependency(1, User(id=2, role=Role.user), self.session)
+        self.assertEqual(context.exception.status_code, status.HTTP_403_FORBIDDEN)
+
+    async def test_missing_image(self):
+        self.session.get.return_value = None
+        with self.assertRaises(HTTPException) as context:
+            await self.dependency(1, self.owner, self.session)
+        self.assertEqual(context.exception.status_code, status.HTTP_404_NOT_FOUND)
+
 
 if __name__ == "__main__":
     unittest.main()
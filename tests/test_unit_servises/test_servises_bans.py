@@ -0,0 +1,127 @@
+import asyncio
+import math
+import time
+import unittest
+from ipaddress import ip_address
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from src.services.bans import BanList, BanSnapshot, client_address
+
+
+def request_from(peer: str, forwarded: str | None = None):
+    request = MagicMock()
+    request.client.host = peer
+    request.headers = {"X-Forwarded-For": forwarded} if forwarded else {}
+    return request
+
+
+class TestBanSnapshot(unittest.TestCase):
+    def test_cidr_ranges(self):
+        snapshot = BanSnapshot(["10.0.0.0/8", "192.168.1.1", "2001:db8::/32"])
+        self.assertIn(ip_address("10.20.30.40"), snapshot)
+        self.assertIn(ip_address("192.168.1.1"), snapshot)
+        self.assertNotIn(ip_address("192.168.1.2"), snapshot)
+        self.assertNotIn(ip_address("11.0.0.1"), snapshot)
+        self.assertIn(ip_address("2001:db8::1"), snapshot)
+        self.assertNotIn(ip_address("2001:db9::1"), snapshot)
+
+    def test_nested_networks(self):
+        snapshot = BanSnapshot(["10.1.2.3", "10.0.0.0/8", "10.1.0.0/16"])
+        self.assertIn(ip_address("10.1.2.4"), snapshot)
+        self.assertEqual(len(snapshot), 3)
+
+    def test_everything(self):
+        self.assertIn(ip_address("8.8.8.8"), BanSnapshot(["0.0.0.0/0"]))
+
+
+class TestClientAddress(unittest.TestCase):
+    def test_one_trusted_proxy(self):
+        request = request_from("10.0.0.1", "1.1.1.1, 203.0.113.7")
+        self.assertEqual(client_address(request, 1), ip_address("203.0.113.7"))
+
+    def test_two_trusted_proxies(self):
+        request = request_from("10.0.0.1", "1.1.1.1, 203.0.113.7, 10.0.0.2")
+        self.assertEqual(client_address(request, 2), ip_address("203.0.113.7"))
+
+    def test_no_trusted_proxies_ignores_header(self):
+        request = request_from("203.0.113.7", "1.1.1.1")
+        self.assertEqual(client_address(request, 0), ip_address("203.0.113.7"))
+
+    def test_short_header(self):
+        request = request_from("10.0.0.1")
+        self.assertEqual(client_address(request, 2), ip_address("10.0.0.1"))
+
+    def test_invalid_and_mapped_addresses(self):
+        self.assertIsNone(client_address(request_from("10.0.0.1", "unknown"), 1))
+        request = request_from("10.0.0.1", "::ffff:203.0.113.7")
+        self.assertEqual(client_address(request, 1), ip_address("203.0.113.7"))
+
+
+class TestBanList(unittest.IsolatedAsyncioTestCase):
+    async def test_local_bans(self):
+        bans = BanList(["192.168.1.1"], refresh_interval=5)
+        self.assertTrue(bans.is_banned(ip_address("192.168.1.1")))
+        self.assertEqual(await bans.ban("203.0.113.9/24"), "203.0.113.0/24")
+        self.assertTrue(bans.is_banned(ip_address("203.0.113.200")))
+        self.assertTrue(await bans.unban("203.0.113.0/24"))
+        self.assertFalse(bans.is_banned(ip_address("203.0.113.200")))
+        self.assertFalse(await bans.unban("192.168.1.1"))
+        self.assertFalse(bans.is_banned(None))
+
+    async def test_temporary_ban_keeps_permanent_ban(self):
+        bans = BanList([], refresh_interval=5)
+        await bans.ban("203.0.113.7")
+        await bans.ban("203.0.113.7", ttl=60)
+        self.assertEqual(bans.networks(), {"203.0.113.7/32": math.inf})
+
+    async def test_ban_in_redis_only_extends(self):
+        pipe = MagicMock()
+        pipe.execute = AsyncMock(return_value=[0, None, []])
+        redis = MagicMock()
+        redis.pipeline.return_value.__aenter__.return_value = pipe
+        bans = BanList([], refresh_interval=5)
+        bans.init(redis)
+        await bans.ban("203.0.113.7", ttl=60)
+        network, = pipe.zadd.call_args.args[1]
+        self.assertEqual(network, "203.0.113.7/32")
+        self.assertTrue(pipe.zadd.call_args.kwargs["gt"])
+
+    async def test_temporary_ban_expires(self):
+        bans = BanList([], refresh_interval=5)
+        await bans.ban("203.0.113.7", ttl=60)
+        self.assertTrue(bans.is_banned(ip_address("203.0.113.7")))
+        bans._entries["203.0.113.7/32"] = time.time() - 1
+        bans._next_expiry = time.time() - 1
+        self.assertFalse(bans.is_banned(ip_address("203.0.113.7")))
+        self.assertEqual(bans.networks(), {})
+
+    async def test_reload_from_redis(self):
+        pipe = MagicMock()
+        pipe.execute = AsyncMock(
+            return_value=[2, b"3", [(b"10.0.0.0/8", math.inf)]]
+        )
+        redis = MagicMock()
+        redis.pipeline.return_value.__aenter__.return_value = pipe
+        bans = BanList([], refresh_interval=5)
+        bans.init(redis)
+        await bans.reload()
+        self.assertTrue(bans.is_banned(ip_address("10.9.9.9")))
+        self.assertEqual(bans.stats()["reloads"], 1)
+        self.assertEqual(bans.networks(), {"10.0.0.0/8": math.inf})
+        self.assertEqual(pipe.zremrangebyscore.call_args.args[:2], ("bans", "-inf"))
+
+    async def test_refresh_survives_unexpected_errors(self):
+        redis = MagicMock()
+        redis.get = AsyncMock(side_effect=[ValueError("bad member"), b"1"])
+        bans = BanList([], refresh_interval=5)
+        bans.init(redis)
+        bans.reload = AsyncMock(side_effect=lambda: setattr(bans, "reloads", 1))
+        sleep = AsyncMock(side_effect=[None, asyncio.CancelledError])
+        with patch("src.services.bans.asyncio.sleep", sleep):
+            with self.assertRaises(asyncio.CancelledError):
+                await bans.refresh_forever()
+        bans.reload.assert_awaited_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,207 @@
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from fastapi import APIRouter, Depends, FastAPI, Request, Response
+from httpx import AsyncClient
+from sqlalchemy import exc, text
+
+from src.database.db import (
+    PRIMARY_COOKIE,
+    DatabaseSessionManager,
+    UnitOfWorkRoute,
+    commit,
+    engine_options,
+    get_db,
+    get_read_db,
+    on_commit,
+    on_rollback,
+)
+
+
+class TestDatabaseSessionManager(unittest.IsolatedAsyncioTestCase):
+    @patch("src.database.db.config")
+    async def asyncSetUp(self, mock_config):
+        mock_config.DB_POOL_SIZE = 1
+        mock_config.DB_MAX_OVERFLOW = 1
+        mock_config.DB_POOL_TIMEOUT = 0.05
+        mock_config.DB_POOL_RECYCLE = 60
+        mock_config.DB_POOL_PRE_PING = False
+        mock_config.DB_STATEMENT_TIMEOUT = 1000
+        self.manager = DatabaseSessionManager("sqlite+aiosqlite:///:memory:")
+        self.engine = self.manager._engine
+
+    async def asyncTearDown(self):
+        await self.engine.dispose()
+
+    async def test_checkout_metrics(self):
+        async with self.manager.session() as session:
+            await session.execute(text("SELECT 1"))
+            stats = self.manager.stats()
+            self.assertEqual(stats["in_use"], 1)
+            self.assertEqual(stats["overflows"], 0)
+        stats = self.manager.stats()
+        self.assertEqual(stats["in_use"], 0)
+        self.assertEqual(stats["checkouts"], 1)
+
+    async def test_overflow_and_timeout(self):
+        first = await self.engine.connect()
+        second = await self.engine.connect()
+        self.assertEqual(self.manager.stats()["overflow"], 1)
+        self.assertEqual(self.manager.stats()["overflows"], 1)
+        with self.assertRaises(exc.TimeoutError):
+            await self.engine.connect()
+        await first.close()
+        await second.close()
+        stats = self.manager.stats()
+        self.assertEqual(stats["timeouts"], 1)
+        self.assertEqual(stats["waiting"], 0)
+        self.assertGreater(stats["wait_max_ms"], 40)
+
+    @patch("src.database.db.config")
+    def test_statement_timeout_for_postgres(self, mock_config):
+        mock_config.DB_STATEMENT_TIMEOUT = 5000
+        options = engine_options("postgresql+asyncpg://u:p@localhost/db")
+        self.assertEqual(
+            options["connect_args"], {"server_settings": {"statement_timeout": "5000"}}
+        )
+        self.assertNotIn("connect_args", engine_options("sqlite+aiosqlite:///./x.db"))
+
+
+class TestReadReplicas(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.manager = DatabaseSessionManager(
+            "sqlite+aiosqlite:///:memory:",
+            ["sqlite+aiosqlite:///:memory:", "sqlite+aiosqlite:///:memory:"],
+        )
+        patcher = patch("src.database.db.sessionmanager", self.manager)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def asyncTearDown(self):
+        for engine in [self.manager._engine, *self.manager._replicas]:
+            await engine.dispose()
+
+    def request(
+        self, method: str, cookies: dict | None = None, token: str | None = None
+    ):
+        request = MagicMock()
+        request.method = method
+        request.cookies = cookies or {}
+        request.headers = {"Authorization": f"Bearer {token}"} if token else {}
+        return request
+
+    async def test_reads_rotate_over_replicas(self):
+        engines = []
+        for _ in range(3):
+            async with self.manager.session(read_only=True) as session:
+                engines.append(session.bind)
+        self.assertEqual(engines, [*self.manager._replicas, self.manager._replicas[0]])
+        async with self.manager.session() as session:
+            self.assertIs(session.bind, self.manager._engine)
+        self.assertEqual(len(self.manager.stats()["replicas"]), 2)
+
+    async def test_write_makes_reads_sticky(self):
+        response = Response()
+        async for session in get_db(self.request("POST"), response):
+            self.assertIs(session.bind, self.manager._engine)
+        self.assertIn(PRIMARY_COOKIE, response.headers["set-cookie"])
+
+        response = Response()
+        async for _ in get_db(self.request("GET"), response):
+            pass
+        self.assertNotIn("set-cookie", response.headers)
+
+        async for session in get_read_db(self.request("GET", {PRIMARY_COOKIE: "1"})):
+            self.assertIs(session.bind, self.manager._engine)
+            self.assertFalse(session.info["replica"])
+        async for session in get_read_db(self.request("GET")):
+            self.assertIn(session.bind, self.manager._replicas)
+            self.assertTrue(session.info["replica"])
+
+    async def test_bearer_writer_reads_from_primary(self):
+        store = {}
+        redis = MagicMock()
+        redis.set = AsyncMock(side_effect=lambda key, value, ex: store.update({key: value}))
+        redis.exists = AsyncMock(side_effect=lambda key: int(key in store))
+        self.manager.init(redis)
+
+        async for _ in get_db(self.request("PUT", token="abc"), Response()):
+            pass
+        self.assertEqual(redis.set.call_args.kwargs["ex"], 10)
+        async for session in get_read_db(self.request("GET", token="abc")):
+            self.assertIs(session.bind, self.manager._engine)
+        async for session in get_read_db(self.request("GET", token="other")):
+            self.assertIn(session.bind, self.manager._replicas)
+
+
+class TestUnitOfWork(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.session = MagicMock()
+        self.session.info = {}
+        self.session.commit = AsyncMock()
+        self.session.in_transaction.return_value = True
+
+        async def override_get_db(request: Request):
+            request.state.db = self.session
+            yield self.session
+
+        router = APIRouter(route_class=UnitOfWorkRoute)
+
+        @router.post("/ok")
+        async def ok(db=Depends(get_db)):
+            self.assertEqual(self.session.commit.await_count, 0)
+            return {"ok": True}
+
+        @router.post("/fail")
+        async def fail(db=Depends(get_db)):
+            raise ValueError
+
+        app = FastAPI()
+        app.include_router(router)
+        app.dependency_overrides[get_db] = override_get_db
+        self.client = AsyncClient(app=app, base_url="http://test")
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+
+    async def test_commits_once_after_endpoint(self):
+        response = await self.client.post("/ok")
+        self.assertEqual(response.status_code, 200)
+        self.session.commit.assert_awaited_once()
+
+    async def test_no_commit_when_endpoint_fails(self):
+        rollback = AsyncMock()
+        on_rollback(self.session, rollback)
+        with self.assertRaises(ValueError):
+            await self.client.post("/fail")
+        self.session.commit.assert_not_awaited()
+        rollback.assert_awaited_once()
+
+    async def test_callbacks_run_after_commit(self):
+        calls = []
+
+        async def callback():
+            calls.append(self.session.commit.await_count)
+
+        rollback = AsyncMock()
+        on_commit(self.session, callback)
+        on_rollback(self.session, rollback)
+        await commit(self.session)
+        await commit(self.session)
+        self.assertEqual(calls, [1])
+        rollback.assert_not_awaited()
+
+    async def test_rollback_callbacks_run_when_commit_fails(self):
+        self.session.commit.side_effect = ValueError
+        callback, rollback = AsyncMock(), AsyncMock()
+        on_commit(self.session, callback)
+        on_rollback(self.session, rollback)
+        with self.assertRaises(ValueError):
+            await commit(self.session)
+        callback.assert_not_awaited()
+        rollback.assert_awaited_once()
+        self.assertEqual(self.session.info, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,49 +1,261 @@
+import asyncio
+import json
+import socket
 import unittest
-from unittest.mock import AsyncMock, patch
+from email.message import EmailMessage
+from unittest.mock import AsyncMock, MagicMock, patch
 
-from fastapi_mail import MessageType
+from aiosmtplib import SMTPRecipientsRefused, SMTPResponseException, SMTPServerDisconnected
+from fastapi_mail import ConnectionConfig
 
-from src.services.email import send_email, send_reset_password_email
+from src.services.email import conf, email_outbox, send_email, send_reset_password_email
+from src.services.mail_queue import EmailJob, EmailOutbox, SMTPPool, is_permanent
+from src.services.rendering import renderer
 
+try:
+    from aiosmtpd.controller import Controller
+except ImportError:
+    Controller = None
 
-class TestEmailService(unittest.IsolatedAsyncioTestCase):
-    @patch("src.services.email.FastMail")
-    async def test_send_email_success(self, MockFastMail):
-        mock_fm_instance = MockFastMail.return_value
-        mock_fm_instance.send_message = AsyncMock()
 
+class TestEmailService(unittest.IsolatedAsyncioTestCase):
+    @patch.object(email_outbox, "enqueue", new_callable=AsyncMock)
+    async def test_send_email_success(self, mock_enqueue):
         email = "test_user@example.com"
         username = "test_user"
         host = "example.com"
 
         await send_email(email, username, host)
 
-        mock_fm_instance.send_message.assert_called_once()
-        args, kwargs = mock_fm_instance.send_message.call_args
-        message = args[0]
+        mock_enqueue.assert_called_once()
+        job = mock_enqueue.call_args.args[0]
 
-        self.assertEqual(message.subject, "Confirm your email ")
-        self.assertEqual(message.recipients, [email])
-        self.assertEqual(message.subtype, MessageType.html)
-
-    @patch("src.services.email.FastMail")
-    async def test_send_reset_password_email_success(self, MockFastMail):
-        mock_fm_instance = MockFastMail.return_value
-        mock_fm_instance.send_message = AsyncMock()
+        self.assertEqual(job.subject, "Confirm your email ")
+        self.assertEqual(job.recipient, email)
+        self.assertEqual(job.template, "verify_email.html")
+        self.assertEqual(job.body["username"], username)
 
+    @patch.object(email_outbox, "enqueue", new_callable=AsyncMock)
+    async def test_send_reset_password_email_success(self, mock_enqueue):
         email = "test_user@example.com"
         token = "random_token"
         host = "example.com"
 
         await send_reset_password_email(email, token, host)
 
-        mock_fm_instance.send_message.assert_called_once()
-        args, kwargs = mock_fm_instance.send_message.call_args
-        message = args[0]
+        mock_enqueue.assert_called_once()
+        job = mock_enqueue.call_args.args[0]
+
+        self.assertEqual(job.subject, "Password reset request")
+        self.assertEqual(job.recipient, email)
+        self.assertEqual(job.body, {"host": host, "token": token})
+
+    async def test_build_message(self):
+        job = EmailJob(
+            template="reset_password.html",
+            subject="Password reset request",
+            recipient="test_user@example.com",
+            body={"host": "http://example.com/", "token": "random_token"},
+        )
+        message = await email_outbox.build_message(job)
+        self.assertEqual(message["To"], "test_user@example.com")
+        self.assertEqual(message.get_content_subtype(), "html")
+        self.assertIn(
+            "http://example.com/api/auth/password_reset/random_token",
+            message.get_content(),
+        )
+
+    def test_job_roundtrip(self):
+        job = EmailJob("verify_email.html", "Subject", "a@b.com", {"token": "t"})
+        self.assertEqual(EmailJob.loads(job.dumps().encode()), job)
+
+
+class TestSMTPPool(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.pool = SMTPPool(conf, size=2)
+        self.connections = []
+
+        async def connect():
+            smtp = MagicMock()
+            smtp.is_connected = True
+            smtp.send_message = AsyncMock()
+            self.connections.append(smtp)
+            return smtp
+
+        self.pool._connect = connect
+
+    async def test_connections_are_reused(self):
+        messages = [EmailMessage() for _ in range(6)]
+        self.assertEqual(await self.pool.send(messages), [None] * 6)
+        connects = len(self.connections)
+        self.assertLessEqual(connects, 2)
+        self.assertEqual(await self.pool.send(messages), [None] * 6)
+        self.assertEqual(len(self.connections), connects)
+        self.assertEqual(self.pool.stats()["sent"], 12)
+
+    async def test_dropped_connection_is_reopened(self):
+        await self.pool.send([EmailMessage()])
+        self.connections[0].send_message.side_effect = SMTPServerDisconnected("bye")
+        self.assertEqual(await self.pool.send([EmailMessage()]), [None])
+        self.assertEqual(len(self.connections), 2)
+        self.connections[0].close.assert_called_once()
+
+    async def test_refused_message_keeps_connection(self):
+        await self.pool.send([EmailMessage()])
+        err = SMTPResponseException(550, "mailbox unavailable")
+        self.connections[0].send_message.side_effect = [err, None]
+        results = await self.pool.send([EmailMessage()])
+        self.assertIs(results[0], err)
+        self.assertEqual(await self.pool.send([EmailMessage()]), [None])
+        self.assertEqual(len(self.connections), 1)
+
+    def test_is_permanent(self):
+        self.assertTrue(is_permanent(SMTPResponseException(550, "no")))
+        self.assertTrue(is_permanent(SMTPRecipientsRefused([])))
+        self.assertFalse(is_permanent(SMTPResponseException(451, "later")))
+        self.assertFalse(is_permanent(SMTPServerDisconnected("bye")))
+
+
+class TestEmailOutbox(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.pool = MagicMock()
+        self.pool.conf = conf
+        self.pool.send = AsyncMock()
+        self.pipe = MagicMock()
+        self.pipe.execute = AsyncMock()
+        self.redis = AsyncMock()
+        self.redis.register_script = MagicMock()
+        self.redis.pipeline = MagicMock()
+        self.redis.pipeline.return_value.__aenter__.return_value = self.pipe
+        self.outbox = EmailOutbox(
+            self.pool,
+            renderer,
+            batch_size=10,
+            max_attempts=3,
+            backoff=5.0,
+            claim_idle=60,
+        )
+        self.outbox.init(self.redis)
+
+    def job(self, attempts=0):
+        return EmailJob(
+            template="verify_email.html",
+            subject="Confirm your email ",
+            recipient="test_user@example.com",
+            body={"host": "http://example.com/", "username": "u", "token": "t"},
+            attempts=attempts,
+        )
+
+    async def test_run_survives_unexpected_errors(self):
+        self.outbox._create_group = AsyncMock(
+            side_effect=[ValueError("bad entry"), asyncio.CancelledError]
+        )
+        with patch("src.services.mail_queue.asyncio.sleep", AsyncMock()) as sleep:
+            with self.assertRaises(asyncio.CancelledError):
+                await self.outbox.run("worker")
+        sleep.assert_awaited_once_with(1)
+        self.assertEqual(self.outbox._create_group.await_count, 2)
+
+    async def test_enqueue_appends_to_stream(self):
+        job = self.job()
+        await self.outbox.enqueue(job)
+        self.redis.xadd.assert_called_once_with(EmailOutbox.stream, {"job": job.dumps()})
+        self.pool.send.assert_not_called()
+
+    async def test_enqueue_without_redis_sends_right_away(self):
+        self.outbox.redis = None
+        self.pool.send.return_value = [None]
+        await self.outbox.enqueue(self.job())
+        self.pool.send.assert_called_once()
+
+    async def test_failed_direct_send_raises(self):
+        self.outbox.redis = None
+        self.pool.send.return_value = [SMTPServerDisconnected("gone")]
+        with self.assertRaises(SMTPServerDisconnected):
+            await self.outbox.enqueue(self.job())
+
+    async def test_process_acks_sent_jobs(self):
+        self.pool.send.return_value = [None, None]
+        entries = [(b"1-0", {b"job": self.job().dumps()}), (b"2-0", {b"job": self.job().dumps()})]
+        await self.outbox.process(entries)
+        self.pipe.xack.assert_called_once_with(EmailOutbox.stream, EmailOutbox.group, b"1-0", b"2-0")
+        self.pipe.xdel.assert_called_once_with(EmailOutbox.stream, b"1-0", b"2-0")
+        self.pipe.zadd.assert_not_called()
+
+    async def test_transient_failure_is_retried_with_backoff(self):
+        self.pool.send.return_value = [SMTPServerDisconnected("bye")]
+        job = self.job(attempts=1)
+        await self.outbox.process([(b"1-0", {b"job": job.dumps()})])
+        self.pipe.zadd.assert_called_once()
+        key, mapping = self.pipe.zadd.call_args.args
+        self.assertEqual(key, EmailOutbox.retries)
+        (data, due), = mapping.items()
+        self.assertEqual(json.loads(data)["attempts"], 2)
+        self.assertEqual(self.outbox._backoff(2), 10.0)
+        self.pipe.xack.assert_called_once()
+
+    async def test_exhausted_and_permanent_failures_are_dead_lettered(self):
+        self.pool.send.return_value = [
+            SMTPServerDisconnected("bye"),
+            SMTPResponseException(550, "no such user"),
+        ]
+        entries = [
+            (b"1-0", {b"job": self.job(attempts=2).dumps()}),
+            (b"2-0", {b"job": self.job().dumps()}),
+            (b"3-0", {b"job": b"not json"}),
+        ]
+        await self.outbox.process(entries)
+        self.pipe.zadd.assert_not_called()
+        self.assertEqual(self.pipe.xadd.call_count, 3)
+        self.assertEqual(self.outbox.stats()["dead_lettered"], 3)
+        self.pipe.xack.assert_called_once_with(
+            EmailOutbox.stream, EmailOutbox.group, b"1-0", b"2-0", b"3-0"
+        )
+
+
+@unittest.skipIf(Controller is None, "aiosmtpd is not installed")
+class TestSMTPPoolDelivery(unittest.IsolatedAsyncioTestCase):
+    """Sends through a local aiosmtpd server standing in for the SMTP relay."""
+
+    def setUp(self):
+        self.received = []
+
+        class Handler:
+            async def handle_DATA(handler, server, session, envelope):
+                self.received.append(envelope)
+                return "250 OK"
+
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        self.controller = Controller(Handler(), hostname="127.0.0.1", port=port)
+        self.controller.start()
+        local_conf = ConnectionConfig(
+            **{
+                **conf.model_dump(),
+                "MAIL_SERVER": "127.0.0.1",
+                "MAIL_PORT": port,
+                "MAIL_SSL_TLS": False,
+                "USE_CREDENTIALS": False,
+            }
+        )
+        self.pool = SMTPPool(local_conf, size=2)
+
+    async def asyncTearDown(self):
+        await self.pool.close()
+        await asyncio.to_thread(self.controller.stop)
 
-        self.assertEqual(message.subject, "Password reset request")
-        self.assertEqual(message.recipients, [email])
-        self.assertEqual(message.subtype, MessageType.html)
+    async def test_send_batch(self):
+        messages = []
+        for i in range(10):
+            message = EmailMessage()
+            message["From"] = "sender@example.com"
+            message["To"] = f"user{i}@example.com"
+            message.set_content("hello")
+            messages.append(message)
+        self.assertEqual(await self.pool.send(messages), [None] * 10)
+        self.assertEqual(len(self.received), 10)
+        self.assertEqual(self.pool.stats()["connects"], 2)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,71 @@
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+
+from redis.exceptions import RedisError
+
+from src.services.feed_cache import FeedCache
+
+
+class TestFeedCache(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.redis = AsyncMock()
+        self.script = AsyncMock()
+        self.redis.register_script = MagicMock(return_value=self.script)
+        self.cache = FeedCache(ttl=60, settle=10)
+        self.cache.init(self.redis)
+
+    async def test_get_hit(self):
+        self.script.return_value = [b"3", b"[]", 0]
+        page, generation = await self.cache.get("json", 10, 0, None)
+        self.assertEqual((page, generation), ("[]", "3"))
+        self.script.assert_called_once_with(
+            keys=[FeedCache.generation_key, FeedCache.bumped_key],
+            args=[FeedCache.prefix, "json:10:0:"],
+        )
+        self.assertEqual(self.cache.stats()["hits"], 1)
+
+    async def test_get_miss(self):
+        self.script.return_value = [b"0", None, 0]
+        page, generation = await self.cache.get("html", 10, 0, "abc")
+        self.assertIsNone(page)
+        self.assertEqual(generation, "0")
+        self.assertEqual(self.cache.stats()["misses"], 1)
+
+    async def test_replica_miss_after_bump_is_not_cached(self):
+        self.script.return_value = [b"4", None, 1]
+        self.assertEqual(
+            await self.cache.get("json", 10, 0, None, replica=True), (None, None)
+        )
+        self.assertEqual(await self.cache.get("json", 10, 0, None), (None, "4"))
+
+    async def test_set_uses_generation_and_ttl(self):
+        await self.cache.set("3", "json", 10, 0, None, "[]")
+        self.redis.set.assert_called_once_with("feed:page:3:json:10:0:", "[]", ex=60)
+
+    async def test_redis_error_skips_set(self):
+        self.script.side_effect = RedisError
+        page, generation = await self.cache.get("json", 10, 0, None)
+        self.assertIsNone(page)
+        await self.cache.set(generation, "json", 10, 0, None, "[]")
+        self.redis.set.assert_not_called()
+
+    async def test_invalidate(self):
+        pipe = MagicMock()
+        pipe.execute = AsyncMock()
+        self.redis.pipeline = MagicMock()
+        self.redis.pipeline.return_value.__aenter__.return_value = pipe
+        await self.cache.invalidate()
+        pipe.incr.assert_called_once_with(FeedCache.generation_key)
+        pipe.set.assert_called_once_with(FeedCache.bumped_key, 1, ex=10)
+        self.assertEqual(self.cache.stats()["invalidations"], 1)
+
+    async def test_without_redis(self):
+        cache = FeedCache(ttl=60, settle=10)
+        self.assertEqual(await cache.get("json", 10, 0, None), (None, None))
+        await cache.set(None, "json", 10, 0, None, "[]")
+        await cache.invalidate()
+        self.assertEqual(cache.stats()["misses"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+
+from passlib.context import CryptContext
+
+from src.services.passwords import PasswordHasher
+
+
+class TestPasswordHasher(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.context = CryptContext(
+            schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=4
+        )
+        self.hasher = PasswordHasher(self.context, max_workers=2)
+
+    def tearDown(self):
+        self.hasher.shutdown()
+
+    async def test_hash_and_verify(self):
+        hashed = await self.hasher.hash("secret")
+        self.assertEqual(
+            await self.hasher.verify_and_update("secret", hashed), (True, None)
+        )
+        self.assertEqual(
+            await self.hasher.verify_and_update("wrong", hashed), (False, None)
+        )
+        stats = self.hasher.stats()
+        self.assertEqual(stats["calls"], 3)
+        self.assertEqual(stats["pending"], 0)
+        self.assertGreaterEqual(stats["max_pending"], 1)
+
+    async def test_rehash_on_cost_change(self):
+        old_hash = CryptContext(schemes=["bcrypt"], bcrypt__rounds=5).hash("secret")
+        verified, new_hash = await self.hasher.verify_and_update("secret", old_hash)
+        self.assertTrue(verified)
+        self.assertTrue(self.context.verify("secret", new_hash))
+        self.assertFalse(self.context.needs_update(new_hash))
+        self.assertEqual(self.hasher.stats()["rehashes"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
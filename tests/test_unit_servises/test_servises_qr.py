@@ -0,0 +1,41 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from src.services.qr import QRQueueFull, QRRenderer
+
+
+class TestQRRenderer(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.renderer = QRRenderer(max_workers=1, queue_size=1)
+
+    def tearDown(self):
+        self.renderer.shutdown()
+
+    async def test_render_in_worker_process(self):
+        png = await self.renderer.render("https://example.com")
+        self.assertTrue(png.startswith(b"\x89PNG"))
+        self.assertEqual(self.renderer.stats()["pending"], 0)
+
+    async def test_queue_full(self):
+        release = asyncio.Event()
+
+        async def slow_render(executor, func, url):
+            await release.wait()
+            return b"png"
+
+        with patch.object(
+            asyncio.get_running_loop(), "run_in_executor", side_effect=slow_render
+        ):
+            first = asyncio.create_task(self.renderer.render("a"))
+            second = asyncio.create_task(self.renderer.render("b"))
+            await asyncio.sleep(0)
+            with self.assertRaises(QRQueueFull):
+                await self.renderer.render("c")
+            release.set()
+            self.assertEqual(await asyncio.gather(first, second), [b"png", b"png"])
+        self.assertEqual(self.renderer.stats()["rejected"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+from unittest.mock import AsyncMock
+
+from src.services.qr_cache import QRCache, etag_matches
+
+
+class TestQRCache(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.redis = AsyncMock()
+        self.cache = QRCache(max_bytes=10, ttl=60)
+        self.cache.init(self.redis)
+
+    def test_key_depends_on_url(self):
+        self.assertEqual(QRCache.key("a"), QRCache.key("a"))
+        self.assertNotEqual(QRCache.key("a"), QRCache.key("b"))
+
+    async def test_set_and_local_hit(self):
+        await self.cache.set("k", b"png")
+        self.redis.set.assert_called_once_with("qr:k", b"png", ex=60)
+        self.assertEqual(await self.cache.get("k"), b"png")
+        self.redis.get.assert_not_called()
+        self.assertEqual(self.cache.stats()["local_hits"], 1)
+
+    async def test_redis_hit_is_promoted(self):
+        self.redis.get.return_value = b"png"
+        self.assertEqual(await self.cache.get("k"), b"png")
+        self.assertEqual(await self.cache.get("k"), b"png")
+        self.redis.get.assert_called_once_with("qr:k")
+        self.assertEqual(self.cache.stats()["redis_hits"], 1)
+        self.assertEqual(self.cache.stats()["local_hits"], 1)
+
+    async def test_miss(self):
+        self.redis.get.return_value = None
+        self.assertIsNone(await self.cache.get("k"))
+        self.assertEqual(self.cache.stats()["misses"], 1)
+
+    async def test_lru_bounded_by_bytes(self):
+        await self.cache.set("a", b"1234")
+        await self.cache.set("b", b"1234")
+        await self.cache.get("a")
+        await self.cache.set("c", b"1234")
+        self.assertEqual(list(self.cache._lru), ["a", "c"])
+        self.assertEqual(self.cache.stats()["local_bytes"], 8)
+        await self.cache.set("big", b"12345678901")
+        self.assertNotIn("big", self.cache._lru)
+
+    async def test_without_redis(self):
+        cache = QRCache(max_bytes=10, ttl=60)
+        await cache.set("k", b"png")
+        self.assertEqual(await cache.get("k"), b"png")
+        self.assertIsNone(await cache.get("other"))
+
+
+class TestEtagMatches(unittest.TestCase):
+    def test_matches(self):
+        self.assertTrue(etag_matches('"abc"', '"abc"'))
+        self.assertTrue(etag_matches('"x", W/"abc"', '"abc"'))
+        self.assertTrue(etag_matches("*", '"abc"'))
+
+    def test_no_match(self):
+        self.assertFalse(etag_matches(None, '"abc"'))
+        self.assertFalse(etag_matches('"abd"', '"abc"'))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from fastapi import HTTPException, status
+from redis.exceptions import RedisError
+
+from src.services.rate_limit import RateLimiter, RatePolicy, resolve_policy
+
+
+class TestRatePolicy(unittest.TestCase):
+    def test_parse(self):
+        self.assertEqual(RatePolicy.parse("5/60"), RatePolicy(5, 60.0))
+        self.assertIsNone(RatePolicy.parse("unlimited"))
+
+    @patch("src.services.rate_limit.config")
+    def test_resolve_policy(self, mock_config):
+        mock_config.RATE_LIMITS = {"auth.login": "5/60", "*": "100/60"}
+        mock_config.RATE_LIMITS_BY_ROLE = {"admin": {"*": "unlimited"}}
+        mock_config.RATE_LIMITS_BY_USER = {"vip@example.com": {"auth.login": "50/60"}}
+        self.assertEqual(resolve_policy("auth.login"), RatePolicy(5, 60.0))
+        self.assertEqual(resolve_policy("users.me"), RatePolicy(100, 60.0))
+        self.assertIsNone(resolve_policy("auth.login", "a@b.com", "admin"))
+        self.assertEqual(
+            resolve_policy("auth.login", "vip@example.com", "admin"),
+            RatePolicy(50, 60.0),
+        )
+
+
+class TestRateLimiter(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.limiter = RateLimiter(max_entries=100, lease_fraction=0.5)
+        self.policy = RatePolicy(4, 60.0)
+
+    def attach_redis(self, script):
+        redis = MagicMock()
+        redis.register_script.return_value = script
+        self.limiter.init(redis)
+
+    async def test_local_window_without_redis(self):
+        for _ in range(4):
+            self.assertEqual(await self.limiter.hit("route", "ip:1", self.policy), 0)
+        retry_after = await self.limiter.hit("route", "ip:1", self.policy)
+        self.assertGreater(retry_after, 59)
+        self.assertEqual(await self.limiter.hit("route", "ip:2", self.policy), 0)
+        self.assertEqual(await self.limiter.hit("other", "ip:1", self.policy), 0)
+
+    async def test_lease_is_spent_locally(self):
+        script = AsyncMock(return_value=[2, 0])
+        self.attach_redis(script)
+        for _ in range(4):
+            self.assertEqual(await self.limiter.hit("route", "ip:1", self.policy), 0)
+        self.assertEqual(script.call_count, 2)
+        self.assertEqual(script.call_args.kwargs["args"][3], 2)
+        self.assertEqual(self.limiter.stats()["local_allows"], 2)
+
+    @patch("src.services.rate_limit.time.time")
+    async def test_lease_expires_before_window_ends(self, mock_time):
+        script = AsyncMock(return_value=[2, 0])
+        self.attach_redis(script)
+        mock_time.return_value = 1000.0
+        await self.limiter.hit("route", "ip:1", self.policy)
+        mock_time.return_value = 1031.0
+        await self.limiter.hit("route", "ip:1", self.policy)
+        self.assertEqual(script.call_count, 2)
+        self.assertEqual(self.limiter.stats()["local_allows"], 0)
+
+    async def test_denial_is_cached_until_retry(self):
+        script = AsyncMock(return_value=[0, 15000])
+        self.attach_redis(script)
+        self.assertAlmostEqual(
+            await self.limiter.hit("route", "ip:1", self.policy), 15, places=0
+        )
+        self.assertGreater(await self.limiter.hit("route", "ip:1", self.policy), 14)
+        script.assert_called_once()
+        self.assertEqual(self.limiter.stats()["local_denies"], 1)
+
+    async def test_redis_error_falls_back_to_local_window(self):
+        self.attach_redis(AsyncMock(side_effect=RedisError))
+        self.assertEqual(await self.limiter.hit("route", "ip:1", self.policy), 0)
+
+    @patch("src.services.rate_limit.config")
+    async def test_check_raises_429(self, mock_config):
+        mock_config.RATE_LIMITS = {"route": "1/20"}
+        mock_config.RATE_LIMITS_BY_ROLE = {"admin": {"route": "unlimited"}}
+        mock_config.RATE_LIMITS_BY_USER = {}
+        await self.limiter.check("route", "user:1", "a@b.com", "user")
+        with self.assertRaises(HTTPException) as context:
+            await self.limiter.check("route", "user:1", "a@b.com", "user")
+        self.assertEqual(
+            context.exception.status_code, status.HTTP_429_TOO_MANY_REQUESTS
+        )
+        self.assertEqual(context.exception.headers["Retry-After"], "20")
+        for _ in range(3):
+            await self.limiter.check("route", "user:2", "admin@b.com", "admin")
+
+
+if __name__ == "__main__":
+    unittest.main()
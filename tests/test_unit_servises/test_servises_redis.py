@@ -0,0 +1,49 @@
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from redis.asyncio import Redis
+from redis.asyncio.client import Pipeline
+from redis.exceptions import ConnectionError
+
+from src.database.redis import RedisManager
+
+
+class TestRedisManager(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.manager = RedisManager()
+        self.client = await self.manager.connect()
+
+    async def asyncTearDown(self):
+        await self.manager.close()
+
+    @patch.object(Redis, "execute_command", new_callable=AsyncMock)
+    async def test_command_latency(self, mock_execute):
+        mock_execute.return_value = b"value"
+        self.assertEqual(await self.client.get("key"), b"value")
+        stats = self.manager.stats()
+        self.assertEqual(stats["calls"], 1)
+        self.assertEqual(stats["errors"], 0)
+
+    @patch.object(Redis, "execute_command", new_callable=AsyncMock)
+    async def test_command_error(self, mock_execute):
+        mock_execute.side_effect = ConnectionError
+        with self.assertRaises(ConnectionError):
+            await self.client.get("key")
+        self.assertEqual(self.manager.stats()["errors"], 1)
+
+    @patch.object(Pipeline, "execute", new_callable=AsyncMock)
+    async def test_pipeline_latency(self, mock_execute):
+        mock_execute.return_value = [True, True]
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.set("key", "value")
+            pipe.expire("key", 60)
+            self.assertEqual(await pipe.execute(), [True, True])
+        self.assertEqual(self.manager.stats()["calls"], 1)
+
+    async def test_close(self):
+        await self.manager.close()
+        self.assertIsNone(self.manager.client)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+
+from src.services.email import EMAIL_TEMPLATES
+from src.services.rendering import TEMPLATE_DIRS, TemplateRenderer
+
+
+class TestTemplateRenderer(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.renderer = TemplateRenderer(
+            TEMPLATE_DIRS, bytecode_cache=False, auto_reload=False
+        )
+        self.context = {
+            "host": "http://example.com/",
+            "username": "<b>Tom & Jerry</b>",
+            "token": "abc",
+        }
+
+    def test_preload_compiles_pages_and_emails(self):
+        self.assertGreaterEqual(self.renderer.preload(), 6)
+        self.assertEqual(self.renderer.stats()["compiled"], self.renderer.preload())
+
+    async def test_render_escapes(self):
+        html = await self.renderer.render("verify_email.html", **self.context)
+        self.assertIn("&lt;b&gt;Tom &amp; Jerry&lt;/b&gt;", html)
+
+    async def test_skeleton_matches_full_render(self):
+        for name, fields in EMAIL_TEMPLATES.items():
+            self.assertTrue(await self.renderer.prerender(name, fields))
+            context = {field: self.context[field] for field in fields}
+            self.assertEqual(
+                await self.renderer.render_email(name, context),
+                await self.renderer.render(name, **context),
+            )
+        self.assertEqual(self.renderer.stats()["skeleton_fills"], len(EMAIL_TEMPLATES))
+
+    async def test_unknown_context_renders_in_full(self):
+        await self.renderer.prerender("reset_password.html", ("host", "token"))
+        context = {"host": "http://example.com/", "token": "abc", "extra": 1}
+        await self.renderer.render_email("reset_password.html", context)
+        self.assertEqual(self.renderer.stats()["skeleton_fills"], 0)
+
+    async def test_field_not_interpolated_verbatim(self):
+        self.assertFalse(
+            await self.renderer.prerender("reset_password.html", ("host", "missing"))
+        )
+        self.assertEqual(self.renderer.stats()["skeletons"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import io
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+from PIL import Image
+
+from src.services.storage import CloudinaryStorage, LocalStorage
+
+
+class TestCloudinaryStorage(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.storage = CloudinaryStorage(max_workers=2)
+
+    def tearDown(self):
+        self.storage.shutdown()
+
+    @patch("cloudinary.uploader.upload")
+    async def test_put_runs_in_executor(self, mock_upload):
+        def upload(file, **options):
+            return {
+                "url": "http://res.cloudinary.com/demo/image/upload/v1/avatar.jpg",
+                "public_id": "avatar",
+                "format": "jpg",
+                "version": threading.current_thread().name,
+            }
+
+        mock_upload.side_effect = upload
+        stored = await self.storage.put(b"file", key="avatar")
+        self.assertTrue(stored.version.startswith("storage"))
+        self.assertEqual(stored.key, "avatar.jpg")
+        mock_upload.assert_called_once_with(b"file", public_id="avatar", overwrite=True)
+
+    @patch("cloudinary.uploader.destroy")
+    async def test_delete(self, mock_destroy):
+        await self.storage.delete("image.jpg")
+        mock_destroy.assert_called_once_with("image")
+
+    @patch("cloudinary.CloudinaryImage.build_url")
+    async def test_transform_format(self, mock_build_url):
+        mock_build_url.return_value = "http://res.cloudinary.com/demo/image.jpg"
+        url = await self.storage.transform("image.jpg", format="png", crop="fill")
+        self.assertEqual(url, "http://res.cloudinary.com/demo/image.png")
+        mock_build_url.assert_called_once_with(crop="fill")
+
+    def test_key_from_url(self):
+        url = "http://res.cloudinary.com/demo/image/upload/v1/sample.jpg"
+        self.assertEqual(self.storage.key_from_url(url), "sample.jpg")
+
+
+class TestLocalStorage(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.storage = LocalStorage(2, self.tmp.name, "/media")
+        self.file = io.BytesIO()
+        Image.new("RGB", (40, 20), "red").save(self.file, format="PNG")
+        self.file.seek(0)
+
+    def tearDown(self):
+        self.storage.shutdown()
+        self.tmp.cleanup()
+
+    async def test_put_get_delete(self):
+        stored = await self.storage.put(self.file)
+        self.assertTrue(stored.key.endswith(".png"))
+        self.assertEqual(stored.url, f"/media/{stored.key}")
+        self.assertEqual(self.storage.key_from_url(stored.url), stored.key)
+        self.assertEqual(await self.storage.get(stored.key), self.file.getvalue())
+        await self.storage.delete(stored.key)
+        self.assertFalse(self.storage.path(stored.key).exists())
+
+    async def test_transform(self):
+        stored = await self.storage.put(self.file)
+        url = await self.storage.transform(
+            stored.key, width=10, height=10, crop="fill", effect="grayscale"
+        )
+        self.assertEqual(url, await self.storage.transform(
+            stored.key, width=10, height=10, crop="fill", effect="grayscale"
+        ))
+        with Image.open(self.storage.path(self.storage.key_from_url(url))) as img:
+            self.assertEqual(img.size, (10, 10))
+
+    async def test_transform_after_reupload(self):
+        stored = await self.storage.put(self.file, "avatar")
+        url = await self.storage.transform(stored.key, width=10, height=10, crop="fill")
+        file = io.BytesIO()
+        Image.new("RGB", (40, 20), "blue").save(file, format="PNG")
+        file.seek(0)
+        path = self.storage.path(stored.key)
+        mtime = path.stat().st_mtime_ns
+        await self.storage.put(file, "avatar")
+        os.utime(path, ns=(mtime + 1000, mtime + 1000))
+        new_url = await self.storage.transform(
+            stored.key, width=10, height=10, crop="fill"
+        )
+        self.assertNotEqual(url, new_url)
+        with Image.open(self.storage.path(self.storage.key_from_url(new_url))) as img:
+            self.assertEqual(img.getpixel((5, 5)), (0, 0, 255))
+        self.assertEqual(
+            [p.name for p in self.storage.root.rglob("*.tmp")], []
+        )
+
+    def test_path_outside_root(self):
+        with self.assertRaises(FileNotFoundError):
+            self.storage.path("../secret")
+
+
+if __name__ == "__main__":
+    unittest.main()
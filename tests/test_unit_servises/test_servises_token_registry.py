@@ -0,0 +1,93 @@
+import asyncio
+import time
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from redis.exceptions import RedisError
+
+from src.services.auth import auth_service
+from src.services.token_registry import TokenRegistry
+
+
+class TestTokenRegistry(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.pipe = MagicMock()
+        self.pipe.execute = AsyncMock()
+        self.redis = AsyncMock()
+        self.redis.pipeline = MagicMock()
+        self.redis.pipeline.return_value.__aenter__.return_value = self.pipe
+        self.registry = TokenRegistry()
+        self.registry.init(self.redis)
+
+    async def test_revoke_stores_and_publishes(self):
+        exp = time.time() + 60
+        await self.registry.revoke("abc", exp)
+        self.assertTrue(self.registry.is_revoked("abc"))
+        self.assertFalse(self.registry.is_revoked("other"))
+        self.pipe.set.assert_called_once()
+        key, value = self.pipe.set.call_args.args
+        self.assertEqual((key, value), ("revoked:abc", exp))
+        self.assertLessEqual(self.pipe.set.call_args.kwargs["ex"], 61)
+        self.pipe.publish.assert_called_once_with(TokenRegistry.channel, f"abc:{exp}")
+
+    async def test_expired_token_is_not_stored(self):
+        await self.registry.revoke("abc", time.time() - 1)
+        self.assertFalse(self.registry.is_revoked("abc"))
+        self.pipe.execute.assert_not_called()
+
+    async def test_tokens_without_id(self):
+        self.assertFalse(self.registry.is_revoked(None))
+
+    async def test_load_mirrors_stored_revocations(self):
+        exp = time.time() + 60
+
+        async def scan_iter(match):
+            yield b"revoked:abc"
+            yield b"revoked:gone"
+
+        self.redis.scan_iter = scan_iter
+        self.redis.mget.return_value = [str(exp).encode(), None]
+        await self.registry._load()
+        self.assertTrue(self.registry.is_revoked("abc"))
+        self.assertFalse(self.registry.is_revoked("gone"))
+
+    async def test_redis_error_keeps_local_revocation(self):
+        self.pipe.execute.side_effect = RedisError
+        await self.registry.revoke("abc", time.time() + 60)
+        self.assertTrue(self.registry.is_revoked("abc"))
+
+    async def test_listen_survives_unexpected_errors(self):
+        self.redis.pubsub = MagicMock(side_effect=[ValueError, asyncio.CancelledError])
+        with patch("src.services.token_registry.asyncio.sleep", AsyncMock()) as sleep:
+            with self.assertRaises(asyncio.CancelledError):
+                await self.registry.listen()
+        sleep.assert_awaited_once_with(1)
+
+    async def test_without_redis(self):
+        registry = TokenRegistry()
+        await registry.revoke("abc", time.time() + 60)
+        self.assertTrue(registry.is_revoked("abc"))
+        self.assertEqual(registry.stats(), {"revocations": 1, "revoked": 1})
+
+
+class TestRevokeAccessToken(unittest.IsolatedAsyncioTestCase):
+    async def test_access_tokens_are_unique(self):
+        first = await auth_service.create_access_token(data={"sub": "a@b.com"})
+        second = await auth_service.create_access_token(data={"sub": "a@b.com"})
+        self.assertNotEqual(
+            auth_service.decode_access_token(first)["jti"],
+            auth_service.decode_access_token(second)["jti"],
+        )
+
+    async def test_revoke_access_token(self):
+        token = await auth_service.create_access_token(data={"sub": "a@b.com"})
+        self.assertTrue(await auth_service.revoke_access_token(token))
+        jti = auth_service.decode_access_token(token)["jti"]
+        self.assertTrue(auth_service.tokens.is_revoked(jti))
+
+    async def test_revoke_invalid_token(self):
+        self.assertFalse(await auth_service.revoke_access_token("invalid"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,153 @@
+import asyncio
+import time
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from redis.exceptions import RedisError
+
+from src.entity.models import Role, User
+from src.services.user_cache import CachedUser, UserCache
+
+
+class TestCachedUser(unittest.TestCase):
+    def setUp(self):
+        self.user = User(
+            id=7,
+            username="test_user",
+            email="test_user@example.com",
+            password="123456",
+            role=Role.moderator,
+            confirmed=True,
+            is_active=False,
+            avatar="https://example.com/avatar.png",
+        )
+
+    def test_roundtrip(self):
+        cached = CachedUser.from_user(self.user)
+        self.assertEqual(CachedUser.decode(cached.encode()), cached)
+        self.assertEqual(cached.role, Role.moderator)
+        self.assertFalse(cached.is_active)
+
+    def test_roundtrip_without_role_and_avatar(self):
+        cached = CachedUser(7, "a@b.com", None, True, False, None)
+        self.assertEqual(CachedUser.decode(cached.encode()), cached)
+
+    def test_key_is_versioned(self):
+        self.assertEqual(CachedUser.key("a@b.com"), f"user:v{CachedUser.version}:a@b.com")
+
+    def test_truncated_value(self):
+        data = CachedUser.from_user(self.user).encode()
+        with self.assertRaises(ValueError):
+            CachedUser.decode(data[:-1])
+
+    def test_frozen(self):
+        cached = CachedUser.from_user(self.user)
+        with self.assertRaises(AttributeError):
+            cached.is_active = True
+
+
+class TestUserCache(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.redis = AsyncMock()
+        self.get_script = AsyncMock(return_value=[b"0", None])
+        self.set_script = AsyncMock(return_value=1)
+        self.redis.register_script = MagicMock(
+            side_effect=[self.get_script, self.set_script]
+        )
+        self.cache = UserCache(max_entries=2, local_ttl=30, ttl=300)
+        self.cache.init(self.redis)
+        self.user = User(
+            id=1,
+            email="test_user@example.com",
+            role=Role.user,
+            confirmed=True,
+            is_active=True,
+            avatar=None,
+        )
+        self.keys = [
+            f"{UserCache.epoch_prefix}{self.user.email}",
+            CachedUser.key(self.user.email),
+        ]
+
+    async def test_set_writes_both_tiers(self):
+        self.assertEqual(await self.cache.get(self.user.email), (None, "0"))
+        cached = await self.cache.set(self.user, "0")
+        self.set_script.assert_awaited_once_with(
+            keys=self.keys, args=["0", cached.encode(), 300]
+        )
+        self.assertEqual(await self.cache.get(self.user.email), (cached, None))
+        self.get_script.assert_awaited_once()
+        self.assertEqual(self.cache.stats()["local_hits"], 1)
+
+    async def test_set_after_invalidation_is_dropped(self):
+        self.set_script.return_value = 0
+        cached = await self.cache.set(self.user, "0")
+        self.assertEqual(cached, CachedUser.from_user(self.user))
+        self.assertNotIn(self.user.email, self.cache._local)
+
+    async def test_set_without_epoch_is_not_cached(self):
+        await self.cache.set(self.user, None)
+        self.set_script.assert_not_awaited()
+        self.assertNotIn(self.user.email, self.cache._local)
+
+    async def test_redis_hit_fills_local_tier(self):
+        cached = CachedUser.from_user(self.user)
+        self.get_script.return_value = [b"3", cached.encode()]
+        self.assertEqual(await self.cache.get(self.user.email), (cached, "3"))
+        self.assertEqual(await self.cache.get(self.user.email), (cached, None))
+        self.get_script.assert_awaited_once_with(keys=self.keys)
+        stats = self.cache.stats()
+        self.assertEqual((stats["redis_hits"], stats["local_hits"]), (1, 1))
+        self.assertEqual(stats["local_hit_ratio"], 0.5)
+
+    async def test_local_entry_expires(self):
+        await self.cache.set(self.user, "0")
+        email, (_, cached) = next(iter(self.cache._local.items()))
+        self.cache._local[email] = (time.monotonic() - 1, cached)
+        self.assertEqual(await self.cache.get(self.user.email), (None, "0"))
+        self.assertEqual(self.cache.stats()["misses"], 1)
+
+    async def test_local_tier_is_bounded(self):
+        for user_id in range(3):
+            self.user.id = user_id
+            self.user.email = f"user{user_id}@example.com"
+            await self.cache.set(self.user, "0")
+        self.assertEqual(list(self.cache._local), ["user1@example.com", "user2@example.com"])
+
+    async def test_invalidate_bumps_epoch_and_publishes(self):
+        pipe = MagicMock()
+        pipe.execute = AsyncMock()
+        self.redis.pipeline = MagicMock()
+        self.redis.pipeline.return_value.__aenter__.return_value = pipe
+        await self.cache.set(self.user, "0")
+        await self.cache.invalidate(self.user.email)
+        self.assertNotIn(self.user.email, self.cache._local)
+        pipe.incr.assert_called_once_with(self.keys[0])
+        pipe.expire.assert_called_once_with(self.keys[0], 300)
+        pipe.delete.assert_called_once_with(self.keys[1])
+        pipe.publish.assert_called_once_with(UserCache.channel, self.user.email)
+
+    async def test_redis_error_is_a_miss(self):
+        self.get_script.side_effect = RedisError
+        self.assertEqual(await self.cache.get(self.user.email), (None, None))
+
+    async def test_corrupted_value_is_a_miss(self):
+        self.get_script.return_value = [b"0", b"\x80\x04garbage"]
+        self.assertEqual(await self.cache.get(self.user.email), (None, "0"))
+
+    async def test_without_redis(self):
+        cache = UserCache(max_entries=0, local_ttl=30, ttl=300)
+        await cache.set(self.user, None)
+        await cache.invalidate(self.user.email)
+        self.assertEqual(await cache.get(self.user.email), (None, None))
+
+    async def test_listen_survives_unexpected_errors(self):
+        self.redis.pubsub = MagicMock(side_effect=[ValueError, asyncio.CancelledError])
+        with patch("src.services.user_cache.asyncio.sleep", AsyncMock()) as sleep:
+            with self.assertRaises(asyncio.CancelledError):
+                await self.cache.listen()
+        sleep.assert_awaited_once_with(1)
+
+
+if __name__ == "__main__":
+    unittest.main()